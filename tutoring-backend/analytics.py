@@ -0,0 +1,241 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import Column, DateTime, Index, Integer, BigInteger, MetaData, Table, text
+from sqlalchemy.orm import Session
+
+import profiling
+from auth import get_current_user, get_tutor_id, require_internal_token
+from changes import read_watermark
+from database import get_db, get_read_db
+from principal_cache import Principal
+
+
+# Aggregates for the dashboard, computed in Postgres instead of pandas.
+#
+# Reads come from two summary tables that are maintained incrementally:
+# POST /analytics/refresh folds every session created since the previous
+# refresh into the sums. The window is bounded by the change feed's
+# watermark (changes.WATERMARK) over created_at: ids are handed out before
+# commit, so a session with a lower id can commit after a higher one has been
+# folded, but it can't commit with a created_at below the watermark. Sessions
+# from before change tracking (NULL created_at) only enter through a full
+# rebuild, which the first refresh after migration 0008 does by itself.
+# Sessions edited or deleted after being folded in are only corrected by a
+# full rebuild (?full=true), so schedule one periodically next to the
+# frequent incremental refreshes.
+#
+# Every endpoint needs a caller: the per-tutor reads (sessions summary,
+# students) a tutor's access token, showing only that tutor's figures; the
+# refresh and the reads across all tutors (tutors, medians) the internal
+# token (auth.require_internal_token).
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=profiling.ROUTE_CLASS)
+
+metadata = MetaData()
+
+session_hourly_summary = Table(
+    "session_hourly_summary",
+    metadata,
+    Column("bucket_hour", DateTime, primary_key=True),
+    Column("tutor_id", Integer, primary_key=True),
+    Column("sessions", BigInteger, nullable=False),
+    Column("total_minutes", BigInteger, nullable=False),
+    Column("short", BigInteger, nullable=False),
+    Column("medium", BigInteger, nullable=False),
+    Column("long", BigInteger, nullable=False),
+    Column("extended", BigInteger, nullable=False),
+    # The tutor-scoped reads; the primary key leads with bucket_hour
+    Index("ix_session_hourly_summary_tutor_id_bucket_hour", "tutor_id", "bucket_hour"),
+)
+
+student_session_summary = Table(
+    "student_session_summary",
+    metadata,
+    Column("student_id", Integer, primary_key=True),
+    Column("tutor_id", Integer),
+    Column("sessions", BigInteger, nullable=False),
+    Column("total_minutes", BigInteger, nullable=False),
+    Column("first_session", DateTime),
+    Column("last_session", DateTime),
+    # GET /analytics/students, one tutor's students in id order
+    Index("ix_student_session_summary_tutor_id_student_id", "tutor_id", "student_id"),
+)
+
+analytics_refresh_state = Table(
+    "analytics_refresh_state",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    # Sessions created before this are folded in
+    Column("folded_until", DateTime(timezone=True)),
+    Column("refreshed_at", DateTime),
+)
+
+# short, medium and long have the cut points of myassignment.py's duration
+# categories, (0, 30], (30, 60] and (60, 120], except that short also counts
+# durations <= 0; extended is over 120, which myassignment.py leaves
+# uncategorized
+DURATION_BUCKETS = ("short", "medium", "long", "extended")
+REFRESH_LOCK_ID = 727401
+
+# Sessions to fold: those created in [since, until), or for a full rebuild
+# everything created before until, with the untracked ones
+INCREMENTAL_WINDOW = "created_at >= :since AND created_at < :until"
+FULL_WINDOW = "(created_at < :until OR created_at IS NULL)"
+
+FOLD_HOURLY = """
+    INSERT INTO session_hourly_summary AS s
+        (bucket_hour, tutor_id, sessions, total_minutes, short, medium, long, extended)
+    SELECT date_trunc('hour', date), tutor_id, count(*), coalesce(sum(duration), 0),
+           count(*) FILTER (WHERE duration <= 30),
+           count(*) FILTER (WHERE duration > 30 AND duration <= 60),
+           count(*) FILTER (WHERE duration > 60 AND duration <= 120),
+           count(*) FILTER (WHERE duration > 120)
+    FROM tutoring_sessions
+    WHERE {window} AND date IS NOT NULL AND tutor_id IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (bucket_hour, tutor_id) DO UPDATE SET
+        sessions = s.sessions + excluded.sessions,
+        total_minutes = s.total_minutes + excluded.total_minutes,
+        short = s.short + excluded.short,
+        medium = s.medium + excluded.medium,
+        long = s.long + excluded.long,
+        extended = s.extended + excluded.extended
+"""
+
+FOLD_STUDENTS = """
+    INSERT INTO student_session_summary AS s
+        (student_id, tutor_id, sessions, total_minutes, first_session, last_session)
+    SELECT student_id, max(tutor_id), count(*), coalesce(sum(duration), 0), min(date), max(date)
+    FROM tutoring_sessions
+    WHERE {window} AND student_id IS NOT NULL
+    GROUP BY student_id
+    ON CONFLICT (student_id) DO UPDATE SET
+        tutor_id = excluded.tutor_id,
+        sessions = s.sessions + excluded.sessions,
+        total_minutes = s.total_minutes + excluded.total_minutes,
+        first_session = least(s.first_session, excluded.first_session),
+        last_session = greatest(s.last_session, excluded.last_session)
+"""
+
+
+def refresh_summaries(db: Session, full: bool = False) -> dict:
+    # One refresh at a time; a concurrent caller waits and then finds nothing new
+    db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": REFRESH_LOCK_ID})
+    since = db.execute(text("SELECT folded_until FROM analytics_refresh_state WHERE id = 1")).scalar()
+    full = full or since is None
+    # Read before the TRUNCATE / folds give this transaction an xid of its
+    # own, which would hold the watermark back to its start
+    until = read_watermark(since)
+    if full:
+        db.execute(text("TRUNCATE session_hourly_summary, student_session_summary"))
+        since = None
+    window = FULL_WINDOW if full else INCREMENTAL_WINDOW
+    params = {"since": since, "until": until}
+    db.execute(text(FOLD_HOURLY.format(window=window)), params)
+    db.execute(text(FOLD_STUDENTS.format(window=window)), params)
+    db.execute(
+        text("""
+            INSERT INTO analytics_refresh_state (id, folded_until, refreshed_at) VALUES (1, :until, now())
+            ON CONFLICT (id) DO UPDATE SET folded_until = excluded.folded_until, refreshed_at = excluded.refreshed_at
+        """),
+        {"until": until},
+    )
+    db.commit()
+    return {"full": full, "folded_since": since, "folded_until": until}
+
+
+@router.post("/refresh", dependencies=[Depends(require_internal_token)])
+def refresh(full: bool = False, db: Session = Depends(get_db)):
+    return refresh_summaries(db, full)
+
+
+@router.get("/sessions/summary")
+def sessions_summary(db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    params = {"tutor_id": get_tutor_id(current_user)}
+    totals = db.execute(
+        text("""
+            SELECT coalesce(sum(sessions), 0) AS sessions, coalesce(sum(total_minutes), 0) AS total_minutes,
+                   coalesce(sum(short), 0) AS short, coalesce(sum(medium), 0) AS medium,
+                   coalesce(sum(long), 0) AS long, coalesce(sum(extended), 0) AS extended
+            FROM session_hourly_summary WHERE tutor_id = :tutor_id
+        """),
+        params,
+    ).mappings().one()
+    # 0 = Monday ... 6 = Sunday, as pandas' dt.dayofweek
+    by_weekday = db.execute(
+        text("""
+            SELECT (extract(isodow FROM bucket_hour)::int - 1) AS weekday, sum(sessions) AS sessions
+            FROM session_hourly_summary WHERE tutor_id = :tutor_id GROUP BY 1 ORDER BY 1
+        """),
+        params,
+    ).mappings().all()
+    by_hour = db.execute(
+        text("""
+            SELECT extract(hour FROM bucket_hour)::int AS hour, sum(sessions) AS sessions
+            FROM session_hourly_summary WHERE tutor_id = :tutor_id GROUP BY 1 ORDER BY 1
+        """),
+        params,
+    ).mappings().all()
+    by_month = db.execute(
+        text("""
+            SELECT to_char(date_trunc('month', bucket_hour), 'YYYY-MM') AS month,
+                   sum(sessions) AS sessions, sum(total_minutes) AS total_minutes
+            FROM session_hourly_summary WHERE tutor_id = :tutor_id GROUP BY 1 ORDER BY 1
+        """),
+        params,
+    ).mappings().all()
+    sessions = totals["sessions"]
+    return {
+        "sessions": sessions,
+        "total_minutes": totals["total_minutes"],
+        "avg_duration": round(totals["total_minutes"] / sessions, 2) if sessions else None,
+        "duration_buckets": {bucket: totals[bucket] for bucket in DURATION_BUCKETS},
+        "by_weekday": by_weekday,
+        "by_hour": by_hour,
+        "by_month": by_month,
+    }
+
+
+@router.get("/tutors", dependencies=[Depends(require_internal_token)])
+def tutor_totals(
+    limit: int = Query(1000, ge=1, le=10000),
+    after_id: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return db.execute(
+        text("""
+            SELECT tutor_id, sum(sessions) AS sessions, sum(total_minutes) AS total_minutes
+            FROM session_hourly_summary
+            WHERE tutor_id > :after_id
+            GROUP BY tutor_id ORDER BY tutor_id LIMIT :limit
+        """),
+        {"after_id": after_id or 0, "limit": limit},
+    ).mappings().all()
+
+
+@router.get("/students")
+def student_totals(
+    limit: int = Query(1000, ge=1, le=10000),
+    after_id: int | None = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return db.execute(
+        text("""
+            SELECT s.student_id, s.tutor_id, st.name, st.age,
+                   s.sessions, s.total_minutes, s.first_session, s.last_session
+            FROM student_session_summary s
+            LEFT JOIN students st ON st.student_id = s.student_id
+            WHERE s.tutor_id = :tutor_id AND s.student_id > :after_id
+            ORDER BY s.student_id LIMIT :limit
+        """),
+        {"after_id": after_id or 0, "tutor_id": get_tutor_id(current_user), "limit": limit},
+    ).mappings().all()
+
+
+@router.get("/medians", dependencies=[Depends(require_internal_token)])
+def medians(db: Session = Depends(get_read_db)):
+    # The values myassignment.py imputes missing ages and durations with
+    median_age = db.execute(text("SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY age) FROM students")).scalar()
+    median_duration = db.execute(
+        text("SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY duration) FROM tutoring_sessions")
+    ).scalar()
+    return {"median_age": median_age, "median_duration": median_duration}
@@ -0,0 +1,145 @@
+import hmac
+from datetime import datetime, timedelta
+
+from fastapi import Depends, Header, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import profiling
+import revocation
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, INTERNAL_API_TOKEN, PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS
+from database import AsyncSession, get_db, get_async_db
+from models import User, Tutor
+from principal_cache import Principal, TTLCache
+
+
+# Token handling and the request dependencies that resolve the caller: the
+# tutor (get_current_user) or an internal job (require_internal_token). Used
+# by main and by the routers of the other modules.
+
+# Principals resolved by get_current_user for tokens without id claims, keyed
+# by token subject
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user_principal(mapper, connection, target):
+    principal_cache.invalidate(lambda principal: principal.id == target.id)
+
+
+@event.listens_for(Tutor, "after_insert")
+@event.listens_for(Tutor, "after_update")
+@event.listens_for(Tutor, "after_delete")
+def invalidate_tutor_principal(mapper, connection, target):
+    principal_cache.invalidate(lambda principal: principal.id == target.user_id)
+
+
+# Token families revoked within the access token lifetime; access tokens of
+# these families are refused. Each worker adds its own revocations at once and
+# picks up the other workers' every REVOCATION_SYNC_SECONDS.
+revoked_families = revocation.RevocationSet(ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+SECRET_KEY = "your-secret-key"
+ALGORITHM = "HS256"
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+# Access tokens carry the principal (uid, tid) and the family (fam) of the
+# refresh token they came from, so authenticating a request is a signature
+# check plus a revoked_families lookup. tid is fixed when the user registers;
+# a refresh re-reads both from the database.
+def encode_token(claims: dict, issued_at: datetime, expires_at: datetime) -> str:
+    return jwt.encode({**claims, "iat": issued_at, "exp": expires_at}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def create_access_token(principal: Principal, family_id: str) -> str:
+    now = datetime.utcnow()
+    claims = {"sub": principal.username, "uid": principal.id, "tid": principal.tutor_id, "fam": family_id, "type": "access"}
+    return encode_token(claims, now, now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def credentials_exception(detail: str = "Invalid credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_token(token: str, token_type: str) -> dict:
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception()
+    # Tokens issued before the type claim are access tokens
+    if claims.get("type", "access") != token_type or not claims.get("sub"):
+        raise credentials_exception()
+    # Refresh tokens are checked against their refresh_tokens row instead
+    if token_type == "access" and claims.get("fam") in revoked_families:
+        raise credentials_exception("Token has been revoked")
+    return claims
+
+
+def principal_query(criterion):
+    return (
+        select(User.id, User.username, Tutor.id)
+        .outerjoin(Tutor, Tutor.user_id == User.id)
+        .where(criterion)
+        .limit(1)
+    )
+
+
+def cache_principal(username: str, row) -> Principal:
+    if not row:
+        raise credentials_exception("User not found")
+    principal = Principal(*row)
+    principal_cache.put(username, principal)
+    return principal
+
+
+# Tokens issued before the uid/tid claims (up to ACCESS_TOKEN_EXPIRE_MINUTES
+# after an upgrade) still resolve their subject through principal_cache
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    with profiling.stage("auth"):
+        claims = decode_token(token, "access")
+        if "uid" in claims:
+            return Principal(claims["uid"], claims["sub"], claims.get("tid"))
+        username = claims["sub"]
+        principal = principal_cache.get(username)
+        if principal:
+            return principal
+        return cache_principal(username, db.execute(principal_query(User.username == username)).first())
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    with profiling.stage("auth"):
+        claims = decode_token(token, "access")
+        if "uid" in claims:
+            return Principal(claims["uid"], claims["sub"], claims.get("tid"))
+        username = claims["sub"]
+        principal = principal_cache.get(username)
+        if principal:
+            return principal
+        return cache_principal(username, (await db.execute(principal_query(User.username == username))).first())
+
+
+def get_tutor_id(current_user: Principal) -> int:
+    if current_user.tutor_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tutor not found for the current user"
+        )
+    return current_user.tutor_id
+
+
+# Endpoints run by the operator, a scheduler or another service rather than
+# by tutors (see config.INTERNAL_API_TOKEN) take INTERNAL_API_TOKEN in
+# X-Internal-Token.
+# Without one configured they refuse every request.
+def require_internal_token(x_internal_token: str = Header("")) -> None:
+    if not INTERNAL_API_TOKEN or not hmac.compare_digest(x_internal_token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoint")
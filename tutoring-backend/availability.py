@@ -0,0 +1,291 @@
+from datetime import datetime, time, timezone
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+import profiling
+from auth import get_current_user, get_tutor_id, require_internal_token
+from config import AVAILABILITY_MAX_DAYS, AVAILABILITY_MAX_TUTORS, WORK_DAYS, WORK_END, WORK_START
+from database import get_read_db
+from principal_cache import Principal
+from serialization import RowsResponse
+
+
+# Free time of tutors: their working hours minus their sessions.
+#
+# GET /tutors/{id}/availability?from=&to=&min_duration= returns one tutor's
+# open slots in [from, to) lasting at least min_duration minutes.
+# POST /tutors/availability does the same for many tutors at once (the
+# matching service) and adds the common slots: stretches in which at least
+# min_free of them (by default all) are free at every moment; with a lower
+# min_free, not necessarily the same ones throughout.
+#
+# The GET is for the tutor's own availability (an access token of that
+# tutor); the POST, across tutors, needs the internal token
+# (auth.require_internal_token).
+#
+# The sessions come from one indexed range query (WINDOW_SESSIONS), already
+# as integers. The interval math runs in NumPy over every tutor at once:
+# times are seconds from `from`, and each tutor's are shifted onto one int64
+# line by tutor index * (window + 1), so no two tutors' intervals touch.
+# Merging, subtracting and intersecting are then sorts, cumulative maxima
+# and searchsorted over flat arrays, with no loop over rows or tutors.
+router = APIRouter(prefix="/tutors", tags=["availability"], route_class=profiling.ROUTE_CLASS)
+
+SECONDS_PER_DAY = 24 * 3600
+INT64 = np.iinfo(np.int64)
+
+
+def seconds_of_day(value: time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+DEFAULT_WORK_START = seconds_of_day(time.fromisoformat(WORK_START))
+DEFAULT_WORK_END = seconds_of_day(time.fromisoformat(WORK_END))
+DEFAULT_WORK_DAYS = sum(1 << day for day in set(WORK_DAYS))
+
+
+class Slot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class TutorAvailability(BaseModel):
+    tutor_id: int
+    slots: List[Slot]
+
+
+class CommonSlot(Slot):
+    free_tutors: int
+
+
+class AvailabilityRequest(BaseModel):
+    tutor_ids: List[int] = Field(..., min_items=1, max_items=AVAILABILITY_MAX_TUTORS)
+    from_: datetime = Field(..., alias="from")
+    to: datetime
+    min_duration: int = Field(30, ge=1, description="minutes")
+    min_free: int | None = Field(None, ge=1, description="tutors free together in a common slot; default all")
+
+
+class AvailabilityResponse(BaseModel):
+    tutors: List[TutorAvailability]
+    common: List[CommonSlot]
+    not_found: List[int]
+
+
+def naive(value: datetime) -> datetime:
+    # Session dates are timestamps without time zone; an aware bound is taken as UTC
+    return value if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def check_window(start: datetime, end: datetime) -> None:
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must be later than 'from'")
+    if (end - start).total_seconds() > AVAILABILITY_MAX_DAYS * SECONDS_PER_DAY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'from' and 'to' may be at most {AVAILABILITY_MAX_DAYS} days apart",
+        )
+
+
+# Interval operations. Intervals are half-open [start, end), int64 seconds.
+def merge(starts: np.ndarray, ends: np.ndarray) -> tuple:
+    # Union, as sorted, disjoint intervals
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    # A run starts where an interval begins after everything before it ended
+    reach = np.maximum.accumulate(ends)
+    first = np.flatnonzero(np.r_[True, starts[1:] > reach[:-1]])
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def gaps(starts: np.ndarray, ends: np.ndarray) -> tuple:
+    # Complement of sorted, disjoint intervals, over the whole line
+    return np.r_[INT64.min, ends], np.r_[starts, INT64.max]
+
+
+def intersect(a_starts: np.ndarray, a_ends: np.ndarray, b_starts: np.ndarray, b_ends: np.ndarray) -> tuple:
+    # Overlaps of two lists of sorted, disjoint intervals. Interval i of a
+    # meets b[first[i]:last[i]]; the pairs are enumerated with repeat/arange.
+    first = np.searchsorted(b_ends, a_starts, side="right")
+    last = np.searchsorted(b_starts, a_ends, side="left")
+    counts = np.maximum(last - first, 0)
+    a = np.repeat(np.arange(len(a_starts)), counts)
+    b = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    starts = np.maximum(a_starts[a], b_starts[b])
+    ends = np.minimum(a_ends[a], b_ends[b])
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def coverage(starts: np.ndarray, ends: np.ndarray, at_least: int) -> tuple:
+    # Stretches covered by at least `at_least` of the intervals, with the
+    # fewest covering any moment of each: (starts, ends, counts)
+    if not len(starts):
+        return starts, ends, starts
+    times = np.r_[starts, ends]
+    steps = np.r_[np.ones(len(starts), np.int64), -np.ones(len(ends), np.int64)]
+    order = np.argsort(times, kind="stable")
+    times, depth = times[order], np.cumsum(steps[order])
+    # Depth after the last event at each distinct time holds until the next one
+    bounds, first = np.unique(times, return_index=True)
+    depth = depth[np.r_[first[1:] - 1, len(times) - 1]][:-1]
+    covered = np.flatnonzero(depth >= at_least)
+    if not len(covered):
+        return covered, covered, covered
+    run = np.flatnonzero(np.r_[True, np.diff(covered) > 1])
+    return bounds[covered[run]], bounds[np.r_[covered[run[1:] - 1], covered[-1]] + 1], np.minimum.reduceat(depth[covered], run)
+
+
+# Queries. Both return one row of arrays, which convert to NumPy far faster
+# than a row per tutor or session.
+
+# The tutors' ids, working hours (seconds after midnight) and working days,
+# ordered by id; the configured hours for tutors without their own
+WORKING_HOURS = text("""
+    SELECT array_agg(id ORDER BY id),
+           array_agg(coalesce(extract(epoch FROM work_start)::int, :default_start) ORDER BY id),
+           array_agg(coalesce(extract(epoch FROM work_end)::int, :default_end) ORDER BY id),
+           array_agg(coalesce(work_days, :default_days) ORDER BY id)
+    FROM tutors WHERE id = ANY(:tutor_ids)
+""").bindparams(
+    bindparam("tutor_ids", type_=ARRAY(Integer)),
+    default_start=DEFAULT_WORK_START,
+    default_end=DEFAULT_WORK_END,
+    default_days=DEFAULT_WORK_DAYS,
+)
+
+# The sessions that take up time in [start, end): tutor ids, starts (seconds
+# from :start) and durations (minutes). Both halves are
+# btree range scans on ix_tutoring_sessions_tutor_id_date (a period &&
+# [start, end) condition could use the GiST index of migration 0006, but
+# given the tutor list the planner picks the other key's index and reads
+# all of it): the sessions starting in the window, and each tutor's last
+# session starting before it, the only one that can still be running (the
+# exclusion constraint keeps a tutor's sessions apart; with partitioning,
+# within each month).
+WINDOW_SESSIONS = text("""
+    SELECT array_agg(tutor_id), array_agg(start_offset), array_agg(duration) FROM (
+        SELECT tutor_id, extract(epoch FROM date - :start)::bigint AS start_offset, duration
+        FROM tutoring_sessions
+        WHERE tutor_id = ANY(:tutor_ids) AND date >= :start AND date < :end AND duration > 0
+        UNION ALL
+        SELECT s.tutor_id, extract(epoch FROM s.date - :start)::bigint, s.duration
+        FROM unnest(:tutor_ids) AS t(id)
+        CROSS JOIN LATERAL (
+            SELECT tutor_id, date, duration FROM tutoring_sessions
+            WHERE tutor_id = t.id AND date < :start AND duration > 0
+            ORDER BY date DESC LIMIT 1
+        ) s
+        WHERE s.date + s.duration * interval '1 minute' > :start
+    ) sessions
+""").bindparams(bindparam("tutor_ids", type_=ARRAY(Integer)))
+
+
+def working_intervals(hours: tuple, start: datetime, end: datetime) -> tuple:
+    # Every working day of every tutor in the WORKING_HOURS row, clipped to
+    # the window: (tutor index, starts, ends) in seconds from `start`, by
+    # tutor and then time
+    window = int((end - start).total_seconds())
+    _, work_start, work_end, work_days = (np.array(column or [], np.int64) for column in hours)
+    days = np.arange(np.datetime64(start.date(), "D"), np.datetime64(end.date(), "D") + 1)
+    day_offsets = (days - np.datetime64(start, "s")).astype(np.int64)
+    weekdays = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    works = (work_days[:, None] >> weekdays[None, :]) & 1 == 1
+    starts = np.clip(day_offsets[None, :] + work_start[:, None], 0, window)
+    ends = np.clip(day_offsets[None, :] + work_end[:, None], 0, window)
+    tutor, day = np.nonzero(works & (ends > starts))
+    return tutor, starts[tutor, day], ends[tutor, day]
+
+
+def busy_intervals(sessions: tuple, tutor_ids: np.ndarray, start: datetime, end: datetime) -> tuple:
+    # The WINDOW_SESSIONS row as (tutor index, starts, ends) in seconds from `start`
+    window = int((end - start).total_seconds())
+    session_tutors, starts, durations = (np.array(column or [], np.int64) for column in sessions)
+    ends = starts + durations * 60
+    return np.searchsorted(tutor_ids, session_tutors), np.clip(starts, 0, window), np.clip(ends, 0, window)
+
+
+def free_intervals(hours: tuple, sessions: tuple, start: datetime, end: datetime) -> tuple:
+    # Working hours minus sessions, per tutor: (tutor index, starts, ends)
+    stride = int((end - start).total_seconds()) + 1
+    work_tutor, work_starts, work_ends = working_intervals(hours, start, end)
+    busy_tutor, busy_starts, busy_ends = busy_intervals(sessions, np.array(hours[0] or [], np.int64), start, end)
+    busy_starts, busy_ends = merge(busy_tutor * stride + busy_starts, busy_tutor * stride + busy_ends)
+    starts, ends = intersect(work_tutor * stride + work_starts, work_tutor * stride + work_ends, *gaps(busy_starts, busy_ends))
+    tutor = starts // stride
+    return tutor, starts - tutor * stride, ends - tutor * stride
+
+
+def slot_dicts(start: datetime, starts: np.ndarray, ends: np.ndarray) -> list:
+    origin = np.datetime64(start, "s")
+    starts = np.datetime_as_string(origin + starts.astype("timedelta64[s]"), unit="s").tolist()
+    ends = np.datetime_as_string(origin + ends.astype("timedelta64[s]"), unit="s").tolist()
+    return [{"start": s, "end": e} for s, e in zip(starts, ends)]
+
+
+@router.get("/{tutor_id}/availability", response_model=TutorAvailability, response_class=RowsResponse)
+def tutor_availability(
+    tutor_id: int,
+    from_: datetime = Query(..., alias="from"),
+    to: datetime = Query(...),
+    min_duration: int = Query(30, ge=1, description="minutes"),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if tutor_id != get_tutor_id(current_user):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tutor not found")
+    start, end = naive(from_), naive(to)
+    check_window(start, end)
+    hours = db.execute(WORKING_HOURS, {"tutor_ids": [tutor_id]}).one()
+    if not hours[0]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tutor not found")
+    sessions = db.execute(WINDOW_SESSIONS, {"tutor_ids": [tutor_id], "start": start, "end": end}).one()
+    with profiling.stage("intervals"):
+        _, starts, ends = free_intervals(hours, sessions, start, end)
+        keep = ends - starts >= min_duration * 60
+    with profiling.stage("serialize"):
+        return RowsResponse({"tutor_id": tutor_id, "slots": slot_dicts(start, starts[keep], ends[keep])})
+
+
+@router.post(
+    "/availability", response_model=AvailabilityResponse, response_class=RowsResponse,
+    dependencies=[Depends(require_internal_token)],
+)
+def bulk_availability(request: AvailabilityRequest, db: Session = Depends(get_read_db)):
+    start, end = naive(request.from_), naive(request.to)
+    check_window(start, end)
+    requested = sorted(set(request.tutor_ids))
+    hours = db.execute(WORKING_HOURS, {"tutor_ids": requested}).one()
+    found = hours[0] or []
+    sessions = db.execute(WINDOW_SESSIONS, {"tutor_ids": found, "start": start, "end": end}).one()
+    with profiling.stage("intervals"):
+        tutor, starts, ends = free_intervals(hours, sessions, start, end)
+        min_seconds = request.min_duration * 60
+        # From every free interval, as shorter ones still add up. A tutor's
+        # own intervals don't overlap, so the depth counts tutors.
+        common_starts, common_ends, free_tutors = coverage(starts, ends, request.min_free or len(found))
+        common = common_ends - common_starts >= min_seconds
+        keep = ends - starts >= min_seconds
+        tutor, starts, ends = tutor[keep], starts[keep], ends[keep]
+        bounds = np.searchsorted(tutor, np.arange(len(found) + 1))
+    with profiling.stage("serialize"):
+        slots = slot_dicts(start, starts, ends)
+        common_slots = slot_dicts(start, common_starts[common], common_ends[common])
+        for slot, count in zip(common_slots, free_tutors[common].tolist()):
+            slot["free_tutors"] = count
+        return RowsResponse({
+            "tutors": [
+                {"tutor_id": tutor_id, "slots": slots[bounds[n]:bounds[n + 1]]}
+                for n, tutor_id in enumerate(found)
+            ],
+            "common": common_slots,
+            "not_found": sorted(set(requested) - set(found)),
+        })
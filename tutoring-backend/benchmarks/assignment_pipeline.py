@@ -0,0 +1,173 @@
+# Peak RSS and wall time of the myassignment.py pipeline.
+#
+# Writes synthetic exports (Arrow IPC streams with the schema of
+# GET /export/sessions and /export/students, --null-fraction of the
+# durations, dates and ages missing) and runs each mode on them in a fresh
+# process, so every peak RSS is that run's own:
+#
+#   pipeline   myassignment.run_pipeline: chunked, narrowed dtypes, Parquet out
+#   script     what myassignment.py did before: both tables loaded whole with
+#              default dtypes, the same features computed the old way
+#              (to_datetime and pd.cut twice, .apply for is_weekend), a full
+#              merge and three CSVs (minus the one-hot of the missing
+#              `subject` column, which raised)
+#
+#   python benchmarks/assignment_pipeline.py --rows 500000 5000000
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import export  # noqa: E402
+import myassignment  # noqa: E402
+
+
+MODES = ("pipeline", "script")
+BATCH_ROWS = export.EXPORT_BATCH_SIZE
+WORDS = 2000
+
+
+def with_nulls(values: np.ndarray, rng, fraction: float) -> pa.Array:
+    return pa.array(values, mask=rng.random(len(values)) < fraction)
+
+
+def write_stream(path: str, columns, batches) -> None:
+    schema = export.arrow_schema(columns)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+        for arrays in batches:
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+
+def session_batches(rows: int, students: int, rng, null_fraction: float):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    words = np.array(["".join(rng.choice(letters, rng.integers(4, 11))) for _ in range(WORDS)], dtype=object)
+    start = np.datetime64("2023-01-01T00:00:00", "us").astype("int64")
+    span = 3 * 365 * 24 * 3600 * 10**6
+    for first in range(0, rows, BATCH_ROWS):
+        n = min(BATCH_ROWS, rows - first)
+        yield [
+            pa.array(np.arange(first + 1, first + n + 1)),
+            pa.array(rng.integers(1, students // 10 + 2, n)),
+            pa.array(rng.integers(1, students + 1, n)),
+            with_nulls((start + rng.integers(0, span, n)).astype("datetime64[us]"), rng, null_fraction),
+            with_nulls(rng.integers(30, 121, n).astype("int32"), rng, null_fraction),
+            pa.array(words[rng.integers(0, WORDS, n)] + " " + words[rng.integers(0, WORDS, n)]),
+        ]
+
+
+def student_batches(rows: int, rng, null_fraction: float):
+    for first in range(0, rows, BATCH_ROWS):
+        ids = np.arange(first + 1, first + min(BATCH_ROWS, rows - first) + 1)
+        yield [
+            pa.array(ids),
+            pa.array(rng.integers(1, rows // 10 + 2, len(ids))),
+            pa.array([f"Student {i}" for i in ids]),
+            pa.array([f"student{i}@example.com" for i in ids]),
+            with_nulls(rng.integers(12, 41, len(ids)).astype("int32"), rng, null_fraction),
+        ]
+
+
+def run_script(sessions_path: str, students_path: str, out_dir: str) -> None:
+    import pandas as pd
+
+    with open(sessions_path, "rb") as f:
+        vdf = pa.ipc.open_stream(f).read_all().to_pandas()
+    with open(students_path, "rb") as f:
+        odf = pa.ipc.open_stream(f).read_all().to_pandas()
+    vdf["duration"] = vdf["duration"].fillna(vdf["duration"].median())
+    vdf["date"] = pd.to_datetime(vdf["date"], errors="coerce")
+    vdf["date"] = vdf["date"].fillna(vdf["date"].mode()[0])
+    odf["age"] = odf["age"].fillna(odf["age"].median())
+    vdf["date"] = pd.to_datetime(vdf["date"], errors="coerce")
+    vdf["session_duration_category"] = pd.cut(vdf["duration"], bins=[0, 30, 60, 120], labels=["short", "medium", "long"])
+    vdf["session_duration_category"] = vdf["session_duration_category"].map({"short": 0, "medium": 1, "long": 2})
+    odf["student_age_category"] = pd.cut(odf["age"], bins=[0, 18, 25, 100], labels=["Under 18", "18-25", "Over 25"])
+    odf = pd.get_dummies(odf, columns=["student_age_category"], drop_first=True)
+    vdf["session_weekday"] = vdf["date"].dt.dayofweek
+    vdf["session_hour"] = vdf["date"].dt.hour
+    vdf["session_month"] = vdf["date"].dt.month
+    vdf["session_year"] = vdf["date"].dt.year
+    vdf["is_weekend"] = vdf["session_weekday"].apply(lambda x: 1 if x >= 5 else 0)
+    vdf["session_duration_category"] = pd.cut(vdf["duration"], bins=[0, 30, 60, 120], labels=["short", "medium", "long"])
+    merged_df = pd.merge(vdf, odf, on="student_id", how="left")
+    vdf.to_csv(os.path.join(out_dir, "cleaned_tutoring_sessions.csv"), index=False)
+    odf.to_csv(os.path.join(out_dir, "cleaned_students.csv"), index=False)
+    merged_df.to_csv(os.path.join(out_dir, "merged_tutoring_sessions_and_students.csv"), index=False)
+
+
+def run_one(mode: str, sessions_path: str, students_path: str, out_dir: str, chunk_size: int) -> dict:
+    # Runs in its own process (see measure)
+    started = time.perf_counter()
+    if mode == "pipeline":
+        myassignment.run_pipeline(sessions_path, students_path, out_dir, chunk_size)
+    else:
+        run_script(sessions_path, students_path, out_dir)
+    seconds = time.perf_counter() - started
+    output_bytes = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+    return {
+        "seconds": seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "output_mb": output_bytes / 2**20,
+    }
+
+
+def measure(mode: str, sessions_path: str, students_path: str, chunk_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as out_dir:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", mode, sessions_path, students_path, out_dir,
+             "--chunk-size", str(chunk_size)],
+            capture_output=True, text=True,
+        )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Peak RSS and wall time of the myassignment.py pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[500000, 5000000], help="session counts to run")
+    parser.add_argument("--students-ratio", type=int, default=10, help="sessions per student")
+    parser.add_argument("--null-fraction", type=float, default=0.01)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--chunk-size", type=int, default=myassignment.CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--run", nargs=4, metavar=("MODE", "SESSIONS", "STUDENTS", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(*args.run, args.chunk_size)))
+        return
+
+    # Imported here, not at the top: the measured runs shouldn't carry the app
+    from main import SESSION_EXPORT_COLUMNS, STUDENT_EXPORT_COLUMNS
+
+    print(f"{'sessions':>10} {'students':>10} {'mode':<10} {'seconds':>9} {'peak RSS MB':>12} {'output MB':>10}")
+    for rows in args.rows:
+        students = max(rows // args.students_ratio, 1)
+        rng = np.random.default_rng(args.seed)
+        with tempfile.TemporaryDirectory() as data_dir:
+            sessions_path = os.path.join(data_dir, "sessions.arrows")
+            students_path = os.path.join(data_dir, "students.arrows")
+            write_stream(sessions_path, SESSION_EXPORT_COLUMNS, session_batches(rows, students, rng, args.null_fraction))
+            write_stream(students_path, STUDENT_EXPORT_COLUMNS, student_batches(students, rng, args.null_fraction))
+            for mode in args.modes:
+                result = measure(mode, sessions_path, students_path, args.chunk_size)
+                if "error" in result:
+                    print(f"{rows:>10} {students:>10} {mode:<10} failed: {result['error']}")
+                else:
+                    print(f"{rows:>10} {students:>10} {mode:<10} {result['seconds']:>9.1f} "
+                          f"{result['peak_rss_mb']:>12.0f} {result['output_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,121 @@
+# Latency of the availability finder at thousands of tutors.
+#
+# For --tutors N tutors drawn from DATABASE_URL and a --days window ending
+# at the latest seeded session, times:
+#
+#   bulk       POST /tutors/availability's work: one query for the working
+#              hours, one for the sessions in the window, the NumPy interval
+#              math over all N tutors
+#   per tutor  the same, one tutor at a time, as N calls of
+#              GET /tutors/{id}/availability would
+#   python     the bulk query with the interval math done by looping over
+#              the rows in Python, for comparison
+#
+# The interval math is timed on its own too ("math ms"). Run the seeder
+# first; tutors seeded before migration 0007 work the configured hours.
+#
+#   python seeding.py --users 5000 --students 500000 --sessions 5000000 --workers 8
+#   python benchmarks/availability.py --tutors 100 1000 5000 --days 7
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import availability  # noqa: E402
+from database import engine  # noqa: E402
+
+
+def fetch(conn, tutor_ids: list, start: datetime, end: datetime) -> tuple:
+    hours = conn.execute(availability.WORKING_HOURS, {"tutor_ids": tutor_ids}).one()
+    sessions = conn.execute(availability.WINDOW_SESSIONS, {"tutor_ids": hours[0] or [], "start": start, "end": end}).one()
+    return hours, sessions
+
+
+def numpy_free(hours: tuple, sessions: tuple, start: datetime, end: datetime, min_seconds: int) -> int:
+    _, starts, ends = availability.free_intervals(hours, sessions, start, end)
+    return int((ends - starts >= min_seconds).sum())
+
+
+def python_free(hours: tuple, sessions: tuple, start: datetime, end: datetime, min_seconds: int) -> int:
+    # One tutor, one working day, one session at a time
+    busy = {}
+    for tutor_id, offset, duration in zip(*(column or [] for column in sessions)):
+        date = start + timedelta(seconds=offset)
+        busy.setdefault(tutor_id, []).append((max(date, start), min(date + timedelta(minutes=duration), end)))
+    slots = 0
+    for tutor_id, work_start, work_end, work_days in zip(*(column or [] for column in hours)):
+        sessions = sorted(busy.get(tutor_id, []))
+        day = start.date()
+        while day <= end.date():
+            if work_days >> day.weekday() & 1:
+                midnight = datetime.combine(day, datetime.min.time())
+                cursor = max(midnight + timedelta(seconds=work_start), start)
+                day_end = min(midnight + timedelta(seconds=work_end), end)
+                for session_start, session_end in sessions:
+                    if session_end <= cursor or session_start >= day_end:
+                        continue
+                    if (session_start - cursor).total_seconds() >= min_seconds:
+                        slots += 1
+                    cursor = max(cursor, session_end)
+                if (day_end - cursor).total_seconds() >= min_seconds:
+                    slots += 1
+            day += timedelta(days=1)
+    return slots
+
+
+def timed(run, repeats: int) -> tuple:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Latency of the availability finder")
+    parser.add_argument("--tutors", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--days", type=int, default=7, help="window length")
+    parser.add_argument("--min-duration", type=int, default=30, help="minutes")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per measurement; the median is shown")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    min_seconds = args.min_duration * 60
+
+    with engine.connect() as conn:
+        all_ids = conn.execute(text("SELECT id FROM tutors ORDER BY id")).scalars().all()
+        last = conn.execute(text("SELECT max(date) FROM tutoring_sessions")).scalar()
+        end = datetime.combine(last.date(), datetime.min.time())
+        start = end - timedelta(days=args.days)
+        print(f"{len(all_ids)} tutors, window {start:%Y-%m-%d} to {end:%Y-%m-%d}\n")
+        print(f"{'tutors':>7} {'sessions':>9} {'slots':>7} {'mode':<10} {'ms':>9} {'math ms':>9}")
+        rng = random.Random(args.seed)
+        for count in args.tutors:
+            tutor_ids = sorted(rng.sample(all_ids, min(count, len(all_ids))))
+            hours, sessions = fetch(conn, tutor_ids, start, end)
+            tutor_count, session_count = len(hours[0] or []), len(sessions[0] or [])
+
+            bulk_ms, slots = timed(lambda: numpy_free(*fetch(conn, tutor_ids, start, end), start, end, min_seconds), args.repeats)
+            math_ms, _ = timed(lambda: numpy_free(hours, sessions, start, end, min_seconds), args.repeats)
+            print(f"{tutor_count:>7} {session_count:>9} {slots:>7} {'bulk':<10} {bulk_ms:>9.1f} {math_ms:>9.1f}")
+
+            def per_tutor():
+                return sum(numpy_free(*fetch(conn, [tutor_id], start, end), start, end, min_seconds) for tutor_id in tutor_ids)
+            per_tutor_ms, per_tutor_slots = timed(per_tutor, max(1, args.repeats // 5))
+            print(f"{tutor_count:>7} {session_count:>9} {per_tutor_slots:>7} {'per tutor':<10} {per_tutor_ms:>9.1f} {'':>9}")
+
+            python_ms, python_slots = timed(lambda: python_free(*fetch(conn, tutor_ids, start, end), start, end, min_seconds), args.repeats)
+            python_math_ms, _ = timed(lambda: python_free(hours, sessions, start, end, min_seconds), args.repeats)
+            print(f"{tutor_count:>7} {session_count:>9} {python_slots:>7} {'python':<10} {python_ms:>9.1f} {python_math_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+# Bytes on the wire and server CPU of the list responses, by fieldset and
+# content coding.
+#
+# Logs in as the seeded tutor of DATABASE_URL with the most sessions and,
+# through the app in-process (no rate limits, no response cache), fetches
+#
+#   students     GET /students/
+#   sessions     GET /sessions/
+#   unprotected  GET /sessions/unprotected?limit=10000
+#
+# with every field and with a ?fields= subset, once per content coding. For
+# each it shows the bytes sent, the ratio to the uncompressed full response,
+# the request's median wall time and the CPU time of the compression alone
+# (the body compressed --repeats times at the configured level).
+#
+#   python seeding.py --users 5000 --students 500000 --sessions 5000000 --workers 8
+#   python benchmarks/compression.py --repeats 20
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["RATE_LIMIT_URL"] = ""
+os.environ["RESPONSE_CACHE_URL"] = ""
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+import response_compression  # noqa: E402
+from database import engine  # noqa: E402
+from seeding import SEED_PASSWORD  # noqa: E402
+
+# (name, path, ?fields= subset)
+ENDPOINTS = [
+    ("students", "/students/", "name"),
+    ("sessions", "/sessions/", "date,duration"),
+    ("unprotected", "/sessions/unprotected?limit=10000", "tutor_id,date"),
+]
+LEVELS = {"gzip": main.GZIP_LEVEL, "br": main.BROTLI_QUALITY, "zstd": main.ZSTD_LEVEL}
+
+BUSIEST_TUTOR = text("""
+    SELECT u.username FROM users u JOIN tutors t ON t.user_id = u.id
+    WHERE t.id = (SELECT tutor_id FROM tutoring_sessions GROUP BY tutor_id ORDER BY count(*) DESC LIMIT 1)
+""")
+
+
+def fetch(client: TestClient, path: str, headers: dict, coding: str, repeats: int) -> tuple:
+    # (median ms, bytes as sent); iter_raw skips httpx's decoding
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with client.stream("GET", path, headers={**headers, "Accept-Encoding": coding}) as response:
+            body = b"".join(response.iter_raw())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+
+def compress_cpu_ms(coding: str, body: bytes, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.process_time()
+        response_compression.compress(coding, LEVELS, body)
+        timings.append((time.process_time() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Response size and compression cost of the list endpoints")
+    parser.add_argument("--repeats", type=int, default=10, help="runs per measurement; the median is shown")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        username = conn.execute(BUSIEST_TUTOR).scalar()
+    client = TestClient(main.app)
+    token = client.post("/token/", data={"username": username, "password": SEED_PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    codings = ["identity"] + [coding for coding in ("gzip", "br", "zstd") if response_compression.available(coding)]
+    print(f"tutor {username}; levels gzip {LEVELS['gzip']}, br {LEVELS['br']}, zstd {LEVELS['zstd']}\n")
+    print(f"{'endpoint':<12} {'fields':<14} {'coding':<9} {'bytes':>10} {'ratio':>7} {'request ms':>11} {'cpu ms':>8}")
+
+    for name, path, subset in ENDPOINTS:
+        full_bytes = None
+        for fields in (None, subset):
+            url = path if fields is None else f"{path}{'&' if '?' in path else '?'}fields={fields}"
+            _, identity = fetch(client, url, headers, "identity", 1)
+            full_bytes = full_bytes or len(identity)
+            for coding in codings:
+                request_ms, body = fetch(client, url, headers, coding, args.repeats)
+                cpu_ms = 0.0 if coding == "identity" else compress_cpu_ms(coding, identity, args.repeats)
+                print(f"{name:<12} {fields or 'all':<14} {coding:<9} {len(body):>10} {len(body) / full_bytes:>7.3f} "
+                      f"{request_ms:>11.2f} {cpu_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main_cli()
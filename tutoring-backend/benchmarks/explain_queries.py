@@ -0,0 +1,136 @@
+# EXPLAIN ANALYZE for the statements behind the tutor-scoped endpoints, with
+# and without the composite indexes from migration 0002.
+#
+# Everything runs inside transactions that are rolled back: the "before" pass
+# drops the indexes first (DROP INDEX is transactional in Postgres, but holds an
+# exclusive lock on the tables until the rollback, so point it at a copy of
+# the data rather than a live database), and the write statements are
+# executed by EXPLAIN ANALYZE but never committed.
+#
+#   python benchmarks/explain_queries.py --repeat 5
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import datetime
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import main  # noqa: E402
+from database import engine  # noqa: E402
+from models import Student, TutoringSession, User  # noqa: E402
+
+
+def revision_indexes(revision: str = "0002") -> list:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    scripts = ScriptDirectory.from_config(config)
+    return [name for name, _, _ in scripts.get_revision(revision).module.INDEXES]
+
+
+def sample_ids(conn) -> dict:
+    # The tutor with the most sessions, so the scans have something to skip
+    tutor_id, user_id = conn.execute(text("""
+        SELECT t.id, t.user_id FROM tutors t
+        JOIN tutoring_sessions s ON s.tutor_id = t.id
+        GROUP BY t.id ORDER BY count(*) DESC LIMIT 1
+    """)).first()
+    username = conn.execute(select(User.username).where(User.id == user_id)).scalar()
+    student_id = conn.execute(select(Student.student_id).where(Student.tutor_id == tutor_id).limit(1)).scalar()
+    session_id = conn.execute(select(TutoringSession.id).where(TutoringSession.tutor_id == tutor_id).limit(1)).scalar()
+    middle_id = conn.execute(text("SELECT max(id) / 2 FROM tutoring_sessions")).scalar()
+    return {"tutor_id": tutor_id, "username": username, "student_id": student_id, "session_id": session_id, "middle_id": middle_id}
+
+
+def endpoint_statements(ids: dict) -> dict:
+    tutor_id = ids["tutor_id"]
+    student = main.StudentCreate(name="Explain", email="explain@example.com", age=30)
+    session = main.SessionCreate(student_id=ids["student_id"], date=datetime(2024, 1, 1, 10), duration=60, topic="explain")
+    return {
+        "auth principal": main.principal_query(ids["username"]),
+        "GET /students/": select(Student).where(Student.tutor_id == tutor_id),
+        "GET /sessions/": select(TutoringSession).where(TutoringSession.tutor_id == tutor_id),
+        "GET /sessions/unprotected": select(TutoringSession).where(TutoringSession.id > ids["middle_id"]).order_by(TutoringSession.id).limit(main.PAGE_SIZE_DEFAULT),
+        "POST /students/": main.insert_student_stmt(tutor_id, student),
+        "PUT /students/{id}/": main.update_student_stmt(tutor_id, ids["student_id"], student),
+        "POST /sessions/": main.insert_session_stmt(tutor_id, session),
+        "PUT /sessions/{id}/": main.update_session_stmt(tutor_id, ids["session_id"], session),
+        "DELETE /sessions/{id}/": main.delete_session_stmt(tutor_id, ids["session_id"]),
+        "DELETE /students/{id}/": main.delete_student_stmt(tutor_id, ids["student_id"]),
+    }
+
+
+# Run (untimed) before the statement, inside the same savepoint: the API
+# refuses to delete a student that still has sessions
+SETUP = {
+    "DELETE /students/{id}/": lambda ids: delete(TutoringSession).where(TutoringSession.student_id == ids["student_id"]),
+}
+
+
+def explain(conn, stmt) -> dict:
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    plan = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiled.string, compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def top_node(plan: dict) -> str:
+    node = plan["Plan"]
+    # Look through ModifyTable/Limit wrappers to the node that finds the rows
+    while node.get("Plans") and node["Node Type"] in ("ModifyTable", "Limit", "Result"):
+        node = node["Plans"][0]
+    index = node.get("Index Name")
+    return f"{node['Node Type']} on {index}" if index else node["Node Type"]
+
+
+def run_pass(ids: dict, statements: dict, repeat: int, drop_indexes: bool) -> dict:
+    results = {}
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            if drop_indexes:
+                for name in revision_indexes():
+                    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+            for label, stmt in statements.items():
+                timings = []
+                for _ in range(repeat):
+                    savepoint = conn.begin_nested()
+                    if label in SETUP:
+                        conn.execute(SETUP[label](ids))
+                    plan = explain(conn, stmt)
+                    savepoint.rollback()
+                    timings.append(plan["Execution Time"])
+                results[label] = {"ms": statistics.median(timings), "plan": top_node(plan)}
+        finally:
+            transaction.rollback()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the endpoint queries with and without the 0002 indexes")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per statement; the median is reported")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        ids = sample_ids(conn)
+    statements = endpoint_statements(ids)
+    before = run_pass(ids, statements, args.repeat, drop_indexes=True)
+    after = run_pass(ids, statements, args.repeat, drop_indexes=False)
+
+    print(f"tutor_id={ids['tutor_id']}  median of {args.repeat} runs, execution time in ms\n")
+    print(f"{'statement':<26} {'before':>10} {'after':>10}  plan before -> after")
+    for label in statements:
+        b, a = before[label], after[label]
+        print(f"{label:<26} {b['ms']:>10.3f} {a['ms']:>10.3f}  {b['plan']} -> {a['plan']}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,363 @@
+# Load test for the tutoring API.
+#
+# Optionally (re)seeds the database in DATABASE_URL to a fixed scale, starts
+# the app under uvicorn with N workers, logs in one virtual user per
+# concurrent client (each a different seeded tutor) and has them run a
+# weighted mix of requests for a fixed time. Reports throughput, p50/p95/p99
+# latency and SQL statements per request for every operation and saves the
+# whole run as JSON, so runs can be compared with --compare.
+#
+#   python benchmarks/load_test.py --scale small --workers 4 --concurrency 50 --duration 60
+#   python benchmarks/load_test.py --workers 4 --concurrency 50 --compare results/load-....json
+#
+# --scale TRUNCATES users, tutors, students and tutoring_sessions before
+# seeding; without it the data already in the database is used. Seeded users
+# are named user<id> with seeding.SEED_PASSWORD.
+#
+# Statement counts come from the X-DB-Statements header (DB_STATS_HEADERS=1 is
+# set for the server), since /metrics only covers whichever worker answers.
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import create_engine, text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from config import DATABASE_URL  # noqa: E402
+from seeding import SEED_PASSWORD  # noqa: E402
+
+
+SCALES = {
+    "small": {"users": 100, "students": 5000, "sessions": 50000},
+    "medium": {"users": 1000, "students": 50000, "sessions": 1000000},
+    "large": {"users": 5000, "students": 500000, "sessions": 5000000},
+}
+DEFAULT_MIX = "login=5,list_students=30,list_sessions=40,create_session=15,update_session=10"
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(command: list, env: dict | None = None) -> None:
+    subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True)
+
+
+def seed_database(scale: dict, workers: int) -> float:
+    started = time.perf_counter()
+    run([sys.executable, "-m", "alembic", "upgrade", "head"])
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "TRUNCATE users, tutors, students, tutoring_sessions, session_hourly_summary, "
+            "student_session_summary, analytics_refresh_state RESTART IDENTITY CASCADE"
+        ))
+    engine.dispose()
+    run([
+        sys.executable, "seeding.py", "--users", str(scale["users"]), "--students", str(scale["students"]),
+        "--sessions", str(scale["sessions"]), "--workers", str(workers),
+    ])
+    return time.perf_counter() - started
+
+
+def dataset_size() -> dict:
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        size = {
+            table: conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            for table in ("users", "tutors", "students", "tutoring_sessions")
+        }
+    engine.dispose()
+    return size
+
+
+def tutor_usernames(count: int) -> list:
+    # Seeded tutors that have students, busiest first
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        names = conn.execute(text("""
+            SELECT u.username FROM users u
+            JOIN tutors t ON t.user_id = u.id
+            JOIN students s ON s.tutor_id = t.id
+            WHERE u.username LIKE 'user%'
+            GROUP BY u.id ORDER BY count(*) DESC LIMIT :count
+        """), {"count": count}).scalars().all()
+    engine.dispose()
+    if not names:
+        raise SystemExit("no seeded tutors with students; run with --scale")
+    return names
+
+
+def start_server(port: int, workers: int, db_async: bool, extra_env: dict) -> subprocess.Popen:
+    # Virtual users send requests back to back, far past any per-user rate
+    # limit; --server-env RATE_LIMIT_URL=memory:// measures with it on
+    env = dict(os.environ, DB_ASYNC="1" if db_async else "0", DB_STATS_HEADERS="1", RATE_LIMIT_URL="")
+    env.update(extra_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        # Own process group, so stop_server reaches the worker processes too
+        start_new_session=True,
+    )
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, username: str, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.headers = {}
+        self.student_ids = []
+        self.session_ids = []
+
+    async def setup(self) -> None:
+        await self.login()
+        self.student_ids = [student["id"] for student in (await self.client.get("/students/", headers=self.headers)).json()]
+        self.session_ids = [session["id"] for session in (await self.client.get("/sessions/", headers=self.headers)).json()]
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post("/token/", data={"username": self.username, "password": SEED_PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def list_students(self) -> httpx.Response:
+        return await self.client.get("/students/", headers=self.headers)
+
+    async def list_sessions(self) -> httpx.Response:
+        # A calendar month somewhere in the seeded year
+        start = datetime.now() - timedelta(days=self.rng.randrange(365))
+        start = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + timedelta(days=32)).replace(day=1)
+        params = {"from": start.isoformat(), "to": end.isoformat()}
+        return await self.client.get("/sessions/", params=params, headers=self.headers)
+
+    def session_payload(self) -> dict:
+        date = datetime.now() - timedelta(days=self.rng.randrange(365), hours=self.rng.randrange(24))
+        return {
+            "student_id": self.rng.choice(self.student_ids),
+            "date": date.replace(minute=0, second=0, microsecond=0).isoformat(),
+            "duration": self.rng.randrange(30, 121),
+            "topic": "load test",
+        }
+
+    async def create_session(self) -> httpx.Response:
+        response = await self.client.post("/sessions/", json=self.session_payload(), headers=self.headers)
+        if response.status_code == 200:
+            self.session_ids.append(response.json()["id"])
+        return response
+
+    async def update_session(self) -> httpx.Response:
+        if not self.session_ids:
+            return await self.create_session()
+        session_id = self.rng.choice(self.session_ids)
+        return await self.client.put(f"/sessions/{session_id}/", json=self.session_payload(), headers=self.headers)
+
+
+OPERATIONS = {
+    "login": VirtualUser.login,
+    "list_students": VirtualUser.list_students,
+    "list_sessions": VirtualUser.list_sessions,
+    "create_session": VirtualUser.create_session,
+    "update_session": VirtualUser.update_session,
+}
+
+
+async def drive(base_url: str, usernames: list, mix: dict, warmup: float, duration: float, seed: int) -> dict:
+    concurrency = len(usernames)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        await wait_until_up(client)
+        users = [VirtualUser(client, name, random.Random(seed * 100003 + n)) for n, name in enumerate(usernames)]
+        await asyncio.gather(*(user.setup() for user in users))
+
+        samples = {name: [] for name in mix}
+        names, weights = list(mix), list(mix.values())
+        started = time.monotonic()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def loop(user: VirtualUser):
+            while (now := time.monotonic()) < stop_at:
+                name = user.rng.choices(names, weights)[0]
+                request_started = time.perf_counter()
+                try:
+                    response = await OPERATIONS[name](user)
+                    status, statements = response.status_code, response.headers.get("x-db-statements")
+                except httpx.TransportError:
+                    status, statements = None, None
+                if now >= measure_from:
+                    samples[name].append((time.perf_counter() - request_started, status, statements))
+
+        await asyncio.gather(*(loop(user) for user in users))
+    return samples
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank percentile
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def summarize(samples: list, duration: float) -> dict:
+    if not samples:
+        return {"requests": 0}
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    # A session create/update landing on a booked slot gets a 409, and a
+    # request over the rate or concurrency limits a 429; that's the API
+    # working, so they're counted apart from the errors
+    conflicts = sum(1 for _, status, _ in samples if status == 409)
+    throttled = sum(1 for _, status, _ in samples if status == 429)
+    errors = sum(1 for _, status, _ in samples if status is None or status >= 400) - conflicts - throttled
+    statements = [int(count) for _, _, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "conflicts": conflicts,
+        "throttled": throttled,
+        "throughput_rps": round(len(samples) / duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "db_statements_per_request": round(statistics.fmean(statements), 2) if statements else None,
+    }
+
+
+def git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def print_report(results: dict, baseline: dict | None) -> None:
+    print(f"\n{'operation':<16} {'req':>8} {'err':>6} {'409':>6} {'429':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'stmts':>6}")
+    for name, row in results["operations"].items():
+        if not row["requests"]:
+            continue
+        stmts = row["db_statements_per_request"]
+        print(f"{name:<16} {row['requests']:>8} {row['errors']:>6} {row.get('conflicts', 0):>6} {row.get('throttled', 0):>6} {row['throughput_rps']:>9} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {'' if stmts is None else stmts:>6}")
+        previous = (baseline or {}).get("operations", {}).get(name)
+        if previous and previous.get("requests"):
+            deltas = "  ".join(
+                f"{key} {(row[key] - previous[key]) / previous[key] * 100:+.1f}%"
+                for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms") if previous[key]
+            )
+            print(f"{'':<16} vs baseline: {deltas}")
+
+
+def parse_env(values: list) -> dict:
+    env = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        env[name] = setting
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed, start and load-test the tutoring API")
+    parser.add_argument("--scale", choices=SCALES, help="truncate and reseed to this size first")
+    parser.add_argument("--seed-workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--db-async", action="store_true", help="serve with DB_ASYNC=1")
+    parser.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the server, e.g. RESPONSE_CACHE_URL=")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users, one tutor each")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=10.0, help="unmeasured seconds before that")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the request mix")
+    parser.add_argument("--label", default="", help="free text stored with the results")
+    parser.add_argument("--output", help="results file (default benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+    mix = args.mix
+
+    seed_seconds = seed_database(SCALES[args.scale], args.seed_workers) if args.scale else None
+    usernames = tutor_usernames(args.concurrency)
+    if len(usernames) < args.concurrency:
+        print(f"only {len(usernames)} seeded tutors; some of them get more than one virtual user")
+        usernames = [usernames[n % len(usernames)] for n in range(args.concurrency)]
+
+    server = start_server(args.port, args.workers, args.db_async, parse_env(args.server_env))
+    try:
+        samples = asyncio.run(drive(f"http://127.0.0.1:{args.port}", usernames, mix, args.warmup, args.duration, args.seed))
+    finally:
+        stop_server(server)
+
+    everything = [sample for rows in samples.values() for sample in rows]
+    results = {
+        "label": args.label,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "scale": args.scale, "workers": args.workers, "db_async": args.db_async, "server_env": parse_env(args.server_env),
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup, "mix": mix, "seed": args.seed,
+        },
+        "dataset": dataset_size(),
+        "seed_seconds": round(seed_seconds, 1) if seed_seconds is not None else None,
+        "overall": summarize(everything, args.duration),
+        "operations": {name: summarize(rows, args.duration) for name, rows in samples.items()},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report({"operations": {**results["operations"], "overall": results["overall"]}}, baseline and {
+        "operations": {**baseline["operations"], "overall": baseline["overall"]}
+    })
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Unpartitioned vs monthly-partitioned tutoring_sessions.
+#
+# Copies the sessions in DATABASE_URL into two scratch tables, one plain and
+# one laid out the way `partitioning.py convert` does it, both with the
+# model's indexes, then times the same queries against each:
+#
+#   tutor month   GET /sessions/?from=&to= for one tutor and one month
+#   tutor all     GET /sessions/ without filters
+#   all tutors    a week of sessions across every tutor (reporting shape)
+#   retire month  removing the oldest month: DELETE vs DETACH + DROP
+#
+# Seed a realistic volume first, e.g.
+#
+#   python seeding.py --users 2000 --students 200000 --sessions 5000000 --workers 8
+#   python benchmarks/partitioning.py --runs 200
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+from sqlalchemy import text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import partitioning  # noqa: E402
+from database import engine  # noqa: E402
+
+
+FLAT = "bench_sessions_flat"
+MONTHLY = "bench_sessions_monthly"
+COLUMNS = partitioning.COLUMNS
+
+QUERIES = {
+    "tutor month": """
+        SELECT * FROM {table} WHERE tutor_id = :tutor_id AND date >= :month AND date < :next_month
+        ORDER BY date, id
+    """,
+    "tutor all": "SELECT * FROM {table} WHERE tutor_id = :tutor_id ORDER BY date, id",
+    "all tutors": """
+        SELECT count(*), sum(duration) FROM {table} WHERE date >= :week AND date < :week + interval '7 days'
+    """,
+}
+
+
+def build(conn) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    conn.execute(text(f"CREATE TABLE {FLAT} (LIKE tutoring_sessions INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    conn.execute(text(f"INSERT INTO {FLAT} ({COLUMNS}) SELECT {COLUMNS} FROM tutoring_sessions"))
+    conn.execute(text(f"ALTER TABLE {FLAT} ADD PRIMARY KEY (id)"))
+    partitioning.create_indexes(conn, FLAT)
+    timings[FLAT] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first, last = conn.execute(text("SELECT min(date), max(date) FROM tutoring_sessions")).first()
+    partitioning.create_partitioned_table(conn, MONTHLY)
+    partitioning.create_partitions(conn, first, last, MONTHLY)
+    conn.execute(text(f"INSERT INTO {MONTHLY} ({COLUMNS}) SELECT {COLUMNS} FROM tutoring_sessions"))
+    conn.execute(text(f"CREATE UNIQUE INDEX {MONTHLY}_id_date_key ON {MONTHLY} (id, date)"))
+    partitioning.create_indexes(conn, MONTHLY)
+    timings[MONTHLY] = time.perf_counter() - started
+    return timings
+
+
+def total_size(conn, table: str) -> int:
+    # Heap + indexes, summed over the partitions for the partitioned table
+    return conn.execute(
+        text("""
+            SELECT coalesce(sum(pg_total_relation_size(relid)), pg_total_relation_size(to_regclass(:table)))
+            FROM pg_partition_tree(:table)
+        """),
+        {"table": table},
+    ).scalar()
+
+
+def sample_params(conn, runs: int, seed: int) -> list:
+    rng = random.Random(seed)
+    tutor_ids = conn.execute(text(f"SELECT DISTINCT tutor_id FROM {FLAT}")).scalars().all()
+    first, last = conn.execute(text(f"SELECT min(date), max(date) FROM {FLAT}")).first()
+    months = []
+    month = partitioning.month_start(first)
+    while month <= last.date():
+        months.append(month)
+        month = partitioning.add_months(month, 1)
+    days = (last - first).days
+    params = []
+    for _ in range(runs):
+        month = rng.choice(months)
+        params.append({
+            "tutor_id": rng.choice(tutor_ids),
+            "month": month,
+            "next_month": partitioning.add_months(month, 1),
+            "week": first + timedelta(days=rng.randrange(max(days - 7, 1))),
+        })
+    return params
+
+
+def time_query(conn, sql: str, params: list) -> dict:
+    statement = text(sql)
+    timings = []
+    for values in params:
+        started = time.perf_counter()
+        conn.execute(statement, values).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {"median": statistics.median(timings), "p95": timings[int(len(timings) * 0.95) - 1]}
+
+
+def partitions_scanned(conn, sql: str, values: dict) -> int:
+    plan = "\n".join(conn.execute(text("EXPLAIN " + sql), values).scalars())
+    return len(set(re.findall(rf"Scan (?:using \S+ )?on ({MONTHLY}_(?:p\d{{6}}|default))\b", plan)))
+
+
+def retire_oldest_month(conn) -> dict:
+    # Each runs in a savepoint that is rolled back, so both see the same data
+    oldest, name = min(partitioning.partitions(conn, MONTHLY).items())
+    boundary = partitioning.add_months(oldest, 1)
+    timings = {}
+
+    transaction = conn.begin_nested()
+    started = time.perf_counter()
+    rows = conn.execute(text(f"DELETE FROM {FLAT} WHERE date < :boundary"), {"boundary": boundary}).rowcount
+    timings[FLAT] = (time.perf_counter() - started) * 1000
+    transaction.rollback()
+
+    transaction = conn.begin_nested()
+    started = time.perf_counter()
+    conn.execute(text(f"ALTER TABLE {MONTHLY} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    timings[MONTHLY] = (time.perf_counter() - started) * 1000
+    transaction.rollback()
+    return {"rows": rows, "month": oldest, **timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare unpartitioned and monthly-partitioned session tables")
+    parser.add_argument("--runs", type=int, default=200, help="queries per workload and layout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch tables behind")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text(f"DROP TABLE IF EXISTS {FLAT}, {MONTHLY}"))
+            build_seconds = build(conn)
+            conn.execute(text(f"ANALYZE {FLAT}, {MONTHLY}"))
+        try:
+            rows = conn.execute(text(f"SELECT count(*) FROM {FLAT}")).scalar()
+            partition_count = len(partitioning.partitions(conn, MONTHLY))
+            print(f"{rows} sessions, {partition_count} monthly partitions\n")
+            print(f"{'layout':<24} {'build s':>9} {'size MB':>9}")
+            for table in (FLAT, MONTHLY):
+                print(f"{table:<24} {build_seconds[table]:>9.1f} {total_size(conn, table) / 2**20:>9.0f}")
+
+            params = sample_params(conn, args.runs, args.seed)
+            print(f"\n{'workload':<14} {'layout':<24} {'median ms':>10} {'p95 ms':>10} {'partitions':>11}")
+            for label, sql in QUERIES.items():
+                for table in (FLAT, MONTHLY):
+                    query = sql.format(table=table)
+                    # Warm the cache so both layouts are measured from memory
+                    time_query(conn, query, params[:20])
+                    result = time_query(conn, query, params)
+                    scanned = partitions_scanned(conn, query, params[0]) if table == MONTHLY else ""
+                    print(f"{label:<14} {table:<24} {result['median']:>10.2f} {result['p95']:>10.2f} {scanned:>11}")
+
+            transaction = conn.begin()
+            try:
+                retired = retire_oldest_month(conn)
+            finally:
+                transaction.rollback()
+            print(f"\nretire {retired['month']:%Y-%m} ({retired['rows']} rows): "
+                  f"DELETE {retired[FLAT]:.0f} ms, DETACH + DROP {retired[MONTHLY]:.0f} ms")
+        finally:
+            if not args.keep:
+                with conn.begin():
+                    conn.execute(text(f"DROP TABLE IF EXISTS {FLAT}, {MONTHLY}"))
+
+
+if __name__ == "__main__":
+    main()
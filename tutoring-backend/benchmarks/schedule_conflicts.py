@@ -0,0 +1,163 @@
+# Latency of the double-booking check at the seeded scale.
+#
+# Samples --runs seeded sessions from DATABASE_URL and, for each, times the
+# statement POST /sessions/ runs (main.insert_session_stmt) when the new
+# session:
+#
+#   conflict   starts 15 minutes into the sampled one: the exclusion
+#              constraint rejects it
+#   probe      the search the constraint makes for that insert, run as a
+#              query: the tutor's sessions whose period overlaps the new one
+#   free       goes into the same tutor's free hour before the first slot of
+#              the day (rolled back, so the data doesn't change)
+#   lookup     main.conflicting_session_stmt, the extra query a 409 runs to
+#              return the clashing session
+#   python     what the check would cost in the app: the tutor's whole list
+#              (main.tutor_sessions_stmt) scanned for an overlap
+#
+#   python seeding.py --users 5000 --students 500000 --sessions 5000000 --workers 8
+#   python benchmarks/schedule_conflicts.py --runs 500
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import main  # noqa: E402
+from database import engine  # noqa: E402
+from seeding import FIRST_SLOT_HOUR  # noqa: E402
+
+
+SAMPLE = text("""
+    SELECT tutor_id, student_id, date, duration FROM tutoring_sessions TABLESAMPLE SYSTEM (:percent)
+    WHERE period IS NOT NULL LIMIT :rows
+""")
+
+
+def summarize(timings: list, outcomes: list) -> dict:
+    timings = sorted(timings)
+    return {
+        "median": statistics.median(timings),
+        "p95": timings[max(int(len(timings) * 0.95) - 1, 0)],
+        "p99": timings[max(int(len(timings) * 0.99) - 1, 0)],
+        "ok": sum(outcomes),
+    }
+
+
+def timed_insert(conn, tutor_id: int, session) -> tuple:
+    # (milliseconds, IntegrityError or None); always rolled back
+    transaction = conn.begin()
+    started = time.perf_counter()
+    try:
+        conn.execute(main.insert_session_stmt(tutor_id, session)).first()
+        error = None
+    except IntegrityError as e:
+        error = e
+    elapsed = (time.perf_counter() - started) * 1000
+    transaction.rollback()
+    return elapsed, error
+
+
+def time_conflicts(conn, samples: list) -> tuple:
+    timings, outcomes, errors = [], [], []
+    for tutor_id, student_id, date, duration in samples:
+        session = main.SessionCreate(student_id=student_id, date=date + timedelta(minutes=15), duration=duration, topic="benchmark")
+        elapsed, error = timed_insert(conn, tutor_id, session)
+        timings.append(elapsed)
+        outcomes.append(error is not None and main.conflicting_session_stmt(error) is not None)
+        if error is not None:
+            errors.append(error)
+    return summarize(timings, outcomes), errors
+
+
+def time_probes(conn, samples: list) -> dict:
+    sessions = main.sessions_table
+    timings, outcomes = [], []
+    for tutor_id, _, date, duration in samples:
+        period = func.tsrange(date + timedelta(minutes=15), date + timedelta(minutes=15 + duration))
+        stmt = select(sessions.c.id).where(sessions.c.tutor_id == tutor_id, sessions.c.period.op("&&")(period)).limit(1)
+        started = time.perf_counter()
+        row = conn.execute(stmt).first()
+        timings.append((time.perf_counter() - started) * 1000)
+        outcomes.append(row is not None)
+    return summarize(timings, outcomes)
+
+
+def time_free(conn, samples: list) -> dict:
+    timings, outcomes = [], []
+    for tutor_id, student_id, date, _ in samples:
+        start = date.replace(hour=FIRST_SLOT_HOUR - 1, minute=0, second=0, microsecond=0)
+        session = main.SessionCreate(student_id=student_id, date=start, duration=60, topic="benchmark")
+        elapsed, error = timed_insert(conn, tutor_id, session)
+        timings.append(elapsed)
+        outcomes.append(error is None)
+    return summarize(timings, outcomes)
+
+
+def time_lookups(conn, errors: list) -> dict:
+    timings, outcomes = [], []
+    for error in errors:
+        started = time.perf_counter()
+        row = conn.execute(main.conflicting_session_stmt(error)).first()
+        timings.append((time.perf_counter() - started) * 1000)
+        outcomes.append(row is not None)
+    return summarize(timings, outcomes)
+
+
+def time_python_check(conn, samples: list) -> dict:
+    timings, outcomes = [], []
+    for tutor_id, _, date, duration in samples:
+        start, end = date + timedelta(minutes=15), date + timedelta(minutes=15 + duration)
+        started = time.perf_counter()
+        rows = conn.execute(main.tutor_sessions_stmt(tutor_id, [])).mappings().all()
+        clash = any(
+            row["date"] is not None and row["duration"] and row["date"] < end
+            and start < row["date"] + timedelta(minutes=row["duration"])
+            for row in rows
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        outcomes.append(clash)
+    return summarize(timings, outcomes)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Latency of the session overlap check")
+    parser.add_argument("--runs", type=int, default=500, help="sessions to sample")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT count(*) FROM tutoring_sessions")).scalar()
+        tutors = conn.execute(text("SELECT count(DISTINCT tutor_id) FROM tutoring_sessions")).scalar()
+        # Pages enough for about twice the rows needed
+        percent = min(100.0, 200.0 * args.runs / max(count, 1))
+        samples = conn.execute(SAMPLE, {"percent": percent, "rows": args.runs}).all()
+        random.Random(args.seed).shuffle(samples)
+        print(f"{count} sessions, {tutors} tutors, {len(samples)} samples\n")
+
+        # Warm the cache so every workload is measured from memory
+        time_conflicts(conn, samples[:20])
+        conflict, errors = time_conflicts(conn, samples)
+        results = {
+            "conflict": conflict,
+            "probe": time_probes(conn, samples),
+            "free": time_free(conn, samples),
+            "lookup": time_lookups(conn, errors),
+            "python": time_python_check(conn, samples),
+        }
+    print(f"{'workload':<10} {'median ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'expected':>10}")
+    for workload, result in results.items():
+        print(f"{workload:<10} {result['median']:>10.3f} {result['p95']:>10.3f} {result['p99']:>10.3f} "
+              f"{result['ok']:>5}/{len(samples):<4}")
+
+
+if __name__ == "__main__":
+    main_cli()
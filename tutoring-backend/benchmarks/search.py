@@ -0,0 +1,122 @@
+# Latency of GET /students/search and GET /sessions/search at the seeded scale.
+#
+# Draws --runs (tutor, query) pairs per workload from the data in
+# DATABASE_URL: a whole word of a student name / session topic, its first
+# three letters, and the word with two letters swapped (a typo). Each query
+# runs the endpoint's statement (main.student_search_stmt /
+# session_search_stmt); "list + filter" is what clients do today, fetching the
+# tutor's whole list and matching the word in Python.
+#
+#   python seeding.py --users 5000 --students 500000 --sessions 5000000 --workers 8
+#   python benchmarks/search.py --runs 200
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import main  # noqa: E402
+from database import engine  # noqa: E402
+
+
+TARGETS = {
+    "students": {
+        "table": "students",
+        "sample": "SELECT tutor_id, name FROM students TABLESAMPLE SYSTEM (1) WHERE tutor_id IS NOT NULL LIMIT :rows",
+        "search": main.student_search_stmt,
+        "list": main.tutor_students_stmt,
+        "field": "name",
+    },
+    "sessions": {
+        "table": "tutoring_sessions",
+        "sample": "SELECT tutor_id, topic FROM tutoring_sessions TABLESAMPLE SYSTEM (0.1) WHERE tutor_id IS NOT NULL LIMIT :rows",
+        "search": main.session_search_stmt,
+        "list": lambda tutor_id: main.tutor_sessions_stmt(tutor_id, []),
+        "field": "topic",
+    },
+}
+
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def sample_queries(conn, sample_sql: str, runs: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    rows = conn.execute(text(sample_sql), {"rows": runs * 4}).all()
+    rng.shuffle(rows)
+    queries = {"word": [], "prefix": [], "typo": []}
+    for tutor_id, value in rows:
+        words = [word.strip(".,") for word in (value or "").split() if len(word.strip(".,")) >= 4]
+        if not words:
+            continue
+        word = rng.choice(words)
+        queries["word"].append((tutor_id, word))
+        queries["prefix"].append((tutor_id, word[:3]))
+        queries["typo"].append((tutor_id, typo(word, rng)))
+    return {workload: pairs[:runs] for workload, pairs in queries.items()}
+
+
+def summarize(timings: list, hits: list) -> dict:
+    timings = sorted(timings)
+    return {
+        "median": statistics.median(timings),
+        "p95": timings[max(int(len(timings) * 0.95) - 1, 0)],
+        "hits": statistics.fmean(hits),
+    }
+
+
+def time_search(conn, build, pairs: list, limit: int) -> dict:
+    timings, hits = [], []
+    for tutor_id, q in pairs:
+        started = time.perf_counter()
+        rows = conn.execute(build(tutor_id, q, limit, 0)).all()
+        timings.append((time.perf_counter() - started) * 1000)
+        hits.append(len(rows))
+    return summarize(timings, hits)
+
+
+def time_list_filter(conn, build, field: str, pairs: list) -> dict:
+    timings, hits = [], []
+    for tutor_id, q in pairs:
+        started = time.perf_counter()
+        rows = conn.execute(build(tutor_id)).mappings().all()
+        matches = [row for row in rows if q.lower() in (row[field] or "").lower()]
+        timings.append((time.perf_counter() - started) * 1000)
+        hits.append(len(matches))
+    return summarize(timings, hits)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Latency of the tutor-scoped search endpoints")
+    parser.add_argument("--runs", type=int, default=200, help="queries per workload")
+    parser.add_argument("--limit", type=int, default=main.SEARCH_LIMIT_DEFAULT, help="page size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        counts = {target: conn.execute(text(f"SELECT count(*) FROM {spec['table']}")).scalar() for target, spec in TARGETS.items()}
+        print(", ".join(f"{count} {target}" for target, count in counts.items()) + f", page size {args.limit}\n")
+        print(f"{'target':<10} {'workload':<14} {'median ms':>10} {'p95 ms':>10} {'hits':>8}")
+        for target, spec in TARGETS.items():
+            queries = sample_queries(conn, spec["sample"], args.runs, args.seed)
+            # Warm the cache so every workload is measured from memory
+            time_search(conn, spec["search"], queries["word"][:20], args.limit)
+            for workload, pairs in queries.items():
+                result = time_search(conn, spec["search"], pairs, args.limit)
+                print(f"{target:<10} {workload:<14} {result['median']:>10.2f} {result['p95']:>10.2f} {result['hits']:>8.1f}")
+            result = time_list_filter(conn, spec["list"], spec["field"], queries["word"])
+            print(f"{target:<10} {'list + filter':<14} {result['median']:>10.2f} {result['p95']:>10.2f} {result['hits']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,84 @@
+# Rows/sec for the two ways a list endpoint can build its JSON body.
+#
+#   orm     Query(TutoringSession) -> ORM instances -> List[SessionResponse]
+#           (orm_mode) -> jsonable_encoder -> JSONResponse (stdlib json),
+#           i.e. what FastAPI does for `return db.query(...).all()`
+#   rows    select(*SESSION_COLUMNS) -> row tuples -> serialization.rows_response
+#           (orjson when installed), what the list endpoints do now
+#
+# Reads the first --rows sessions from DATABASE_URL; "fetch" is the database
+# round trip plus building the objects/rows, "encode" is everything after.
+#
+#   python benchmarks/serialization.py --rows 10000 --repeat 10
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from main import SESSION_COLUMNS, SessionResponse, sessions_table  # noqa: E402
+from models import TutoringSession  # noqa: E402
+
+
+def orm_path(db, rows: int):
+    started = time.perf_counter()
+    sessions = db.query(TutoringSession).order_by(TutoringSession.id).limit(rows).all()
+    fetched = time.perf_counter()
+    body = JSONResponse(jsonable_encoder(parse_obj_as(List[SessionResponse], sessions))).body
+    return fetched - started, time.perf_counter() - fetched, body
+
+
+def rows_path(db, rows: int):
+    started = time.perf_counter()
+    result = db.execute(select(*SESSION_COLUMNS).order_by(sessions_table.c.id).limit(rows))
+    fetched_rows = result.all()
+    fetched = time.perf_counter()
+    body = serialization.RowsResponse(serialization.row_dicts(fetched_rows, result.keys())).body
+    return fetched - started, time.perf_counter() - fetched, body
+
+
+PATHS = {"orm": orm_path, "rows": rows_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM + Pydantic vs row tuples + orjson for list responses")
+    parser.add_argument("--rows", type=int, default=10000, help="sessions per response")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per path; medians are reported")
+    args = parser.parse_args()
+
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"{args.rows} rows per response, median of {args.repeat} runs, fast path encoder: {encoder}\n")
+    print(f"{'path':<6} {'fetch ms':>10} {'encode ms':>10} {'total ms':>10} {'rows/s':>12} {'bytes':>10}")
+    bodies = {}
+    for name, path in PATHS.items():
+        fetch_times, encode_times = [], []
+        for _ in range(args.repeat):
+            # A fresh session per run, so the ORM path never reuses its identity map
+            db = SessionLocal()
+            try:
+                fetch, encode, body = path(db, args.rows)
+            finally:
+                db.close()
+            fetch_times.append(fetch)
+            encode_times.append(encode)
+        fetch, encode = statistics.median(fetch_times), statistics.median(encode_times)
+        rows = body.count(b'"topic"')
+        bodies[name] = body
+        print(f"{name:<6} {fetch * 1000:>10.1f} {encode * 1000:>10.1f} {(fetch + encode) * 1000:>10.1f} "
+              f"{rows / (fetch + encode):>12.0f} {len(body):>10}")
+    if bodies["orm"] != bodies["rows"]:
+        print("\nwarning: the two paths produced different JSON")
+
+
+if __name__ == "__main__":
+    main()
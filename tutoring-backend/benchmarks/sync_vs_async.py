@@ -0,0 +1,106 @@
+# Throughput of the sync (threadpool) and async (asyncpg) request paths.
+#
+# Starts the app once with DB_ASYNC=0 and once with DB_ASYNC=1 against the
+# database in DATABASE_URL, then hammers GET /students/ and GET /sessions/
+# with a fixed number of concurrent clients and prints req/s and latency.
+#
+#   python benchmarks/sync_vs_async.py --concurrency 200 --duration 30
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(port: int, workers: int, db_async: bool) -> subprocess.Popen:
+    env = dict(os.environ, DB_ASYNC="1" if db_async else "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def login(client: httpx.AsyncClient) -> dict:
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    await client.post("/register/", json={"username": username, "email": f"{username}@example.com", "password": "bench"})
+    token = (await client.post("/token/", data={"username": username, "password": "bench"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.post("/students/", json={"name": "Bench Student", "email": f"{username}-s@example.com", "age": 20}, headers=headers)
+    return headers
+
+
+async def drive(base_url: str, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        await wait_until_up(client)
+        headers = await login(client)
+        latencies = []
+        errors = 0
+        stop_at = time.monotonic() + duration
+
+        async def worker(n: int):
+            nonlocal errors
+            path = "/students/" if n % 2 else "/sessions/"
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    for db_async in (False, True):
+        server = start_server(args.port, args.workers, db_async)
+        try:
+            result = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{'async' if db_async else 'sync ':5}  {result}")
+
+
+if __name__ == "__main__":
+    main()
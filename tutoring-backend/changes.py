@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, MetaData, String, Table, delete, func, literal, or_, select, text
+
+import profiling
+from auth import require_internal_token
+from config import CHANGE_STREAM_KEEPALIVE_SECONDS, CHANGE_STREAM_POLL_SECONDS, TOMBSTONE_RETENTION_DAYS
+from database import SessionLocal
+from models import Student, TutoringSession
+from serialization import dumps, ndjson_lines
+
+
+# Incremental change feed, so consumers stop re-downloading whole tables.
+#
+# GET /changes/sessions?updated_since=T streams (NDJSON) every session
+# inserted or updated at or after T as {"op": "upsert", ...row}, then every
+# session deleted since T as {"op": "delete", "id", "tutor_id", "deleted_at"},
+# up to a watermark sent in X-Next-Updated-Since: pass it back as the next
+# updated_since. Without updated_since the response is a full snapshot of
+# the table up to the watermark (rows from before change tracking included).
+# GET /changes/students is the same for students.
+#
+# GET /changes/sessions/stream sends session changes as Server-Sent Events
+# ("upsert" / "delete"), each batch followed by a "checkpoint" event whose id
+# is the watermark, so an EventSource that reconnects resumes from it through
+# Last-Event-ID. A batch cut off mid-way is sent again in full.
+#
+# created_at / updated_at / deleted_at come from change_timestamp() (migration
+# 0005), and the watermark is never later than the start of the oldest
+# transaction still writing, so no change can commit into a window that was
+# already handed out. The watermark reads pg_stat_activity, which only shows
+# other sessions' transactions to the same role (or pg_read_all_stats): the
+# API and everything else writing these tables should connect as one role.
+# The feed always reads from the primary, replicas or not: a replica's
+# pg_stat_activity doesn't show the primary's writers.
+#
+# The feed spans every tutor (student emails included), so it is internal:
+# every endpoint needs the internal token (auth.require_internal_token).
+router = APIRouter(
+    prefix="/changes", tags=["changes"], route_class=profiling.ROUTE_CLASS,
+    dependencies=[Depends(require_internal_token)],
+)
+logger = logging.getLogger("tutoring.changes")
+
+metadata = MetaData()
+
+# Written by the record_tombstones trigger on every delete
+tombstones = Table(
+    "tombstones",
+    metadata,
+    Column("table_name", String(63), primary_key=True),
+    Column("row_id", BigInteger, primary_key=True),
+    Column("tutor_id", Integer),
+    Column("deleted_at", DateTime(timezone=True), nullable=False),
+    Index("ix_tombstones_table_name_deleted_at", "table_name", "deleted_at"),
+)
+
+WATERMARK = text("""
+    SELECT least(clock_timestamp(), min(xact_start)) FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_xid IS NOT NULL
+""")
+CHANGE_BATCH_SIZE = 5000
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class Feed(NamedTuple):
+    table: Table
+    key: Column
+    columns: tuple
+
+
+sessions_table = TutoringSession.__table__
+students_table = Student.__table__
+FEEDS = {
+    "sessions": Feed(sessions_table, sessions_table.c.id, (
+        sessions_table.c.id,
+        sessions_table.c.tutor_id,
+        sessions_table.c.student_id,
+        sessions_table.c.date,
+        sessions_table.c.duration,
+        sessions_table.c.topic,
+        sessions_table.c.created_at,
+        sessions_table.c.updated_at,
+    )),
+    "students": Feed(students_table, students_table.c.student_id, (
+        students_table.c.student_id.label("id"),
+        students_table.c.tutor_id,
+        students_table.c.name,
+        students_table.c.email,
+        students_table.c.age,
+        students_table.c.created_at,
+        students_table.c.updated_at,
+    )),
+}
+
+
+def read_watermark(since: datetime | None) -> datetime:
+    # Its own short transaction: pg_stat_activity is read once per
+    # transaction, and the changes must be read from a later snapshot
+    with SessionLocal() as db:
+        watermark = db.execute(WATERMARK).scalar()
+    # A transaction that started earlier but only now began writing can pull
+    # the watermark back; its rows are still later than the previous one
+    return max(watermark, since) if since is not None else watermark
+
+
+def format_timestamp(value: datetime) -> str:
+    # UTC with a Z, so it can go back into a query string without escaping a +
+    return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def check_since(since: datetime | None) -> datetime | None:
+    if since is None:
+        return None
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if since < datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"updated_since is older than the {TOMBSTONE_RETENTION_DAYS} day tombstone retention; "
+                   "resync from a full snapshot (omit updated_since)",
+        )
+    return since
+
+
+def upserts_stmt(feed: Feed, since: datetime | None, until: datetime):
+    updated_at = feed.table.c.updated_at
+    stmt = select(literal("upsert").label("op"), *feed.columns)
+    if since is None:
+        return stmt.where(or_(updated_at < until, updated_at.is_(None))).order_by(feed.key)
+    return stmt.where(updated_at >= since, updated_at < until).order_by(updated_at, feed.key)
+
+
+def deletes_stmt(feed: Feed, since: datetime, until: datetime):
+    return (
+        # Labelled: the Table's column names are quoted_name, which orjson
+        # doesn't take as dict keys
+        select(
+            literal("delete").label("op"),
+            tombstones.c.row_id.label("id"),
+            tombstones.c.tutor_id.label("tutor_id"),
+            tombstones.c.deleted_at.label("deleted_at"),
+        )
+        .where(
+            tombstones.c.table_name == feed.table.name,
+            tombstones.c.deleted_at >= since,
+            tombstones.c.deleted_at < until,
+        )
+        .order_by(tombstones.c.deleted_at)
+    )
+
+
+def iter_changes(feed: Feed, since: datetime | None, until: datetime):
+    # (rows, keys) batches off a server-side cursor: upserts, then deletes
+    statements = [upserts_stmt(feed, since, until)]
+    if since is not None:
+        statements.append(deletes_stmt(feed, since, until))
+    db = SessionLocal()
+    try:
+        for stmt in statements:
+            result = db.execute(stmt.execution_options(yield_per=CHANGE_BATCH_SIZE))
+            keys = tuple(result.keys())
+            for rows in result.partitions():
+                yield rows, keys
+    finally:
+        db.close()
+
+
+def ndjson_changes(feed: Feed, since: datetime | None, until: datetime):
+    for rows, keys in iter_changes(feed, since, until):
+        yield ndjson_lines(rows, keys)
+
+
+def sse_changes(feed: Feed, since: datetime, until: datetime):
+    for rows, keys in iter_changes(feed, since, until):
+        yield b"".join(b"event: " + row[0].encode() + b"\ndata: " + dumps(dict(zip(keys, row))) + b"\n\n" for row in rows)
+
+
+def sse_checkpoint(watermark: datetime) -> bytes:
+    value = format_timestamp(watermark)
+    return f"event: checkpoint\nid: {value}\ndata: {dumps({'updated_since': value}).decode()}\n\n".encode()
+
+
+async def event_stream(feed: Feed, since: datetime | None):
+    if since is None:
+        # A new subscriber gets changes from now on
+        since = await run_in_threadpool(read_watermark, None)
+        yield sse_checkpoint(since)
+    checkpointed = time.monotonic()
+    while True:
+        until = await run_in_threadpool(read_watermark, since)
+        sent = False
+        async for chunk in iterate_in_threadpool(sse_changes(feed, since, until)):
+            if chunk:
+                sent = True
+                yield chunk
+        since = until
+        if sent or time.monotonic() - checkpointed >= CHANGE_STREAM_KEEPALIVE_SECONDS:
+            checkpointed = time.monotonic()
+            yield sse_checkpoint(until)
+        await asyncio.sleep(CHANGE_STREAM_POLL_SECONDS)
+
+
+def changes_response(feed: Feed, updated_since: datetime | None) -> StreamingResponse:
+    since = check_since(updated_since)
+    until = read_watermark(since)
+    return StreamingResponse(
+        ndjson_changes(feed, since, until),
+        media_type="application/x-ndjson",
+        headers={"X-Next-Updated-Since": format_timestamp(until)},
+    )
+
+
+@router.get("/sessions")
+def session_changes(updated_since: datetime | None = None):
+    return changes_response(FEEDS["sessions"], updated_since)
+
+
+@router.get("/students")
+def student_changes(updated_since: datetime | None = None):
+    return changes_response(FEEDS["students"], updated_since)
+
+
+@router.get("/sessions/stream")
+async def session_change_stream(updated_since: datetime | None = None, last_event_id: str | None = Header(None)):
+    # Last-Event-ID (sent by a reconnecting EventSource) wins over the query
+    if last_event_id:
+        try:
+            updated_since = datetime.fromisoformat(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    return StreamingResponse(
+        event_stream(FEEDS["sessions"], check_since(updated_since)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def prune_tombstones() -> int:
+    with SessionLocal() as db:
+        pruned = db.execute(
+            delete(tombstones).where(tombstones.c.deleted_at < func.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS))
+        ).rowcount
+        db.commit()
+    return pruned
+
+
+async def prune_forever() -> None:
+    # Runs for the life of the worker; every worker prunes, which is harmless
+    while True:
+        try:
+            await run_in_threadpool(prune_tombstones)
+        except Exception:
+            logger.exception("tombstone pruning failed")
+        await asyncio.sleep(PRUNE_INTERVAL_SECONDS)
@@ -0,0 +1,167 @@
+import time
+from functools import partial
+
+from fastapi import Request
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import metrics
+import profiling
+import replicas
+from config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DATABASE_REPLICA_URLS,
+    ASYNC_DATABASE_REPLICA_URLS,
+    DB_ASYNC,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+    SLOW_QUERY_MS,
+    READ_AFTER_WRITE_SECONDS,
+    REPLICA_MAX_LAG_SECONDS,
+)
+
+
+# Every engine in the project comes from here so pool limits, timeouts and
+# metrics are the same for the API workers and the scripts. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres max_connections.
+def engine_options(url: str, is_async: bool = False, **overrides) -> dict:
+    options = {}
+    if url.startswith("postgresql"):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            poolclass=metrics.TimedAsyncQueuePool if is_async else metrics.TimedQueuePool,
+        )
+        if DB_STATEMENT_TIMEOUT_MS:
+            if is_async:
+                options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+            else:
+                options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(overrides)
+    return options
+
+
+def make_engine(url: str = DATABASE_URL, name: str = "primary", **overrides):
+    engine = create_engine(url, **engine_options(url, **overrides))
+    metrics.instrument_engine(engine, name)
+    if SLOW_QUERY_MS:
+        profiling.instrument_engine(engine, name)
+    return engine
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, name: str = "primary_async", **overrides):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(url, **engine_options(url, is_async=True, **overrides))
+    metrics.instrument_engine(engine.sync_engine, name)
+    if SLOW_QUERY_MS:
+        profiling.instrument_engine(engine.sync_engine, name)
+    return engine
+
+
+engine = make_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async_engine = make_async_engine()
+    AsyncSessionLocal = sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+else:
+    # Also the annotation of the async handlers' sessions (main, auth): they
+    # are only served with DB_ASYNC, and without it the asyncio extension
+    # and greenlet needn't be installed
+    AsyncSession = None
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+# Read-only endpoints take their session from get_read_db / get_async_read_db
+# (or read_session_factory, for responses streamed after the handler
+# returns), which picks a replica (see config.DATABASE_REPLICA_URLS) unless
+# the client wrote within READ_AFTER_WRITE_SECONDS.
+replica_set = replicas.ReplicaSet(
+    [
+        replicas.Replica(
+            f"replica{i}",
+            make_engine(url, name=f"replica{i}"),
+            make_async_engine(ASYNC_DATABASE_REPLICA_URLS[i], name=f"replica{i}_async") if DB_ASYNC else None,
+        )
+        for i, url in enumerate(DATABASE_REPLICA_URLS)
+    ],
+    REPLICA_MAX_LAG_SECONDS,
+)
+
+# Set by the app on the response to every successful write, holding the time
+# of the write
+READ_AFTER_WRITE_COOKIE = "db_wrote_at"
+
+
+def wrote_recently(request: Request | None) -> bool:
+    if request is None:
+        return False
+    try:
+        wrote_at = float(request.cookies.get(READ_AFTER_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - wrote_at < READ_AFTER_WRITE_SECONDS
+
+
+def route_read(request: Request | None):
+    # The replica to read from, or None for the primary
+    if not replica_set:
+        return None
+    if wrote_recently(request):
+        metrics.db_read_routes.inc(engine="primary", reason="read_after_write")
+        return None
+    replica = replica_set.choose()
+    if replica is None:
+        metrics.db_read_routes.inc(engine="primary", reason="no_replica")
+        return None
+    metrics.db_read_routes.inc(engine=replica.name, reason="replica")
+    return replica
+
+
+def read_session_factory(request: Request | None = None):
+    replica = route_read(request)
+    return SessionLocal if replica is None else partial(SessionLocal, bind=replica.engine)
+
+
+def async_read_session(replica):
+    return AsyncSessionLocal() if replica is None else AsyncSessionLocal(bind=replica.async_engine)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request):
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    async with async_read_session(route_read(request)) as db:
+        yield db
@@ -0,0 +1,112 @@
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the arrow/parquet formats
+    pa = None
+    pq = None
+
+
+EXPORT_BATCH_SIZE = 50000
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+FILE_EXTENSIONS = {"arrow": "arrows", "parquet": "parquet", "csv": "csv"}
+
+
+class ChunkSink:
+    # Write-only file object handed to the pyarrow writers; whatever they wrote
+    # since the last drain() is sent out as the next chunk of the response.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def format_available(fmt: str) -> bool:
+    return fmt == "csv" or pa is not None
+
+
+def iter_row_batches(session_factory, stmt):
+    # Plain tuples straight off a server-side cursor, no ORM objects involved.
+    db = session_factory()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield rows
+    finally:
+        db.close()
+
+
+def arrow_schema(columns):
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in columns])
+
+
+def record_batch(schema, rows):
+    values = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = [pa.array(column, type=field.type) for column, field in zip(values, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_arrow(session_factory, stmt, columns):
+    schema = arrow_schema(columns)
+    sink = ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in iter_row_batches(session_factory, stmt):
+            writer.write_batch(record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_parquet(session_factory, stmt, columns):
+    schema = arrow_schema(columns)
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in iter_row_batches(session_factory, stmt):
+            writer.write_batch(record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_csv(session_factory, stmt, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for rows in iter_row_batches(session_factory, stmt):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+WRITERS = {"arrow": stream_arrow, "parquet": stream_parquet, "csv": stream_csv}
+
+
+def stream_export(session_factory, stmt, columns, fmt: str):
+    return WRITERS[fmt](session_factory, stmt, columns)
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from config import BCRYPT_ROUNDS, HASH_WORKERS, HASH_MAX_PENDING
+
+
+# Hashes made with a different cost are reported by verify_and_update so they
+# get rehashed with BCRYPT_ROUNDS on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def pending() -> int:
+    return _pending
+
+
+# Run inside the worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+async def run_in_pool(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= HASH_MAX_PENDING:
+            raise HashPoolBusy()
+        _pending += 1
+    try:
+        return await asyncio.wrap_future(get_executor().submit(fn, *args))
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await run_in_pool(_hash, password)
+
+
+async def verify_and_update(password: str, hashed_password: str):
+    # Returns (verified, new_hash); new_hash is None unless the stored hash is outdated
+    return await run_in_pool(_verify_and_update, password, hashed_password)
@@ -0,0 +1,202 @@
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Minimal Prometheus text-format metrics, kept per process (one set per uvicorn worker)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for key, value in self._values.items():
+                yield f"{self.name}{format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        labelnames = self.labelnames + ("le",)
+        with self._lock:
+            for key, (counts, count, total) in self._series.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    yield f"{self.name}_bucket{format_labels(labelnames, key + (bound,))} {bucket_count}"
+                yield f"{self.name}_bucket{format_labels(labelnames, key + ('+Inf',))} {count}"
+                yield f"{self.name}_count{format_labels(self.labelnames, key)} {count}"
+                yield f"{self.name}_sum{format_labels(self.labelnames, key)} {total}"
+
+
+class GaugeCollector:
+    # Gauges whose values are read from a callback at scrape time;
+    # the callback returns [(label values tuple, value), ...]
+    def __init__(self, name: str, documentation: str, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        REGISTRY.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in self.callback():
+            yield f"{self.name}{format_labels(self.labelnames, key)} {value}"
+
+
+REGISTRY = []
+
+
+def render_latest() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Database metrics
+db_pool_wait_seconds = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["engine"]
+)
+db_query_seconds = Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements", ["engine", "statement"]
+)
+db_request_seconds = Histogram(
+    "db_request_duration_seconds", "Total SQL time spent per HTTP request", ["endpoint"]
+)
+db_request_statements = Histogram(
+    "db_request_statements", "SQL statements executed per HTTP request", ["endpoint"],
+    buckets=(1, 2, 3, 5, 10, 25, 50, 100),
+)
+db_read_routes = Counter(
+    "db_read_routes_total", "Read-only requests by the engine they were sent to and why", ["engine", "reason"]
+)
+
+ENGINES = {}
+
+
+def pool_stats():
+    for name, engine in ENGINES.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            yield (name, "size"), pool.size()
+            yield (name, "checked_out"), pool.checkedout()
+            yield (name, "checked_in"), pool.checkedin()
+            yield (name, "overflow"), pool.overflow()
+
+
+GaugeCollector("db_pool_connections", "Connection pool state", ["engine", "state"], pool_stats)
+
+
+class TimedPoolMixin:
+    # Records how long each checkout waited for a connection
+    metrics_name = "default"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - started, engine=self.metrics_name)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# Per-request SQL accounting: the middleware puts a fresh dict in this
+# contextvar and the cursor events add to it from whichever thread runs the query.
+request_db_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+
+def statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def instrument_engine(engine, name: str) -> None:
+    ENGINES[name] = engine
+    if isinstance(engine.pool, TimedPoolMixin):
+        engine.pool.metrics_name = name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        db_query_seconds.observe(elapsed, engine=name, statement=statement_kind(statement))
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats["seconds"] += elapsed
+            stats["statements"] += 1
+
+
+def start_request():
+    return request_db_stats.set({"seconds": 0.0, "statements": 0})
+
+
+def finish_request(token, endpoint: str) -> None:
+    stats = request_db_stats.get()
+    request_db_stats.reset(token)
+    if stats["statements"]:
+        db_request_seconds.observe(stats["seconds"], endpoint=endpoint)
+        db_request_statements.observe(stats["statements"], endpoint=endpoint)
@@ -0,0 +1,48 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+import analytics
+import changes
+import models
+import partitioning
+from config import DATABASE_URL
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = [models.Base.metadata, analytics.metadata, changes.metadata]
+
+
+def include_name(name, type_, parent_names) -> bool:
+    # The partitions and the (id, date) key made by partitioning.py aren't part of the models
+    if type_ == "table" and name.startswith(partitioning.TABLE + "_"):
+        return not (partitioning.PARTITION_NAME.search(name) or name == partitioning.TABLE + "_default")
+    if type_ == "index":
+        return name != partitioning.ID_DATE_INDEX
+    return True
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # A plain, unpooled engine: migrations shouldn't inherit the API's pool
+    # settings or statement_timeout (index builds on big tables take a while)
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
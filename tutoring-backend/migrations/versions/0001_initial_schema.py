@@ -0,0 +1,94 @@
+"""Initial schema, as previously created by create_all at import
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(100)),
+        sa.Column("email", sa.String(100)),
+        sa.Column("hashed_password", sa.String()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"])
+    op.create_index("ix_users_email", "users", ["email"])
+
+    op.create_table(
+        "tutors",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("bio", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_tutors_id", "tutors", ["id"])
+
+    op.create_table(
+        "students",
+        sa.Column("student_id", sa.Integer(), primary_key=True),
+        sa.Column("tutor_id", sa.Integer(), sa.ForeignKey("tutors.id")),
+        sa.Column("name", sa.String(100)),
+        sa.Column("email", sa.String(100)),
+        sa.Column("age", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_students_student_id", "students", ["student_id"])
+    op.create_index("ix_students_email", "students", ["email"])
+
+    op.create_table(
+        "tutoring_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tutor_id", sa.Integer(), sa.ForeignKey("tutors.id")),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.student_id")),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("duration", sa.Integer()),
+        sa.Column("topic", sa.String(200)),
+    )
+    op.create_index("ix_tutoring_sessions_id", "tutoring_sessions", ["id"])
+
+    op.create_table(
+        "session_hourly_summary",
+        sa.Column("bucket_hour", sa.DateTime(), primary_key=True),
+        sa.Column("tutor_id", sa.Integer(), primary_key=True),
+        sa.Column("sessions", sa.BigInteger(), nullable=False),
+        sa.Column("total_minutes", sa.BigInteger(), nullable=False),
+        sa.Column("short", sa.BigInteger(), nullable=False),
+        sa.Column("medium", sa.BigInteger(), nullable=False),
+        sa.Column("long", sa.BigInteger(), nullable=False),
+        sa.Column("extended", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "student_session_summary",
+        sa.Column("student_id", sa.Integer(), primary_key=True),
+        sa.Column("tutor_id", sa.Integer()),
+        sa.Column("sessions", sa.BigInteger(), nullable=False),
+        sa.Column("total_minutes", sa.BigInteger(), nullable=False),
+        sa.Column("first_session", sa.DateTime()),
+        sa.Column("last_session", sa.DateTime()),
+    )
+    op.create_table(
+        "analytics_refresh_state",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("last_session_id", sa.BigInteger(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analytics_refresh_state")
+    op.drop_table("student_session_summary")
+    op.drop_table("session_hourly_summary")
+    op.drop_table("tutoring_sessions")
+    op.drop_table("students")
+    op.drop_table("tutors")
+    op.drop_table("users")
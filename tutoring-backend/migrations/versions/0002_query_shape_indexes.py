@@ -0,0 +1,36 @@
+"""Composite indexes for the tutor-scoped queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns). Built CONCURRENTLY so a populated database keeps
+# taking writes while they build.
+INDEXES = [
+    ("ix_tutors_user_id", "tutors", ["user_id"]),
+    ("ix_students_tutor_id_student_id", "students", ["tutor_id", "student_id"]),
+    ("ix_tutoring_sessions_tutor_id_date", "tutoring_sessions", ["tutor_id", "date"]),
+    ("ix_tutoring_sessions_tutor_id_id", "tutoring_sessions", ["tutor_id", "id"]),
+    ("ix_tutoring_sessions_student_id", "tutoring_sessions", ["student_id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    op.execute("ANALYZE tutors, students, tutoring_sessions")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
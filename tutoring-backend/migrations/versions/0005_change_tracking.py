@@ -0,0 +1,96 @@
+"""Modification timestamps and delete tombstones for the change feed
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# (table, primary key column)
+TRACKED_TABLES = [("students", "student_id"), ("tutoring_sessions", "id")]
+
+# Commit-order-safe timestamp for created_at / updated_at / deleted_at. The
+# transaction takes an xid before reading the clock, so from then until it
+# commits it shows in pg_stat_activity.backend_xid and holds back the feed's
+# watermark (see changes.WATERMARK).
+CHANGE_TIMESTAMP = """
+CREATE FUNCTION change_timestamp() RETURNS timestamptz LANGUAGE plpgsql VOLATILE AS $$
+BEGIN
+    PERFORM pg_current_xact_id();
+    RETURN clock_timestamp();
+END
+$$
+"""
+TOUCH_UPDATED_AT = """
+CREATE FUNCTION touch_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := change_timestamp();
+    RETURN NEW;
+END
+$$
+"""
+# Statement-level, reading the deleted rows from the transition table: a bulk
+# delete writes its tombstones with one INSERT. Arguments: table, key column.
+RECORD_TOMBSTONES = """
+CREATE FUNCTION record_tombstones() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO tombstones (table_name, row_id, tutor_id, deleted_at) '
+        'SELECT %L, %I, tutor_id, $1 FROM deleted_rows',
+        TG_ARGV[0], TG_ARGV[1]
+    ) USING change_timestamp();
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.execute(CHANGE_TIMESTAMP)
+    op.execute(TOUCH_UPDATED_AT)
+    op.execute(RECORD_TOMBSTONES)
+    op.create_table(
+        "tombstones",
+        sa.Column("table_name", sa.String(63), primary_key=True),
+        sa.Column("row_id", sa.BigInteger(), primary_key=True),
+        sa.Column("tutor_id", sa.Integer()),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_tombstones_table_name_deleted_at", "tombstones", ["table_name", "deleted_at"])
+    for table, key in TRACKED_TABLES:
+        # Existing rows keep NULL timestamps (unknown); they are part of the
+        # feed's initial snapshot. The default only applies to new rows, so
+        # adding the columns doesn't rewrite the table.
+        op.add_column(table, sa.Column("created_at", sa.DateTime(timezone=True)))
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(timezone=True)))
+        op.alter_column(table, "created_at", server_default=sa.text("change_timestamp()"))
+        op.alter_column(table, "updated_at", server_default=sa.text("change_timestamp()"))
+        op.create_index(f"ix_{table}_updated_at", table, ["updated_at"])
+        op.execute(
+            f"CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION touch_updated_at()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_tombstones AFTER DELETE ON {table} REFERENCING OLD TABLE AS deleted_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('{table}', '{key}')"
+        )
+
+
+def downgrade() -> None:
+    for table, _ in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER {table}_tombstones ON {table}")
+        op.execute(f"DROP TRIGGER {table}_touch_updated_at ON {table}")
+        op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        op.drop_column(table, "updated_at")
+        op.drop_column(table, "created_at")
+    op.drop_table("tombstones")
+    op.execute("DROP FUNCTION record_tombstones()")
+    op.execute("DROP FUNCTION touch_updated_at()")
+    op.execute("DROP FUNCTION change_timestamp()")
@@ -0,0 +1,63 @@
+"""Reject overlapping sessions of a tutor or a student
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSRANGE
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# The time a session books, [date, date + duration minutes). date is a
+# timestamp without time zone, so this is a tsrange; sessions without a date
+# or a positive duration get NULL and never conflict.
+PERIOD = (
+    "CASE WHEN date IS NOT NULL AND duration > 0 "
+    "THEN tsrange(date, date + duration * interval '1 minute') END"
+)
+# (constraint name suffix, column): no two sessions of the same tutor, or of
+# the same student, may overlap. Deferrable, so a batch can move sessions
+# into each other's slots; checked at the end of each statement otherwise.
+EXCLUSIONS = [("tutor_period", "tutor_id"), ("student_period", "student_id")]
+
+
+def exclusion_ddl(table: str, suffix: str, column: str) -> str:
+    return (
+        f"ALTER TABLE {table} ADD CONSTRAINT ex_{table}_{suffix} "
+        f"EXCLUDE USING gist ({column} WITH =, period WITH &&) DEFERRABLE INITIALLY IMMEDIATE"
+    )
+
+
+def partitions(conn) -> list:
+    # Leaf partitions when tutoring_sessions is partitioned (partitioning.py),
+    # else the table itself: an exclusion constraint on a partitioned table
+    # would have to include the partition key (date) with =
+    return conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'tutoring_sessions'::regclass
+    """)).scalars().all() or ["tutoring_sessions"]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # Rewrites the table, as adding topic_search did (0003). Fails, naming
+    # one clashing pair, if existing sessions already overlap: resolve those
+    # first, the constraint can't be added NOT VALID.
+    op.add_column("tutoring_sessions", sa.Column("period", TSRANGE(), sa.Computed(PERIOD, persisted=True)))
+    for table in partitions(op.get_bind()):
+        for suffix, column in EXCLUSIONS:
+            op.execute(exclusion_ddl(table, suffix, column))
+    op.execute("ANALYZE tutoring_sessions")
+
+
+def downgrade() -> None:
+    for table in partitions(op.get_bind()):
+        for suffix, _ in EXCLUSIONS:
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT ex_{table}_{suffix}")
+    op.drop_column("tutoring_sessions", "period")
@@ -0,0 +1,28 @@
+"""Working hours of tutors, for the availability finder
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable, no default: existing tutors keep working the configured
+    # WORK_START / WORK_END / WORK_DAYS until theirs are set
+    op.add_column("tutors", sa.Column("work_start", sa.Time()))
+    op.add_column("tutors", sa.Column("work_end", sa.Time()))
+    op.add_column("tutors", sa.Column("work_days", sa.SmallInteger()))
+
+
+def downgrade() -> None:
+    op.drop_column("tutors", "work_days")
+    op.drop_column("tutors", "work_end")
+    op.drop_column("tutors", "work_start")
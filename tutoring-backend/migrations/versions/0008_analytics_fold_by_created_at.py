@@ -0,0 +1,30 @@
+"""Fold analytics by created_at up to the change feed's watermark
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # No folded_until yet: the first refresh rebuilds the summaries in full
+    op.drop_column("analytics_refresh_state", "last_session_id")
+    op.add_column("analytics_refresh_state", sa.Column("folded_until", sa.DateTime(timezone=True)))
+    op.create_index("ix_tutoring_sessions_created_at", "tutoring_sessions", ["created_at"])
+
+
+def downgrade() -> None:
+    # Emptied, so the id-based refresh starts over from id 0 rather than
+    # folding sessions in a second time
+    op.drop_index("ix_tutoring_sessions_created_at", table_name="tutoring_sessions")
+    op.execute("TRUNCATE session_hourly_summary, student_session_summary, analytics_refresh_state")
+    op.drop_column("analytics_refresh_state", "folded_until")
+    op.add_column("analytics_refresh_state", sa.Column("last_session_id", sa.BigInteger(), nullable=False))
@@ -0,0 +1,27 @@
+"""Index the analytics summaries by tutor, for the tutor-scoped reads
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_session_hourly_summary_tutor_id_bucket_hour", "session_hourly_summary", ["tutor_id", "bucket_hour"]
+    )
+    op.create_index(
+        "ix_student_session_summary_tutor_id_student_id", "student_session_summary", ["tutor_id", "student_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_student_session_summary_tutor_id_student_id", table_name="student_session_summary")
+    op.drop_index("ix_session_hourly_summary_tutor_id_bucket_hour", table_name="session_hourly_summary")
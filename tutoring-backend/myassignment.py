@@ -1,115 +1,258 @@
-import requests
-import pandas as pd
+import argparse
+import os
+import sys
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+
+# Cleaning and feature pipeline for the tutoring sessions and students.
+#
+# Both tables are read as Arrow record batches, either from the API's Arrow
+# exports (GET /export/sessions and /export/students?format=arrow) or from
+# local .arrows / .parquet files, so the sessions never sit in memory whole:
+#
+#   1. students, the small side of the join, are loaded, imputed and encoded
+#   2. sessions are streamed to a staging Parquet file while the statistics
+#      the imputation needs (duration and calendar-day counts) are collected
+#   3. the staged sessions are read back chunk by chunk, imputed, given their
+#      features, joined to their student and written out
+#
+# Writes sessions.parquet, students.parquet and merged.parquet to --out.
+#
+#   python myassignment.py --api http://127.0.0.1:8002 --out output
+#   python myassignment.py --sessions sessions.arrows --students students.parquet
+API_URL = "http://127.0.0.1:8002"
+CHUNK_SIZE = 100000
+REQUEST_TIMEOUT_SECONDS = 60
+# The exports are internal endpoints: the API's INTERNAL_API_TOKEN
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+# Types the exported columns are narrowed to on the way in (ids are int4 in
+# Postgres, durations are minutes)
+SESSION_SCHEMA = pa.schema([
+    ("id", pa.int32()),
+    ("tutor_id", pa.int32()),
+    ("student_id", pa.int32()),
+    ("date", pa.timestamp("us")),
+    ("duration", pa.int16()),
+    ("topic", pa.string()),
+])
+STUDENT_SCHEMA = pa.schema([
+    ("student_id", pa.int32()),
+    ("tutor_id", pa.int32()),
+    ("name", pa.string()),
+    ("email", pa.string()),
+    ("age", pa.int8()),
+])
+# Nullable pandas dtypes for those, so a null doesn't turn an int column into
+# float64 and strings stay Arrow-backed instead of Python objects
+PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.string(): pd.StringDtype("pyarrow"),
+}
+
+DURATION_BINS = [0, 30, 60, 120]
+DURATION_CATEGORY = pd.CategoricalDtype(["short", "medium", "long"], ordered=True)
+AGE_BINS = [0, 18, 25, 100]
+AGE_CATEGORY = pd.CategoricalDtype(["Under 18", "18-25", "Over 25"], ordered=True)
+
+
+def iter_parquet(path: str, batch_size: int):
+    # With pre-buffering on, the reader holds on to every row group's column
+    # chunks until the file is closed, so memory grows with the file
+    yield from pq.ParquetFile(path, pre_buffer=False).iter_batches(batch_size=batch_size)
+
+
+def read_batches(source: str, table: str):
+    # Record batches from an API base URL, a .parquet file or an Arrow IPC stream file
+    if source.startswith(("http://", "https://")):
+        url = f"{source.rstrip('/')}/export/{table}"
+        headers = {"X-Internal-Token": INTERNAL_API_TOKEN}
+        with requests.get(url, params={"format": "arrow"}, headers=headers, stream=True, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield from pa.ipc.open_stream(response.raw)
+    elif source.endswith(".parquet"):
+        yield from iter_parquet(source, CHUNK_SIZE)
+    else:
+        with pa.OSFile(source) as f:
+            yield from pa.ipc.open_stream(f)
+
+
+def narrow(batch: pa.RecordBatch, schema: pa.Schema) -> pa.Table:
+    # Safe casts: a value that doesn't fit the narrower type raises
+    return pa.Table.from_batches([batch]).select(schema.names).cast(schema)
+
+
+def to_frame(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper=PANDAS_TYPES.get)
+
+
+def add_counts(counts: pd.Series, values: pd.Series) -> pd.Series:
+    return counts.add(values.value_counts(dropna=True), fill_value=0)
+
+
+def median_from_counts(counts: pd.Series):
+    # Exact median of the values a value -> count Series was built from
+    if counts.empty:
+        return None
+    counts = counts.sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    total = int(cumulative[-1])
+    values = counts.index.to_numpy()
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+    upper = values[np.searchsorted(cumulative, total // 2, side="right")]
+    return (lower + upper) / 2
+
+
+def most_frequent(counts: pd.Series):
+    # Ties go to the smallest value, as with Series.mode()[0]
+    return None if counts.empty else counts.sort_index().idxmax()
+
+
+def categorize(values: pd.Series, bins: list, dtype: pd.CategoricalDtype) -> pd.Series:
+    codes = pd.cut(values.to_numpy(dtype="float64", na_value=np.nan), bins=bins, labels=list(dtype.categories))
+    return pd.Series(codes, index=values.index).astype(dtype)
+
+
+class ParquetSink:
+    # Appends DataFrame chunks to one Parquet file; every chunk is converted
+    # with the schema of the first so the row groups agree
+    def __init__(self, path: str):
+        self.path = path
+        self.writer = None
+        self.rows = 0
+
+    def write(self, frame: pd.DataFrame) -> None:
+        schema = self.writer.schema if self.writer is not None else None
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.rows += len(frame)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Students
+def load_students(source: str) -> pd.DataFrame:
+    return to_frame(pa.concat_tables(narrow(batch, STUDENT_SCHEMA) for batch in read_batches(source, "students")))
+
+
+def clean_students(students: pd.DataFrame) -> tuple:
+    nulls = int(students["age"].isna().sum())
+    age_median = students["age"].median()
+    if not pd.isna(age_median):
+        students["age"] = students["age"].fillna(round(age_median))
+    category = categorize(students["age"], AGE_BINS, AGE_CATEGORY)
+    dummies = pd.get_dummies(category, prefix="student_age_category", drop_first=True, dtype="boolean")
+    return pd.concat([students, dummies], axis=1), {"age_nulls": nulls, "age_median": age_median}
+
+
+# Sessions
+def stage_sessions(source: str, path: str) -> dict:
+    # Pass 1: narrowed batches to `path`, plus what the imputation needs
+    stats = {"rows": 0, "duration_nulls": 0, "date_nulls": 0}
+    durations = pd.Series(dtype="float64")
+    days = pd.Series(dtype="float64")
+    with pq.ParquetWriter(path, SESSION_SCHEMA) as writer:
+        for batch in read_batches(source, "sessions"):
+            table = narrow(batch, SESSION_SCHEMA)
+            writer.write_table(table)
+            frame = to_frame(table.select(["date", "duration"]))
+            durations = add_counts(durations, frame["duration"])
+            days = add_counts(days, frame["date"].dt.normalize())
+            stats["rows"] += table.num_rows
+            stats["duration_nulls"] += int(frame["duration"].isna().sum())
+            stats["date_nulls"] += int(frame["date"].isna().sum())
+    median = median_from_counts(durations)
+    # Whole minutes, to keep the column integer
+    stats["duration_fill"] = None if median is None else int(round(median))
+    # Session dates are (nearly) unique timestamps, so the most frequent
+    # calendar day stands in for the mode
+    stats["date_fill"] = most_frequent(days)
+    return stats
+
+
+def session_features(chunk: pd.DataFrame, stats: dict) -> pd.DataFrame:
+    if stats["duration_fill"] is not None:
+        chunk["duration"] = chunk["duration"].fillna(stats["duration_fill"])
+    if stats["date_fill"] is not None:
+        chunk["date"] = chunk["date"].fillna(stats["date_fill"])
+    date = chunk["date"].dt
+    chunk["session_duration_category"] = categorize(chunk["duration"], DURATION_BINS, DURATION_CATEGORY)
+    chunk["session_weekday"] = date.dayofweek.astype("Int8")  # 0=Monday, 6=Sunday
+    chunk["session_hour"] = date.hour.astype("Int8")
+    chunk["session_month"] = date.month.astype("Int8")
+    chunk["session_year"] = date.year.astype("Int16")
+    chunk["is_weekend"] = (chunk["session_weekday"] >= 5).astype("Int8")
+    return chunk
+
+
+def run_pipeline(sessions_source: str, students_source: str, out_dir: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    students, student_stats = clean_students(load_students(students_source))
+    students_path = os.path.join(out_dir, "students.parquet")
+    students.to_parquet(students_path, index=False)
+    student_stats["rows"] = len(students)
+    # Left join: every session is kept, student columns are null when unmatched.
+    # set_index copies, so the frame it was made from is dropped.
+    lookup = students.set_index("student_id")
+    del students
+
+    stage_path = os.path.join(out_dir, "sessions.stage.parquet")
+    sessions = ParquetSink(os.path.join(out_dir, "sessions.parquet"))
+    merged = ParquetSink(os.path.join(out_dir, "merged.parquet"))
+    try:
+        session_stats = stage_sessions(sessions_source, stage_path)
+        # Pass 2
+        for batch in iter_parquet(stage_path, chunk_size):
+            chunk = session_features(to_frame(pa.Table.from_batches([batch])), session_stats)
+            sessions.write(chunk)
+            merged.write(chunk.join(lookup, on="student_id", rsuffix="_student"))
+    finally:
+        sessions.close()
+        merged.close()
+        if os.path.exists(stage_path):
+            os.remove(stage_path)
+    return {
+        "sessions": {**session_stats, "path": sessions.path},
+        "students": {**student_stats, "path": students_path},
+        "merged": {"rows": merged.rows, "path": merged.path},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the tutoring sessions and students and add features")
+    parser.add_argument("--api", default=API_URL, help="base URL of the API to export from")
+    parser.add_argument("--sessions", help="read sessions from this .arrows/.parquet file instead of the API")
+    parser.add_argument("--students", help="read students from this .arrows/.parquet file instead of the API")
+    parser.add_argument("--out", default=".", help="directory for the Parquet outputs")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="session rows per chunk")
+    args = parser.parse_args()
 
-try:
-    # Fetching data for dataset
-    tutoring_session_api = requests.get('http://127.0.0.1:8002/sessions/unprotected')
-    tutoring_session_api.raise_for_status()
-    tutoring_session_api_data = tutoring_session_api.json()
+    try:
+        report = run_pipeline(args.sessions or args.api, args.students or args.api, args.out, args.chunk_size)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching data from API: {e}")
+        sys.exit(1)
 
-    student_api = requests.get('http://127.0.0.1:8002/students/unprotected')
-    student_api.raise_for_status()
-    student_api_data = student_api.json()
+    sessions, students, merged = report["sessions"], report["students"], report["merged"]
+    print(f"sessions: {sessions['rows']} rows -> {sessions['path']}")
+    print(f"  missing duration {sessions['duration_nulls']} (filled with median {sessions['duration_fill']}), "
+          f"missing date {sessions['date_nulls']} (filled with {sessions['date_fill']})")
+    print(f"students: {students['rows']} rows -> {students['path']}")
+    print(f"  missing age {students['age_nulls']} (filled with median {students['age_median']})")
+    print(f"merged: {merged['rows']} rows -> {merged['path']}")
 
-    # Create DataFrames
-    vdf = pd.DataFrame(tutoring_session_api_data)
-    odf = pd.DataFrame(student_api_data)
-
-    # 1. Describe the dataset
-    print(f"\n--- Describing the tutoring_sessions DataFrame ---\n shape the session: {vdf.shape}")
-    print(vdf.describe())
-    print(vdf.info())
-
-    print(f"\n--- Describing the students DataFrame ---\n shape the student: {vdf.shape}")
-    print(odf.describe())
-    print(odf.info())
-
-    # --- 2. Find and replace null values ---
-    # Check for missing values
-    print("\nMissing values in tutoring sessions:")
-    print(vdf.isnull().sum())
-
-    print("\nMissing values in students:")
-    print(odf.isnull().sum())
-
-    # --- Handling missing values in tutoring_sessions (vdf) ---
-    # Replace null values in numerical columns with the median (to avoid outliers impacting the mean)
-    vdf['duration'] = vdf['duration'].fillna(vdf['duration'].median())
-
-    # Replace null date with the most frequent date (mode)
-    vdf['date'] = pd.to_datetime(vdf['date'], errors='coerce')
-    vdf['date'] = vdf['date'].fillna(vdf['date'].mode()[0])  # Replace with mode (most frequent)
-
-    # --- Handling missing values in students (odf) ---
-    if 'age' in odf.columns:
-        odf['age'] = odf['age'].fillna(odf['age'].median())  # Replace missing ages with median value
-
-    print("\nMissing values after imputation in tutoring_sessions:")
-    print(vdf.isnull().sum())
-
-    print("\nMissing values after imputation in students:")
-    print(odf.isnull().sum())
-
-    # --- 3. Basic Data Preprocessing ---
-    # Convert 'date' to datetime format
-    vdf['date'] = pd.to_datetime(vdf['date'], errors='coerce')
-
-    # --- Encode Categorical Features ---
-    # One-Hot Encoding for 'subject'
-    vdf = pd.get_dummies(vdf, columns=['subject'], drop_first=True)  # Drop first to avoid collinearity
-
-    # Label Encoding for 'session_duration_category'
-    vdf['session_duration_category'] = pd.cut(vdf['duration'], bins=[0, 30, 60, 120],
-                                              labels=['short', 'medium', 'long'])
-    vdf['session_duration_category'] = vdf['session_duration_category'].map({'short': 0, 'medium': 1, 'long': 2})
-
-    # --- Handle Encoding for students ---
-    # One-Hot Encoding for 'student_age_category'
-    if 'age' in odf.columns:
-        odf['student_age_category'] = pd.cut(odf['age'], bins=[0, 18, 25, 100], labels=['Under 18', '18-25', 'Over 25'])
-        odf = pd.get_dummies(odf, columns=['student_age_category'], drop_first=True)  # One-Hot Encoding
-
-
-    # --- 4. Create New Features ---
-    # Feature Engineering for tutoring_sessions (vdf)
-    vdf['session_weekday'] = vdf['date'].dt.dayofweek  # 0=Monday, 6=Sunday
-    vdf['session_hour'] = vdf['date'].dt.hour  # Hour of the day
-    vdf['session_month'] = vdf['date'].dt.month  # Month of the year
-    vdf['session_year'] = vdf['date'].dt.year  # Year of session
-    vdf['is_weekend'] = vdf['session_weekday'].apply(lambda x: 1 if x >= 5 else 0)  # 1 if weekend, 0 if weekday
-
-    # Create 'session_duration_category' based on the duration
-    vdf['session_duration_category'] = pd.cut(vdf['duration'], bins=[0, 30, 60, 120],
-                                              labels=['short', 'medium', 'long'])
-
-    # --- Feature Engineering for students (odf) ---
-    if 'enrollment_date' in odf.columns:
-        odf['enrollment_year'] = odf['enrollment_date'].dt.year  # Extract enrollment year
-        odf['enrollment_duration'] = (pd.to_datetime('today') - odf['enrollment_date']).dt.days  # Duration in days
-
-    # --- Display cleaned data (sample) ---
-    print("\nCleaned Tutoring Sessions DataFrame (First 5 rows):")
-    print(vdf.head())
-
-    print("\nCleaned Students DataFrame (First 5 rows):")
-    print(odf.head())
-
-    # Merge the two DataFrames on the 'student_id' column (assumed common column)
-    merged_df = pd.merge(vdf, odf, on='student_id', how='left')  # Left join to retain all tutoring sessions
-
-    # Check if any null values remain in the merged dataset
-    print("\nMissing values after merging the datasets:")
-    print(merged_df.isnull().sum())
-
-    # --- Display merged data (sample) ---
-    print("\nMerged DataFrame (First 5 rows):")
-    print(merged_df.head())
-
-    # Saving the final DataFrames to CSV files for further analysis
-    vdf.to_csv('cleaned_tutoring_sessions.csv', index=False)
-    odf.to_csv('cleaned_students.csv', index=False)
-    merged_df.to_csv('merged_tutoring_sessions_and_students.csv', index=False)
 
-except requests.exceptions.RequestException as e:
-    print(f"Error fetching data from API: {e}")
+if __name__ == "__main__":
+    main()
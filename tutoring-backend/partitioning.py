@@ -0,0 +1,257 @@
+import argparse
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
+import database
+from models import TutoringSession
+
+
+# Optional monthly range partitioning of tutoring_sessions.
+#
+# `convert` rewrites the table as PARTITION BY RANGE (date) with one partition
+# per calendar month (tutoring_sessions_pYYYYMM) plus a default partition for
+# dates outside them. Queries don't change: the date filters on /sessions/
+# prune to the months they cover. Old months can be detached (and kept as
+# plain tables, or dropped) instead of deleted row by row.
+#
+#   python partitioning.py convert --months-ahead 3
+#   python partitioning.py create --months-ahead 3     # e.g. from a monthly cron
+#   python partitioning.py detach --before 2023-01 [--drop]
+#
+# Unique constraints on a partitioned table must include the partition key,
+# so the primary key on id becomes a unique index on (id, date); ids still
+# come from the table's sequence. Sessions without a date land in the default
+# partition. `convert` holds an exclusive lock on tutoring_sessions while it
+# copies, so run it in a maintenance window.
+#
+# The double-booking exclusion constraints (migration 0006) can't go on the
+# partitioned table, which only allows them when they compare the partition
+# key with =, so every partition gets its own. Sessions in different
+# partitions aren't checked against each other: a session that runs past
+# midnight at the end of a month can overlap the next month's first ones.
+TABLE = "tutoring_sessions"
+MONTHS_AHEAD = 3
+PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+# Stands in for the primary key once the table is partitioned
+ID_DATE_INDEX = f"{TABLE}_id_date_key"
+# The stored columns; topic_search and period are generated
+COLUMNS = "id, tutor_id, student_id, date, duration, topic, created_at, updated_at"
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned(conn, table: str = TABLE) -> bool:
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    ).scalar())
+
+
+def partitions(conn, table: str = TABLE) -> dict:
+    # month -> partition name, for the monthly partitions attached to `table`
+    names = conn.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:table)
+        """),
+        {"table": table},
+    ).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partitioned_table(conn, table: str = TABLE, sequence: str | None = None) -> None:
+    # Same columns as the model; keys and indexes are added after the data is in
+    default = f"DEFAULT nextval('{sequence}')" if sequence else ""
+    topic_search = TutoringSession.__table__.c.topic_search.computed.sqltext
+    period = TutoringSession.__table__.c.period.computed.sqltext
+    conn.execute(text(f"""
+        CREATE TABLE {table} (
+            id integer NOT NULL {default},
+            tutor_id integer,
+            student_id integer,
+            date timestamp without time zone,
+            duration integer,
+            topic varchar(200),
+            topic_search tsvector GENERATED ALWAYS AS ({topic_search}) STORED,
+            period tsrange GENERATED ALWAYS AS ({period}) STORED,
+            created_at timestamp with time zone DEFAULT change_timestamp(),
+            updated_at timestamp with time zone DEFAULT change_timestamp()
+        ) PARTITION BY RANGE (date)
+    """))
+    conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    create_exclusions(conn, f"{table}_default")
+
+
+def create_indexes(conn, table: str = TABLE) -> None:
+    # The indexes declared on TutoringSession, created on the parent so every
+    # partition (present and future) gets them
+    for index in TutoringSession.__table__.indexes:
+        name = index.name.replace(TABLE, table, 1)
+        options = index.dialect_options["postgresql"]
+        ops = options["ops"] or {}
+        columns = ", ".join(f"{column.name} {ops.get(column.name, '')}".strip() for column in index.columns)
+        using = f"USING {options['using']} " if options["using"] else ""
+        conn.execute(text(f"CREATE INDEX {name} ON {table} {using}({columns})"))
+
+
+def create_exclusions(conn, partition: str) -> None:
+    # The exclusion constraints declared on TutoringSession, on one partition
+    for constraint in TutoringSession.__table__.constraints:
+        if isinstance(constraint, ExcludeConstraint):
+            name = constraint.name.replace(TABLE, partition, 1)
+            elements = ", ".join(f"{column.name} WITH {constraint.operators[column.name]}" for column in constraint.columns)
+            deferrable = f"DEFERRABLE INITIALLY {constraint.initially}" if constraint.deferrable else ""
+            conn.execute(text(
+                f"ALTER TABLE {partition} ADD CONSTRAINT {name} EXCLUDE USING {constraint.using} ({elements}) {deferrable}"
+            ))
+
+
+def create_triggers(conn, table: str = TABLE) -> None:
+    # Change tracking, as migration 0005 sets it up; both fire for every
+    # partition. Rows moved between partitions by this module go through
+    # the partitions directly, so they don't leave tombstones.
+    conn.execute(text(
+        f"CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION touch_updated_at()"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {table}_tombstones AFTER DELETE ON {table} REFERENCING OLD TABLE AS deleted_rows "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('{TABLE}', 'id')"
+    ))
+
+
+def create_partitions(conn, first: date, last: date, table: str = TABLE) -> list:
+    # Adds the missing monthly partitions from `first` to `last` (inclusive).
+    # Rows that already landed in the default partition for one of those months
+    # are moved into the new partition before it is attached.
+    existing = partitions(conn, table)
+    created = []
+    month, last = month_start(first), month_start(last)
+    while month <= last:
+        if month not in existing:
+            name = partition_name(table, month)
+            bounds = {"lower": month, "upper": add_months(month, 1)}
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED)"))
+            create_exclusions(conn, name)
+            conn.execute(
+                text(f"""
+                    WITH moved AS (
+                        DELETE FROM {table}_default WHERE date >= :lower AND date < :upper RETURNING {COLUMNS}
+                    )
+                    INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM moved
+                """),
+                bounds,
+            )
+            conn.execute(text(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def convert(months_ahead: int = MONTHS_AHEAD) -> dict:
+    with database.engine.begin() as conn:
+        if is_partitioned(conn):
+            raise SystemExit(f"{TABLE} is already partitioned")
+        conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        first, last = conn.execute(text(f"SELECT min(date), max(date) FROM {TABLE}")).first()
+        today = month_start(date.today())
+        first = month_start(first) if first else today
+        last = max(month_start(last) if last else today, add_months(today, months_ahead))
+
+        # The id sequence outlives the old table and keeps numbering where it was
+        sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned"))
+        create_partitioned_table(conn, TABLE, sequence)
+        created = create_partitions(conn, first, last)
+        rows = conn.execute(text(f"""
+            INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {TABLE}_unpartitioned
+        """)).rowcount
+        conn.execute(text(f"DROP TABLE {TABLE}_unpartitioned"))
+
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+        conn.execute(text(f"CREATE UNIQUE INDEX {ID_DATE_INDEX} ON {TABLE} (id, date)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD FOREIGN KEY (tutor_id) REFERENCES tutors (id)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD FOREIGN KEY (student_id) REFERENCES students (student_id)"))
+        create_indexes(conn)
+        create_triggers(conn)
+        conn.execute(text(f"ANALYZE {TABLE}"))
+    return {"rows": rows, "partitions": len(created), "first": str(first), "last": str(last)}
+
+
+def create(months_ahead: int = MONTHS_AHEAD) -> list:
+    with database.engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise SystemExit(f"{TABLE} is not partitioned; run `convert` first")
+        today = month_start(date.today())
+        return create_partitions(conn, today, add_months(today, months_ahead))
+
+
+def detach(before: date, drop: bool = False) -> list:
+    # Detached partitions stay behind as ordinary tables unless `drop` is set
+    detached = []
+    with database.engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise SystemExit(f"{TABLE} is not partitioned")
+        for month, name in sorted(partitions(conn).items()):
+            if month >= before:
+                break
+            conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            detached.append(name)
+    return detached
+
+
+def parse_month(value: str) -> date:
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly range partitioning for tutoring_sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="rewrite tutoring_sessions as a partitioned table")
+    convert_parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    create_parser = commands.add_parser("create", help="add partitions up to N months from now")
+    create_parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    detach_parser = commands.add_parser("detach", help="detach the partitions of months before --before")
+    detach_parser.add_argument("--before", type=parse_month, required=True, help="YYYY-MM")
+    detach_parser.add_argument("--drop", action="store_true", help="drop the detached tables")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        report = convert(args.months_ahead)
+        print(f"{report['rows']} sessions in {report['partitions']} monthly partitions ({report['first']} to {report['last']})")
+    elif args.command == "create":
+        created = create(args.months_ahead)
+        print("created " + (", ".join(created) if created else "nothing"))
+    else:
+        detached = detach(args.before, args.drop)
+        print(("dropped " if args.drop else "detached ") + (", ".join(detached) if detached else "nothing"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+import metrics
+from config import PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILER, PROFILING, SLOW_QUERY_MS
+
+try:
+    import pyinstrument
+except ImportError:  # only needed for PROFILER=pyinstrument
+    pyinstrument = None
+
+
+# Opt-in request profiling (PROFILING=1). The profile_request middleware puts
+# a RequestProfile in a contextvar; code that wants its time reported wraps
+# itself in stage(name) and the totals go out in a Server-Timing header:
+#
+#   total      the whole request, as seen by the middleware
+#   auth       get_current_user (token decode + principal lookup)
+#   endpoint   the route function itself (ProfiledRoute)
+#   db         SQL time and statement count (metrics.request_db_stats)
+#   cache      list_cache lookups and stores
+#   serialize  building JSON bodies from rows
+#   framework  total - auth - endpoint: request parsing, Pydantic response
+#              validation, encoding of model responses, middleware
+#
+# db, cache and serialize are nested inside auth/endpoint, so they don't add up.
+#
+# A sampled request is also profiled and dumped to PROFILE_DIR. cprofile
+# profiles the endpoint function in whichever thread it runs; pyinstrument
+# follows the request on the event loop, where time a sync route spends in
+# the threadpool shows as one await (use DB_ASYNC=1 to see the DB calls).
+logger = logging.getLogger("tutoring.profiling")
+
+if PROFILE_SAMPLE_RATE and PROFILER not in ("cprofile", "pyinstrument"):
+    raise ValueError(f"Unsupported PROFILER: {PROFILER}")
+if PROFILE_SAMPLE_RATE and PROFILER == "pyinstrument" and pyinstrument is None:
+    raise RuntimeError("PROFILER is pyinstrument but the pyinstrument package is not installed")
+
+db_slow_queries = metrics.Counter(
+    "db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ["engine"]
+)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, sampled: bool):
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.profilers = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+request_profile = contextvars.ContextVar("request_profile", default=None)
+
+# Profilers hook the whole thread (and from Python 3.12 the whole process),
+# so each worker profiles one request at a time
+sample_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    profile = request_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def endpoint_stage(profile: RequestProfile):
+    profiler = cProfile.Profile() if profile.sampled and PROFILER == "cprofile" else None
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile.profilers.append(profiler)
+        profile.add("endpoint", time.perf_counter() - started)
+
+
+def timed_endpoint(endpoint):
+    # functools.wraps keeps the signature FastAPI reads dependencies from.
+    # include_router builds the routes again from their (already timed) endpoints.
+    if getattr(endpoint, "timed", False):
+        return endpoint
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            with endpoint_stage(profile):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            with endpoint_stage(profile):
+                return endpoint(*args, **kwargs)
+    timed.timed = True
+    return timed
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+
+# route_class for every router in the app
+ROUTE_CLASS = ProfiledRoute if PROFILING else APIRoute
+
+
+def should_sample() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and sample_lock.acquire(blocking=False)
+
+
+def server_timing(profile: RequestProfile, total: float, db_stats) -> str:
+    entries = [f"total;dur={total * 1000:.1f}"]
+    for name in ("auth", "endpoint"):
+        if name in profile.stages:
+            entries.append(f"{name};dur={profile.stages[name] * 1000:.1f}")
+    if db_stats is not None and db_stats["statements"]:
+        entries.append(f'db;dur={db_stats["seconds"] * 1000:.1f};desc="statements={db_stats["statements"]}"')
+    for name, seconds in profile.stages.items():
+        if name not in ("auth", "endpoint"):
+            entries.append(f"{name};dur={seconds * 1000:.1f}")
+    framework = total - profile.stages.get("auth", 0.0) - profile.stages.get("endpoint", 0.0)
+    entries.append(f"framework;dur={max(framework, 0.0) * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def dump_path(profile: RequestProfile, total: float, extension: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.path).strip("_") or "root"
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{profile.method}-{slug}-{total * 1000:.0f}ms.{extension}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, name)
+
+
+async def profile_request(request, call_next):
+    profile = RequestProfile(request.method, request.url.path, should_sample())
+    token = request_profile.set(profile)
+    profiler = None
+    try:
+        if profile.sampled and PROFILER == "pyinstrument":
+            profiler = pyinstrument.Profiler(async_mode="enabled")
+            profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+    finally:
+        request_profile.reset(token)
+        if profile.sampled:
+            sample_lock.release()
+
+    total = time.perf_counter() - profile.started
+    response.headers["Server-Timing"] = server_timing(profile, total, metrics.request_db_stats.get())
+    if profiler is not None:
+        with open(dump_path(profile, total, "html"), "w") as f:
+            f.write(profiler.output_html())
+    elif profile.profilers:
+        pstats.Stats(*profile.profilers).dump_stats(dump_path(profile, total, "prof"))
+    return response
+
+
+# Slow query log, registered on every engine when SLOW_QUERY_MS is set
+def instrument_engine(engine, name: str) -> None:
+    threshold = SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start_time"].pop()
+        if elapsed < threshold:
+            return
+        db_slow_queries.inc(engine=name)
+        profile = request_profile.get()
+        # executemany parameter lists can be huge; the first 1000 characters identify the call
+        logger.warning(
+            "slow query: %.1f ms on %s%s\n%s\nparameters: %.1000r",
+            elapsed * 1000, name, f" during {profile.method} {profile.path}" if profile else "",
+            " ".join(statement.split()), parameters,
+        )
@@ -0,0 +1,274 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+import metrics
+
+try:
+    import redis
+except ImportError:  # only needed for a redis:// RATE_LIMIT_URL
+    redis = None
+
+
+# Admission control in front of every route. A request is refused with a 429
+# and a Retry-After when
+#
+# - its principal's token bucket is empty. The bucket holds `burst` requests
+#   and refills at `rate` per second, so a client polling in a tight loop is
+#   held to `rate` without slowing anyone else down;
+# - `limit` requests of its endpoint class are already running, so one kind
+#   of request (bulk exports, say) can't take every database connection. A
+#   slot is held until the whole response body has been sent.
+#
+# Stores keep the buckets and the running requests: MemoryStore inside each
+# worker, which makes every limit a per-worker one, or RedisStore on a
+# Redis-protocol server shared by every worker.
+logger = logging.getLogger("tutoring.ratelimit")
+
+# (class, path prefixes), first match wins; paths matching none are "write"
+# for unsafe methods and "read" otherwise. Exempt paths are never refused.
+ENDPOINT_CLASSES = [
+    ("exempt", ("/metrics", "/stats/", "/docs", "/redoc", "/openapi.json")),
+    ("stream", ("/changes/sessions/stream",)),
+    ("auth", ("/register/", "/token/")),
+    ("bulk", (
+        "/students/unprotected", "/sessions/unprotected", "/export/", "/students/batch", "/sessions/batch",
+        "/analytics/", "/tutors/availability",
+    )),
+]
+
+throttled_requests = metrics.Counter(
+    "throttled_requests_total", "Requests refused with a 429", ["endpoint_class", "reason"]
+)
+
+
+def client_address(scope, header: str = "", hops: int = 1) -> str:
+    # The connection's address, or the hops-th address from the end of a
+    # forwarding header (X-Forwarded-For: client, proxy1, proxy2)
+    if header:
+        addresses = [
+            address.strip() for value in Headers(scope=scope).getlist(header) for address in value.split(",")
+        ]
+        addresses = [address for address in addresses if address]
+        if len(addresses) >= hops:
+            return addresses[-hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def endpoint_class(method: str, path: str) -> str:
+    for name, prefixes in ENDPOINT_CLASSES:
+        if path.startswith(prefixes):
+            return name
+    return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+
+class MemoryStore:
+    blocking = False
+
+    def __init__(self):
+        # key -> (tokens, refilled at), least recently refilled first
+        self.buckets = OrderedDict()
+        self.running = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        # Takes a token; returns 0, or the seconds until one is available
+        now = time.monotonic()
+        with self._lock:
+            tokens, refilled_at = self.buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - refilled_at) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self.buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            # A bucket left alone for burst / rate seconds is full again,
+            # the same as no bucket at all
+            while self.buckets:
+                oldest, (_, oldest_at) = next(iter(self.buckets.items()))
+                if now - oldest_at < burst / rate:
+                    break
+                del self.buckets[oldest]
+        return wait
+
+    def acquire(self, name: str, limit: int):
+        # A slot to pass to release, or None if `limit` are taken
+        with self._lock:
+            if self.running.get(name, 0) >= limit:
+                return None
+            self.running[name] = self.running.get(name, 0) + 1
+            return name
+
+    def release(self, name: str, slot) -> None:
+        with self._lock:
+            self.running[name] -= 1
+
+
+# Both scripts use the server's clock, so workers whose clocks disagree still
+# share one bucket correctly. Floats go back as strings: Redis truncates Lua
+# numbers to integers.
+TAKE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1e6
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = math.min(burst, (tonumber(bucket[1]) or burst) + math.max(now - (tonumber(bucket[2]) or now), 0) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+# Running requests are a sorted set of slot ids scored by start time; slots
+# older than the lease (left by a worker that died) stop counting
+ACQUIRE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1e6
+local limit, lease = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease)
+if redis.call('ZCARD', KEYS[1]) >= limit then return 0 end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(lease * 1000))
+return 1
+"""
+
+
+class RedisStore:
+    # Works with anything speaking the redis-py client API, e.g. fakeredis
+    blocking = True
+
+    def __init__(self, client, lease: float, prefix: str = "ratelimit:"):
+        self.client = client
+        self.lease = lease
+        self.prefix = prefix
+        self._take = client.register_script(TAKE)
+        self._acquire = client.register_script(ACQUIRE)
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return float(self._take(keys=[f"{self.prefix}bucket:{key}"], args=[rate, burst]))
+
+    def acquire(self, name: str, limit: int):
+        slot = uuid.uuid4().hex
+        acquired = self._acquire(keys=[f"{self.prefix}running:{name}"], args=[limit, self.lease, slot])
+        return slot if acquired else None
+
+    def release(self, name: str, slot) -> None:
+        self.client.zrem(f"{self.prefix}running:{name}", slot)
+
+
+def make_store(url: str, lease: float):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_URL points at Redis but the redis package is not installed")
+        return RedisStore(redis.Redis.from_url(url), lease)
+    raise ValueError(f"Unsupported RATE_LIMIT_URL: {url}")
+
+
+def too_many_requests(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
+
+
+class AdmissionControl:
+    def __init__(self, store, rate: float, burst: float, limits: dict, retry_after: int):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits
+        self.retry_after = retry_after
+        # Requests of each class running in this worker
+        self.running = {}
+        self.throttled = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    async def call(self, function, *args):
+        # Network stores (Redis) are called from the threadpool
+        if self.store.blocking:
+            return await run_in_threadpool(function, *args)
+        return function(*args)
+
+    def refuse(self, name: str, reason: str, detail: str, retry_after: float) -> JSONResponse:
+        throttled_requests.inc(endpoint_class=name, reason=reason)
+        self.throttled[(name, reason)] = self.throttled.get((name, reason), 0) + 1
+        return too_many_requests(detail, retry_after)
+
+    async def admit(self, key: str, name: str) -> tuple:
+        # (slot or None, 429 response or None). A store that can't be reached
+        # lets the request through: admission control must not take the API
+        # down with it.
+        try:
+            wait = await self.call(self.store.take, key, self.rate, self.burst)
+            if wait > 0:
+                return None, self.refuse(name, "rate", "Too many requests, retry later", wait)
+            limit = self.limits.get(name)
+            if limit is None:
+                return None, None
+            slot = await self.call(self.store.acquire, name, limit)
+        except Exception:
+            logger.exception("admission check failed, letting the request through")
+            return None, None
+        if slot is None:
+            return None, self.refuse(name, "concurrency", "Server busy, retry shortly", self.retry_after)
+        self.running[name] = self.running.get(name, 0) + 1
+        return slot, None
+
+    async def release(self, name: str, slot) -> None:
+        self.running[name] -= 1
+        try:
+            await self.call(self.store.release, name, slot)
+        except Exception:
+            logger.exception("releasing a concurrency slot failed")
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self.store).__name__ if self.store else None,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "concurrency_limits": self.limits,
+            "running": self.running,
+            "throttled": [
+                {"endpoint_class": name, "reason": reason, "requests": count}
+                for (name, reason), count in self.throttled.items()
+            ],
+        }
+
+
+class AdmissionMiddleware:
+    # Plain ASGI rather than @app.middleware("http"), so a concurrency slot is
+    # held until a streamed body (exports, NDJSON, SSE) has been sent.
+    # principal_key(scope) returns the bucket key of the request.
+    def __init__(self, app, control: AdmissionControl, principal_key):
+        self.app = app
+        self.control = control
+        self.principal_key = principal_key
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.control.enabled:
+            return await self.app(scope, receive, send)
+        name = endpoint_class(scope["method"], scope["path"])
+        if name == "exempt":
+            return await self.app(scope, receive, send)
+        slot, refused = await self.control.admit(self.principal_key(scope), name)
+        if refused is not None:
+            return await refused(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if slot is not None:
+                await self.control.release(name, slot)
@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import logging
+import threading
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, text
+
+
+logger = logging.getLogger("tutoring.replicas")
+
+# Seconds the replica is behind: 0 while it has replayed everything it
+# received, otherwise the age of the last transaction it replayed (an idle
+# primary sends nothing, so a caught-up replica never looks stale). A server
+# that isn't in recovery (pointed at the primary, or promoted) has no lag.
+LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        # Not routed to until the first check has passed
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                lag = conn.execute(LAG).scalar()
+        except Exception as e:
+            self.mark_down(e)
+        else:
+            if not self.healthy:
+                logger.info("replica %s is up", self.name)
+            self.healthy = True
+            self.lag = None if lag is None else float(lag)
+            self.error = None
+        self.checked_at = datetime.utcnow()
+
+    def mark_down(self, error: Exception) -> None:
+        if self.healthy:
+            logger.warning("replica %s is down: %s", self.name, error)
+        self.healthy = False
+        self.error = str(error).strip().split("\n")[0] or repr(error)
+
+    def stats(self) -> dict:
+        return {"healthy": self.healthy, "lag_seconds": self.lag, "checked_at": self.checked_at, "error": self.error}
+
+
+class ReplicaSet:
+    # Streaming replicas of the primary that read-only requests are spread
+    # over, round-robin. A replica is skipped while its last check failed or
+    # found it more than max_lag seconds behind; with none left, reads go to
+    # the primary. A connection that drops mid-request takes its replica out
+    # at once instead of at the next check.
+    def __init__(self, replicas, max_lag: float):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            self._watch(replica)
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def _watch(self, replica: Replica) -> None:
+        def handle_error(context):
+            if context.is_disconnect:
+                replica.mark_down(context.original_exception)
+
+        event.listen(replica.engine, "handle_error", handle_error)
+        if replica.async_engine is not None:
+            event.listen(replica.async_engine.sync_engine, "handle_error", handle_error)
+
+    def available(self) -> list:
+        return [
+            replica for replica in self.replicas
+            if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag
+        ]
+
+    def choose(self) -> Replica | None:
+        available = self.available()
+        if not available:
+            return None
+        with self._lock:
+            turn = next(self._next)
+        return available[turn % len(available)]
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    def stats(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag,
+            "available": [replica.name for replica in self.available()],
+            "replicas": {replica.name: replica.stats() for replica in self.replicas},
+        }
+
+
+async def check_forever(replicas: ReplicaSet, interval: float) -> None:
+    # Runs for the life of the worker; Replica.check records its own failures
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(replicas.check)
+        except Exception:
+            logger.exception("replica check failed")
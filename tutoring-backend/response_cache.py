@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+
+try:
+    import redis
+except ImportError:  # only needed for a redis:// RESPONSE_CACHE_URL
+    redis = None
+
+
+# Cache of rendered list responses (GET /students/, GET /sessions/), one
+# namespace per tutor and list, e.g. "sessions:42". Each namespace has a
+# generation token; entries are stored tagged with the token that was current
+# when their query started and are only served while it still is. A write
+# invalidates the whole namespace by replacing the token, so a read that
+# raced the write can't put stale data back, and every filter variant of a
+# list goes at once. Entries and tokens expire after the TTL either way.
+#
+# Backends are plain key/value stores with a TTL: an in-process LRU, only for
+# a single worker since another worker's writes can't invalidate it, or a
+# Redis-protocol server shared by every worker.
+TOKEN_LENGTH = 32
+
+
+class CachedBody(NamedTuple):
+    etag: str
+    body: bytes
+
+
+class MemoryBackend:
+    # LRU bounded by entry count and by the bytes of keys and values; a value
+    # larger than the whole budget is not stored
+    blocking = False
+
+    def __init__(self, maxsize: int, maxbytes: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        # key -> (expires at, value)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] <= now:
+                    self._remove(key)
+                    entry = None
+                if entry is not None:
+                    self._data.move_to_end(key)
+                values.append(entry[1] if entry is not None else None)
+        return values
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._put(key, value)
+
+    def add(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._put(key, value)
+            return True
+
+    def _put(self, key: str, value: bytes) -> None:
+        if key in self._data:
+            self._remove(key)
+        size = len(key) + len(value)
+        if self.maxsize <= 0 or size > self.maxbytes:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.bytes += size
+        while len(self._data) > self.maxsize or self.bytes > self.maxbytes:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._data.pop(key)
+        self.bytes -= len(key) + len(value)
+
+
+class RedisBackend:
+    # Works with anything speaking the redis-py client API, e.g. fakeredis
+    blocking = True
+
+    def __init__(self, client, ttl: float, prefix: str = "response-cache:"):
+        self.client = client
+        self.ttl = max(int(ttl), 1)
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def add(self, key: str, value: bytes) -> bool:
+        return bool(self.client.set(self.prefix + key, value, ex=self.ttl, nx=True))
+
+
+def make_backend(url: str, maxsize: int, maxbytes: int, ttl: float, workers: int = 1):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        if workers > 1:
+            raise ValueError(f"RESPONSE_CACHE_URL=memory:// can't be invalidated across {workers} workers; use redis://")
+        return MemoryBackend(maxsize, maxbytes, ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("RESPONSE_CACHE_URL points at Redis but the redis package is not installed")
+        return RedisBackend(redis.Redis.from_url(url), ttl)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_URL: {url}")
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def new_token() -> bytes:
+    return uuid.uuid4().hex.encode()
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def lookup(self, namespace: str, variant: str):
+        # Returns (generation to store a fresh body under, cached body or None)
+        if self.backend is None:
+            return None, None
+        generation, entry = self.backend.get_many([f"{namespace}:generation", f"{namespace}:{variant}"])
+        if generation is None:
+            generation = new_token()
+            if not self.backend.add(f"{namespace}:generation", generation):
+                generation = None
+        elif entry is not None and entry[:TOKEN_LENGTH] == generation:
+            self.hits += 1
+            etag, _, body = entry[TOKEN_LENGTH:].partition(b" ")
+            return generation, CachedBody(etag.decode(), body)
+        self.misses += 1
+        return generation, None
+
+    def store(self, namespace: str, variant: str, generation, body: bytes) -> CachedBody:
+        cached = CachedBody(etag_for(body), body)
+        if generation is not None:
+            self.backend.set(f"{namespace}:{variant}", generation + cached.etag.encode() + b" " + body)
+        return cached
+
+    def invalidate(self, namespace: str) -> None:
+        if self.backend is not None:
+            self.backend.set(f"{namespace}:generation", new_token())
+
+    def stats(self) -> dict:
+        stats = {"backend": type(self.backend).__name__ if self.backend else None, "hits": self.hits, "misses": self.misses}
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(entries=len(self.backend), bytes=self.backend.bytes)
+        return stats
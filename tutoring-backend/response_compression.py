@@ -0,0 +1,160 @@
+import zlib
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # br is only offered with the brotli package installed
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # zstd is only offered with the zstandard package installed
+    zstandard = None
+
+
+# Compression of response bodies, negotiated through Accept-Encoding: the
+# coding with the highest q-value the client accepts, ties going to the order
+# the server lists them in. Only text-like media types are compressed (Arrow
+# and Parquet exports are binary, Server-Sent Events would be held back by the
+# compressor), and a whole body only from min_size bytes, below which the
+# headers cost more than the saving. A streamed body (NDJSON, CSV exports) is
+# compressed chunk by chunk whatever its size.
+#
+# A compressed response gets Vary: Accept-Encoding, and its ETag is made weak:
+# it is the same list as the uncompressed body, not the same bytes, and
+# If-None-Match (main.etag_matches) compares weakly.
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+# Bodies from this size are compressed in the threadpool: all three
+# compressors release the GIL, and a few MB would hold up the event loop
+OFFLOAD_BYTES = 64 * 1024
+
+
+class BrotliCompressor:
+    # brotli.Compressor with the compress/flush names of zlib and zstandard
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+def available(coding: str) -> bool:
+    return coding == "gzip" or (coding == "br" and brotli is not None) or (coding == "zstd" and zstandard is not None)
+
+
+def compressor(coding: str, levels: dict):
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=levels["zstd"]).compressobj()
+    if coding == "br":
+        return BrotliCompressor(levels["br"])
+    # wbits 31: a gzip header and trailer around the deflate stream
+    return zlib.compressobj(levels["gzip"], zlib.DEFLATED, 31)
+
+
+def compress(coding: str, levels: dict, body: bytes) -> bytes:
+    encoder = compressor(coding, levels)
+    return encoder.compress(body) + encoder.flush()
+
+
+def negotiate(accept_encoding: str, codings: list):
+    # The coding to use, or None for the body as it is
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(self, app, codings: list, min_size: int, levels: dict):
+        self.app = app
+        self.codings = [coding for coding in codings if available(coding)]
+        self.min_size = min_size
+        self.levels = levels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.codings:
+            return await self.app(scope, receive, send)
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codings)
+        if coding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, CompressingSend(send, coding, self.min_size, self.levels))
+
+
+class CompressingSend:
+    # The send callable handed to the app: holds the response start back
+    # until the first body message shows whether to compress
+    def __init__(self, send, coding: str, min_size: int, levels: dict):
+        self.send = send
+        self.coding = coding
+        self.min_size = min_size
+        self.levels = levels
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            return await self.send(message)
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not self.compressible(start, body, more_body):
+                self.passthrough = True
+                await self.send(start)
+                return await self.send(message)
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = self.coding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if not more_body:
+                body = await self.run(compress, self.coding, self.levels, body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                return await self.send({"type": "http.response.body", "body": body})
+            del headers["Content-Length"]
+            await self.send(start)
+            self.encoder = compressor(self.coding, self.levels)
+        chunk = await self.run(self.encoder.compress, body)
+        if not more_body:
+            chunk += self.encoder.flush()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def compressible(self, start, body: bytes, more_body: bool) -> bool:
+        headers = Headers(raw=start["headers"])
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (
+            start["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and media_type in COMPRESSIBLE_TYPES
+            and (more_body or len(body) >= self.min_size)
+        )
+
+    async def run(self, function, *args):
+        body = args[-1]
+        if len(body) >= OFFLOAD_BYTES:
+            return await run_in_threadpool(function, *args)
+        return function(*args)
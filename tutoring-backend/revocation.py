@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+
+from models import RefreshToken
+
+
+logger = logging.getLogger("tutoring.revocation")
+
+
+class RevocationSet:
+    # Token families revoked recently enough that one of their access tokens
+    # may still be unexpired. Access tokens are checked against it without a
+    # database round trip; an entry is dropped ttl seconds after its family
+    # was revoked, so the set only holds the last ACCESS_TOKEN_EXPIRE_MINUTES
+    # worth of logouts and reuse detections.
+    def __init__(self, ttl: float):
+        self.ttl = timedelta(seconds=ttl)
+        self.synced_at = None
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, family_id) -> bool:
+        expires_at = self._expiry.get(family_id)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add(self, family_id: str, revoked_at: datetime) -> None:
+        self.merge([(family_id, revoked_at)])
+
+    def merge(self, revoked) -> None:
+        # Entries are only ever added or expired, never replaced by a sync:
+        # a family this worker revoked while a sync was in flight stays revoked
+        now = datetime.utcnow()
+        with self._lock:
+            for family_id, revoked_at in revoked:
+                expires_at = revoked_at + self.ttl
+                if expires_at > self._expiry.get(family_id, now):
+                    self._expiry[family_id] = expires_at
+            for family_id in [family_id for family_id, expires_at in self._expiry.items() if expires_at <= now]:
+                del self._expiry[family_id]
+
+    def sync(self, session_factory) -> None:
+        # Every family revoked within the last ttl; small, and re-reading the
+        # whole window means no revocation is missed to commit ordering
+        with session_factory() as db:
+            revoked = db.execute(
+                select(RefreshToken.family_id, func.max(RefreshToken.revoked_at))
+                .where(RefreshToken.revoked_at > datetime.utcnow() - self.ttl)
+                .group_by(RefreshToken.family_id)
+            ).all()
+        self.merge(revoked)
+        self.synced_at = datetime.utcnow()
+
+    def stats(self) -> dict:
+        return {"size": len(self._expiry), "synced_at": self.synced_at}
+
+
+async def sync_forever(revoked: RevocationSet, session_factory, interval: float) -> None:
+    # Runs for the life of the worker. A failed sync keeps the families
+    # already known and retries on the next interval.
+    while True:
+        try:
+            await run_in_threadpool(revoked.sync, session_factory)
+        except Exception:
+            logger.exception("revocation sync failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,253 @@
+import argparse
+import io
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+from sqlalchemy import text
+
+import database
+import hashing
+
+
+# Bulk seeding with COPY FROM STDIN.
+#
+# Ids for every table are reserved up front by advancing the table's sequence,
+# so rows can be generated in independent chunks (in parallel worker processes)
+# and still reference each other. A student's tutor and a session's tutor are
+# pure functions of the ids, which keeps chunks free of shared state.
+# Sessions don't overlap other sessions of their tutor or student (the
+# constraints of migration 0006), see build_sessions.
+#
+#   python seeding.py --users 20000 --students 500000 --sessions 500000 --workers 8
+#
+# Don't run it while the API is taking writes: the id blocks are reserved
+# from the current max id, not handed out by nextval().
+TABLES = {
+    "users": ("id", ["id", "username", "email", "hashed_password"]),
+    "tutors": ("id", ["id", "user_id", "bio", "work_start", "work_end", "work_days"]),
+    "students": ("student_id", ["student_id", "tutor_id", "name", "email", "age"]),
+    "tutoring_sessions": ("id", ["id", "tutor_id", "student_id", "date", "duration", "topic"]),
+}
+# Every seeded user logs in with this password
+SEED_PASSWORD = "password"
+POOL_SIZE = 2000
+SESSION_WINDOW_DAYS = 365
+# Sessions start on an even hour between 08:00 and 18:00 and last at most
+# two hours, so each tutor has six non-overlapping slots a day
+SLOT_HOURS = 2
+SLOTS_PER_DAY = 6
+FIRST_SLOT_HOUR = 8
+TUTOR_MULTIPLIER = 2654435761
+# tutors.work_days masks, bit 0 = Monday
+WEEKDAYS = 0b0011111
+ALL_DAYS = 0b1111111
+
+
+def reserve_ids(conn, table: str, count: int) -> int:
+    # Returns the first id of a block of `count` fresh ids and moves the sequence past it
+    column = TABLES[table][0]
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, :column)"), {"table": table, "column": column}).scalar()
+    last_value = conn.execute(text(f"SELECT last_value, is_called FROM {sequence}")).first()
+    max_id = conn.execute(text(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")).scalar()
+    start = max(max_id, last_value[0] if last_value[1] else 0) + 1
+    conn.execute(text("SELECT setval(:sequence, :value)"), {"sequence": sequence, "value": start + count - 1})
+    return start
+
+
+def tutor_for(ids: np.ndarray, tutor_start: int, tutor_count: int) -> np.ndarray:
+    # Deterministic, roughly uniform spread of ids over the tutor id block
+    return tutor_start + (ids.astype(np.uint64) * np.uint64(TUTOR_MULTIPLIER) % np.uint64(tutor_count)).astype(np.int64)
+
+
+class Pools:
+    # Small pools of Faker values sampled with NumPy instead of one Faker call per row
+    def __init__(self, seed: int):
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.names = np.array([fake.name() for _ in range(POOL_SIZE)], dtype=object)
+        self.words = np.array([fake.word() for _ in range(POOL_SIZE)], dtype=object)
+        self.bios = np.array([fake.text(max_nb_chars=200) for _ in range(POOL_SIZE // 10)], dtype=object)
+
+
+_pools = None
+
+
+def init_worker(seed: int) -> None:
+    global _pools
+    _pools = Pools(seed)
+
+
+def build_users(rng, ids, plan):
+    return pd.DataFrame({
+        "id": ids,
+        "username": "user" + pd.Series(ids).astype(str),
+        "email": "user" + pd.Series(ids).astype(str) + "@example.com",
+        "hashed_password": plan["password_hash"],
+    })
+
+
+def build_tutors(rng, ids, plan):
+    # Working days start between 07:00 and 10:00 and last 6 to 10 hours;
+    # most tutors work Monday to Friday, the rest add the weekend
+    starts = rng.integers(7, 11, len(ids))
+    return pd.DataFrame({
+        "id": ids,
+        "user_id": ids - plan["tutors"] + plan["users"],
+        "bio": _pools.bios[rng.integers(0, len(_pools.bios), len(ids))],
+        "work_start": pd.Series(starts).map("{:02d}:00".format),
+        "work_end": pd.Series(starts + rng.integers(6, 11, len(ids))).map("{:02d}:00".format),
+        "work_days": np.where(rng.random(len(ids)) < 0.8, WEEKDAYS, ALL_DAYS),
+    })
+
+
+def build_students(rng, ids, plan):
+    names = _pools.names[rng.integers(0, POOL_SIZE, len(ids))]
+    return pd.DataFrame({
+        "student_id": ids,
+        "tutor_id": tutor_for(ids, plan["tutors"], plan["tutor_count"]),
+        "name": names,
+        "email": "student" + pd.Series(ids).astype(str) + "@example.com",
+        "age": rng.integers(18, 41, len(ids)),
+    })
+
+
+def session_slots(plan) -> dict:
+    # Students whose ids are congruent mod tutor_count share a tutor
+    # (TUTOR_MULTIPLIER is prime, so tutor_for is a bijection on the residues),
+    # and the first min(tutor_count, student_count) student ids fall in
+    # distinct tutors. Session k is given a student congruent to the
+    # (k % groups)-th of them and slot k // groups of that tutor's calendar:
+    # two sessions of one tutor (and so of one student) never share a slot.
+    groups = min(plan["tutor_count"], plan["student_count"])
+    slots = max(SESSION_WINDOW_DAYS * SLOTS_PER_DAY, -(-plan["session_count"] // groups))
+    # Slots are visited in a scattered order, k -> k * stride mod slots
+    stride = 1000003
+    while math.gcd(stride, slots) != 1:
+        stride += 2
+    days = -(-slots // SLOTS_PER_DAY)
+    return {
+        "groups": groups,
+        "slots": slots,
+        "stride": stride,
+        "window_start": (datetime.now() - timedelta(days=days)).date().isoformat(),
+    }
+
+
+def build_sessions(rng, ids, plan):
+    slots = plan["session_slots"]
+    k = ids - plan["tutoring_sessions"]
+    group = k % slots["groups"]
+    # Students congruent to the group's first one, among the seeded students
+    members = (plan["student_count"] - group + plan["tutor_count"] - 1) // plan["tutor_count"]
+    student_ids = plan["students"] + group + plan["tutor_count"] * (rng.random(len(ids)) * members).astype(np.int64)
+    slot = (k // slots["groups"] * slots["stride"] + group) % slots["slots"]
+    start = np.datetime64(slots["window_start"], "h")
+    hours = FIRST_SLOT_HOUR + slot % SLOTS_PER_DAY * SLOT_HOURS
+    dates = start + (slot // SLOTS_PER_DAY).astype("timedelta64[D]") + hours.astype("timedelta64[h]")
+    topics = _pools.words[rng.integers(0, POOL_SIZE, len(ids))] + " " + _pools.words[rng.integers(0, POOL_SIZE, len(ids))]
+    return pd.DataFrame({
+        "id": ids,
+        "tutor_id": tutor_for(student_ids, plan["tutors"], plan["tutor_count"]),
+        "student_id": student_ids,
+        "date": dates,
+        "duration": rng.integers(30, SLOT_HOURS * 60 + 1, len(ids)),
+        "topic": topics,
+    })
+
+
+BUILDERS = {
+    "users": build_users,
+    "tutors": build_tutors,
+    "students": build_students,
+    "tutoring_sessions": build_sessions,
+}
+
+
+def copy_frame(table: str, frame: pd.DataFrame) -> None:
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ", ".join(TABLES[table][1])
+    raw = database.engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def load_chunk(task) -> int:
+    table, first_id, count, seed, plan = task
+    rng = np.random.default_rng(seed)
+    ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    copy_frame(table, BUILDERS[table](rng, ids, plan))
+    return count
+
+
+def seed(users: int, students: int, sessions: int, workers: int = 4, batch_size: int = 50000, random_seed: int = 0) -> dict:
+    if (students or sessions) and not users:
+        raise ValueError("students and sessions need at least one tutor; pass --users")
+    if sessions and not students:
+        raise ValueError("sessions need at least one student; pass --students")
+
+    counts = {"users": users, "tutors": users, "students": students, "tutoring_sessions": sessions}
+    with database.engine.begin() as conn:
+        starts = {table: reserve_ids(conn, table, count) for table, count in counts.items() if count}
+    # Worker processes open their own connections; don't hand them ours
+    database.engine.dispose()
+    plan = {
+        "users": starts.get("users", 0),
+        "tutors": starts.get("tutors", 0),
+        "tutor_count": users,
+        "students": starts.get("students", 0),
+        "student_count": students,
+        "tutoring_sessions": starts.get("tutoring_sessions", 0),
+        "session_count": sessions,
+        "password_hash": hashing.pwd_context.hash(SEED_PASSWORD),
+    }
+    if sessions:
+        plan["session_slots"] = session_slots(plan)
+
+    report = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(random_seed,)) as pool:
+        # Tables go one at a time so foreign keys always point at loaded rows
+        for n, (table, count) in enumerate(counts.items()):
+            if not count:
+                continue
+            tasks = [
+                (table, starts[table] + offset, min(batch_size, count - offset), random_seed * 1000003 + n * 7919 + offset, plan)
+                for offset in range(0, count, batch_size)
+            ]
+            started = time.perf_counter()
+            loaded = sum(pool.map(load_chunk, tasks))
+            elapsed = time.perf_counter() - started
+            report[table] = {"rows": loaded, "seconds": round(elapsed, 2), "rows_per_sec": round(loaded / elapsed)}
+            print(f"{table:<18} {loaded:>10} rows  {elapsed:8.2f}s  {loaded / elapsed:>10.0f} rows/s")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load dummy users, tutors, students and sessions with COPY")
+    parser.add_argument("--users", type=int, default=1000, help="users to create, one tutor each")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4, help="generator/loader processes")
+    parser.add_argument("--batch-size", type=int, default=50000, help="rows per COPY")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible datasets")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = seed(args.users, args.students, args.sessions, args.workers, args.batch_size, args.seed)
+    elapsed = time.perf_counter() - started
+    total = sum(table["rows"] for table in report.values())
+    print(f"{'total':<18} {total:>10} rows  {elapsed:8.2f}s  {total / elapsed:>10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
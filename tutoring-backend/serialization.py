@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is only a speedup; the stdlib encoder produces the same JSON
+    orjson = None
+
+
+# Fast path for list endpoints: rows selected as plain column tuples go
+# straight to JSON, with no ORM instances, identity map, Pydantic models or
+# jsonable_encoder in between. The keys are the selected column labels, so
+# the statement has to label its columns the way the response model names them.
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=datetime.isoformat, separators=(",", ":")).encode()
+
+
+class RowsResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def row_dicts(rows, keys) -> list:
+    keys = tuple(keys)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def rows_json(result) -> bytes:
+    return dumps(row_dicts(result, result.keys()))
+
+
+def ndjson_lines(rows, keys) -> bytes:
+    keys = tuple(keys)
+    return b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows)
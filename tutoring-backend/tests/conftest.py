@@ -0,0 +1,117 @@
+# The tests run against the Postgres database in DATABASE_URL, migrated to
+# head (alembic upgrade head), and are skipped when it can't be reached. Each
+# test gets a tutor of its own, removed again afterwards.
+#
+#   DATABASE_URL=postgresql://... python -m pytest -q
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, event, text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Both request paths are tested, so the async engine is needed as well. No
+# response cache or admission control: every request runs its own queries.
+os.environ["DB_ASYNC"] = "1"
+os.environ["RESPONSE_CACHE_URL"] = ""
+os.environ["RATE_LIMIT_URL"] = ""
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+from models import Student, Tutor, TutoringSession, User  # noqa: E402
+from principal_cache import Principal  # noqa: E402
+
+ROUTERS = {"sync": main.sync_router, "async": main.async_router}
+
+
+@pytest.fixture(scope="session")
+def database_available():
+    try:
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"no database at DATABASE_URL: {e}")
+
+
+@pytest.fixture(params=list(ROUTERS))
+def client(request, database_available):
+    # The CRUD routes of one path, without main.app's middleware
+    app = FastAPI()
+    app.include_router(ROUTERS[request.param])
+    app.add_exception_handler(main.ScheduleConflict, main.schedule_conflict_handler)
+    with TestClient(app) as client:
+        if request.param == "async":
+            # Connects the async pool on this client's event loop, so the
+            # dialect's first-connect queries aren't counted in a test, and
+            # closes it again: asyncpg connections are tied to their loop
+            client.portal.call(warm_async_engine)
+            yield client
+            client.portal.call(database.async_engine.dispose)
+        else:
+            yield client
+
+
+async def warm_async_engine():
+    async with database.async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+@pytest.fixture
+def tutor(database_available):
+    # A tutor with two students, the first with one session
+    db = database.SessionLocal()
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    tutor = Tutor(user_id=user.id)
+    db.add(tutor)
+    db.flush()
+    students = [Student(tutor_id=tutor.id, name=f"{name} {n}", email=f"{name}.{n}@example.com", age=20) for n in range(2)]
+    db.add_all(students)
+    db.flush()
+    session = TutoringSession(
+        tutor_id=tutor.id, student_id=students[0].student_id, date=datetime(2030, 1, 7, 9), duration=60, topic="algebra"
+    )
+    db.add(session)
+    db.commit()
+    token = main.create_access_token(Principal(user.id, name, tutor.id), uuid.uuid4().hex)
+    yield SimpleNamespace(
+        id=tutor.id,
+        headers={"Authorization": f"Bearer {token}"},
+        student_ids=[student.student_id for student in students],
+        session_id=session.id,
+        next_date=iter(datetime(2030, 2, 4, 9) + timedelta(hours=2 * n) for n in range(1000)),
+    )
+    db.execute(delete(TutoringSession).where(TutoringSession.tutor_id == tutor.id))
+    db.execute(delete(Student).where(Student.tutor_id == tutor.id))
+    db.execute(delete(Tutor).where(Tutor.id == tutor.id))
+    db.execute(delete(User).where(User.id == user.id))
+    db.execute(text("DELETE FROM tombstones WHERE tutor_id = :tutor_id"), {"tutor_id": tutor.id})
+    db.commit()
+    db.close()
+
+
+@pytest.fixture
+def statements(database_available):
+    # SQL statements sent on the sync and async engines while the test runs
+    sent = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield sent
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
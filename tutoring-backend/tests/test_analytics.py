@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import analytics
+import auth
+import database
+
+
+# A session whose transaction is still open during a refresh is folded in by
+# a later one, even though a session with a higher id committed before it:
+# the refresh holds back everything created after the open transaction began.
+INSERT_SESSION = text("""
+    INSERT INTO tutoring_sessions (tutor_id, student_id, date, duration, topic)
+    VALUES (:tutor_id, :student_id, :date, 60, 'late commit') RETURNING id
+""")
+INTERNAL = {"X-Internal-Token": "internal-secret"}
+TUTOR_SESSIONS = text("SELECT coalesce(sum(sessions), 0) FROM session_hourly_summary WHERE tutor_id = :tutor_id")
+
+
+def refresh() -> dict:
+    with database.SessionLocal() as db:
+        return analytics.refresh_summaries(db)
+
+
+def folded_sessions(tutor_id: int) -> int:
+    with database.engine.connect() as conn:
+        return conn.execute(TUTOR_SESSIONS, {"tutor_id": tutor_id}).scalar()
+
+
+def forget_summaries(tutor_id: int) -> None:
+    # The tutor fixture removes the sessions, not what was folded from them
+    with database.engine.begin() as conn:
+        conn.execute(text("DELETE FROM session_hourly_summary WHERE tutor_id = :tutor_id"), {"tutor_id": tutor_id})
+        conn.execute(text("DELETE FROM student_session_summary WHERE tutor_id = :tutor_id"), {"tutor_id": tutor_id})
+
+
+def test_late_commit_is_folded(tutor):
+    refresh()
+    assert folded_sessions(tutor.id) == 1
+    params = {"tutor_id": tutor.id, "student_id": tutor.student_ids[1]}
+    late = database.engine.connect()
+    try:
+        late_transaction = late.begin()
+        late_id = late.execute(INSERT_SESSION, {**params, "date": datetime(2030, 3, 4, 9)}).scalar()
+        with database.engine.begin() as conn:
+            early_id = conn.execute(INSERT_SESSION, {**params, "date": datetime(2030, 3, 5, 9)}).scalar()
+        assert early_id > late_id
+        refresh()
+        assert folded_sessions(tutor.id) == 1
+        late_transaction.commit()
+    finally:
+        late.close()
+    refresh()
+    assert folded_sessions(tutor.id) == 3
+    forget_summaries(tutor.id)
+
+
+# The refresh takes the internal token, the reads a tutor's access token and
+# only show that tutor's figures
+@pytest.fixture
+def analytics_client(monkeypatch, database_available):
+    monkeypatch.setattr(auth, "INTERNAL_API_TOKEN", "internal-secret")
+    app = FastAPI()
+    app.include_router(analytics.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_refresh_needs_internal_token(analytics_client):
+    assert analytics_client.post("/analytics/refresh").status_code == 403
+    assert analytics_client.post("/analytics/refresh", headers={"X-Internal-Token": "wrong"}).status_code == 403
+    response = analytics_client.post("/analytics/refresh", headers=INTERNAL)
+    assert response.status_code == 200
+
+
+def test_reads_need_a_token(analytics_client, tutor):
+    for path in ("/analytics/sessions/summary", "/analytics/students"):
+        assert analytics_client.get(path).status_code == 401
+    for path in ("/analytics/tutors", "/analytics/medians"):
+        assert analytics_client.get(path, headers=tutor.headers).status_code == 403
+        assert analytics_client.get(path, headers=INTERNAL).status_code == 200
+
+
+def test_reads_are_scoped_to_the_caller(analytics_client, tutor):
+    refresh()
+    summary = analytics_client.get("/analytics/sessions/summary", headers=tutor.headers).json()
+    assert summary["sessions"] == 1
+    tutors = analytics_client.get("/analytics/tutors", params={"after_id": tutor.id - 1, "limit": 1}, headers=INTERNAL).json()
+    assert [(row["tutor_id"], row["sessions"]) for row in tutors] == [(tutor.id, 1)]
+    students = analytics_client.get("/analytics/students", headers=tutor.headers).json()
+    assert [row["student_id"] for row in students] == tutor.student_ids[:1]
+    forget_summaries(tutor.id)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import availability
+
+INTERNAL = {"X-Internal-Token": "internal-secret"}
+# The tutor fixture's Monday: default working hours 09:00-17:00, a session at 09:00-10:00
+MONDAY = {"from": "2030-01-07T00:00:00", "to": "2030-01-08T00:00:00"}
+
+
+def ints(*values):
+    return np.array(values, np.int64)
+
+
+def pairs(starts, ends):
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def test_merge_joins_overlapping_and_touching():
+    starts, ends = availability.merge(ints(5, 1, 3, 10, 11), ints(6, 4, 5, 12, 12))
+    assert pairs(starts, ends) == [(1, 6), (10, 12)]
+    assert pairs(*availability.merge(ints(), ints())) == []
+
+
+def test_gaps_cover_the_rest_of_the_line():
+    starts, ends = availability.gaps(ints(1, 10), ints(6, 12))
+    assert pairs(starts, ends) == [(availability.INT64.min, 1), (6, 10), (12, availability.INT64.max)]
+
+
+def test_intersect():
+    starts, ends = availability.intersect(ints(0, 10, 30), ints(5, 20, 40), ints(3, 8, 40), ints(4, 15, 50))
+    # [30, 40) only touches [40, 50)
+    assert pairs(starts, ends) == [(3, 4), (10, 15)]
+
+
+def test_coverage_counts_the_fewest_covering():
+    starts, ends = ints(0, 3, 4), ints(5, 8, 6)
+    covered_starts, covered_ends, counts = availability.coverage(starts, ends, 2)
+    assert pairs(covered_starts, covered_ends) == [(3, 6)]
+    assert counts.tolist() == [2]
+    covered_starts, covered_ends, counts = availability.coverage(starts, ends, 3)
+    assert pairs(covered_starts, covered_ends) == [(4, 5)]
+    assert counts.tolist() == [3]
+    assert pairs(*availability.coverage(starts, ends, 4)[:2]) == []
+
+
+@pytest.fixture
+def availability_client(monkeypatch, database_available):
+    monkeypatch.setattr(auth, "INTERNAL_API_TOKEN", "internal-secret")
+    app = FastAPI()
+    app.include_router(availability.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_own_availability(availability_client, tutor):
+    path = f"/tutors/{tutor.id}/availability"
+    assert availability_client.get(path, params=MONDAY).status_code == 401
+    assert availability_client.get(f"/tutors/{tutor.id + 1}/availability", params=MONDAY, headers=tutor.headers).status_code == 404
+    response = availability_client.get(path, params={**MONDAY, "min_duration": 60}, headers=tutor.headers)
+    assert response.status_code == 200
+    assert response.json() == {"tutor_id": tutor.id, "slots": [{"start": "2030-01-07T10:00:00", "end": "2030-01-07T17:00:00"}]}
+
+
+def test_bulk_availability_is_internal(availability_client, tutor):
+    body = {"tutor_ids": [tutor.id, 0], **MONDAY}
+    assert availability_client.post("/tutors/availability", json=body, headers=tutor.headers).status_code == 403
+    response = availability_client.post("/tutors/availability", json=body, headers=INTERNAL)
+    assert response.status_code == 200
+    slot = {"start": "2030-01-07T10:00:00", "end": "2030-01-07T17:00:00"}
+    assert response.json() == {
+        "tutors": [{"tutor_id": tutor.id, "slots": [slot]}],
+        "common": [{**slot, "free_tutors": 1}],
+        "not_found": [0],
+    }
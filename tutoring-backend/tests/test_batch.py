@@ -0,0 +1,67 @@
+# POST /students/batch and /sessions/batch on the sync and the async path
+def test_student_batch(client, tutor):
+    payload = {
+        "create": [{"name": "Batch Student", "email": "batch.student@example.com", "age": 25}],
+        "update": [{"id": tutor.student_ids[0], "name": "Renamed", "email": "renamed@example.com", "age": 31}, {"id": 0, "name": "x", "email": "x@example.com"}],
+        # The first student has a session
+        "delete": [tutor.student_ids[1], tutor.student_ids[0]],
+    }
+    response = client.post("/students/batch", json=payload, headers=tutor.headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert [student["name"] for student in body["created"]] == ["Batch Student"]
+    assert [student["id"] for student in body["updated"]] == [tutor.student_ids[0]]
+    assert body["deleted"] == [tutor.student_ids[1]]
+    assert [(error["op"], error["index"]) for error in body["errors"]] == [("update", 1), ("delete", 1)]
+
+
+def test_session_batch(client, tutor):
+    payload = {
+        "create": [
+            {"student_id": tutor.student_ids[1], "date": next(tutor.next_date).isoformat(), "duration": 60, "topic": "a"},
+            {"student_id": 0, "date": next(tutor.next_date).isoformat(), "duration": 60, "topic": "b"},
+        ],
+        "update": [{"id": tutor.session_id, "student_id": tutor.student_ids[0], "date": next(tutor.next_date).isoformat(), "duration": 30, "topic": "c"}],
+    }
+    response = client.post("/sessions/batch", json=payload, headers=tutor.headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert [session["topic"] for session in body["created"]] == ["a"]
+    assert [session["id"] for session in body["updated"]] == [tutor.session_id]
+    assert [(error["op"], error["index"]) for error in body["errors"]] == [("create", 1)]
+
+
+def test_session_batch_overlapping_an_existing_session(client, tutor):
+    payload = {"create": [{"student_id": tutor.student_ids[1], "date": "2030-01-07T09:30:00", "duration": 60, "topic": "x"}]}
+    response = client.post("/sessions/batch", json=payload, headers=tutor.headers)
+    assert response.status_code == 409
+    assert response.json()["conflicting_session"]["id"] == tutor.session_id
+
+
+def test_session_batch_overlap_within_the_batch(client, tutor):
+    payload = {"create": [
+        {"student_id": tutor.student_ids[1], "date": "2030-03-04T09:00:00", "duration": 60, "topic": "a"},
+        {"student_id": tutor.student_ids[1], "date": "2030-03-04T09:30:00", "duration": 60, "topic": "b"},
+    ]}
+    response = client.post("/sessions/batch", json=payload, headers=tutor.headers)
+    assert response.status_code == 409
+    body = response.json()
+    conflicting = body["conflicting_item"]
+    assert conflicting["op"] == "create"
+    assert body["conflicting_session"]["topic"] == "ab"[conflicting["index"]]
+    assert body["conflicting_session"]["id"] is None
+
+
+def test_session_batch_overlap_between_updates(client, tutor):
+    second = {"student_id": tutor.student_ids[1], "date": next(tutor.next_date).isoformat(), "duration": 60, "topic": "b"}
+    second_id = client.post("/sessions/", json=second, headers=tutor.headers).json()["id"]
+    payload = {"update": [
+        {"id": tutor.session_id, "student_id": tutor.student_ids[0], "date": "2030-03-05T09:00:00", "duration": 60, "topic": "a"},
+        {"id": second_id, "student_id": tutor.student_ids[1], "date": "2030-03-05T09:30:00", "duration": 60, "topic": "b"},
+    ]}
+    response = client.post("/sessions/batch", json=payload, headers=tutor.headers)
+    assert response.status_code == 409
+    body = response.json()
+    conflicting = body["conflicting_item"]
+    assert conflicting["op"] == "update"
+    assert body["conflicting_session"]["id"] == [tutor.session_id, second_id][conflicting["index"]]
@@ -0,0 +1,136 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import auth
+import changes
+import database
+
+INTERNAL = {"X-Internal-Token": "internal-secret"}
+INSERT_SESSION = text("""
+    INSERT INTO tutoring_sessions (tutor_id, student_id, date, duration, topic)
+    VALUES (:tutor_id, :student_id, :date, 60, 'to be deleted') RETURNING id
+""")
+
+
+# The change feed is internal. A consumer passes back X-Next-Updated-Since
+# (or, on the SSE stream, the last checkpoint's id) and gets what changed
+# since: upserts of the rows written and tombstones of the rows deleted.
+@pytest.fixture
+def changes_client(monkeypatch, database_available):
+    monkeypatch.setattr(auth, "INTERNAL_API_TOKEN", "internal-secret")
+    app = FastAPI()
+    app.include_router(changes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def execute(statement: str, **params):
+    with database.engine.begin() as conn:
+        return conn.execute(text(statement), params)
+
+
+def extra_session(tutor) -> int:
+    with database.engine.begin() as conn:
+        params = {"tutor_id": tutor.id, "student_id": tutor.student_ids[1], "date": next(tutor.next_date)}
+        return conn.execute(INSERT_SESSION, params).scalar()
+
+
+def feed(client, path: str, **params):
+    response = client.get(path, params=params, headers=INTERNAL)
+    assert response.status_code == 200
+    return response
+
+
+def own_changes(response, tutor) -> list:
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    return [(row["op"], row["id"]) for row in rows if row["tutor_id"] == tutor.id]
+
+
+def test_internal_only(changes_client):
+    for path in ("/changes/sessions", "/changes/students", "/changes/sessions/stream"):
+        assert changes_client.get(path).status_code == 403
+
+
+def test_snapshot_then_resume(changes_client, tutor):
+    deleted_id = extra_session(tutor)
+    snapshot = feed(changes_client, "/changes/sessions")
+    assert sorted(own_changes(snapshot, tutor)) == [("upsert", tutor.session_id), ("upsert", deleted_id)]
+    cursor = snapshot.headers["X-Next-Updated-Since"]
+    assert own_changes(feed(changes_client, "/changes/sessions", updated_since=cursor), tutor) == []
+
+    execute("UPDATE tutoring_sessions SET topic = 'geometry' WHERE id = :id", id=tutor.session_id)
+    execute("DELETE FROM tutoring_sessions WHERE id = :id", id=deleted_id)
+    resumed = feed(changes_client, "/changes/sessions", updated_since=cursor)
+    # Upserts first, then the deletes
+    assert own_changes(resumed, tutor) == [("upsert", tutor.session_id), ("delete", deleted_id)]
+    rows = {row["id"]: row for row in map(json.loads, resumed.text.splitlines())}
+    assert rows[tutor.session_id]["topic"] == "geometry"
+    assert set(rows[deleted_id]) == {"op", "id", "tutor_id", "deleted_at"}
+    assert resumed.headers["X-Next-Updated-Since"] >= cursor
+
+
+def test_student_tombstones(changes_client, tutor):
+    now = datetime.now(timezone.utc).isoformat()
+    cursor = feed(changes_client, "/changes/students", updated_since=now).headers["X-Next-Updated-Since"]
+    execute("DELETE FROM students WHERE student_id = :id", id=tutor.student_ids[1])
+    resumed = feed(changes_client, "/changes/students", updated_since=cursor)
+    assert own_changes(resumed, tutor) == [("delete", tutor.student_ids[1])]
+
+
+def test_cursor_past_retention(changes_client):
+    too_old = datetime.now(timezone.utc) - timedelta(days=changes.TOMBSTONE_RETENTION_DAYS + 1)
+    response = changes_client.get("/changes/sessions", params={"updated_since": too_old.isoformat()}, headers=INTERNAL)
+    assert response.status_code == 410
+
+
+def read_events(response, until_checkpoint: int) -> list:
+    # (event, data, id) off the SSE body, up to the given number of checkpoints
+    async def collect():
+        events, buffer = [], b""
+        try:
+            async for chunk in response.body_iterator:
+                buffer += chunk
+                while b"\n\n" in buffer:
+                    message, buffer = buffer.split(b"\n\n", 1)
+                    fields = dict(line.split(": ", 1) for line in message.decode().splitlines())
+                    events.append((fields["event"], json.loads(fields["data"]), fields.get("id")))
+                    if sum(event == "checkpoint" for event, _, _ in events) == until_checkpoint:
+                        return events
+        finally:
+            await response.body_iterator.aclose()
+
+    return asyncio.run(collect())
+
+
+def test_stream_resumes_from_last_event_id(tutor, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_STREAM_POLL_SECONDS", 0.01)
+    deleted_id = extra_session(tutor)
+    last_event_id = changes.format_timestamp(changes.read_watermark(None))
+    execute("UPDATE tutoring_sessions SET topic = 'geometry' WHERE id = :id", id=tutor.session_id)
+    execute("DELETE FROM tutoring_sessions WHERE id = :id", id=deleted_id)
+    response = asyncio.run(changes.session_change_stream(updated_since=None, last_event_id=last_event_id))
+    events = read_events(response, until_checkpoint=1)
+    own = [(event, data["id"]) for event, data, _ in events if data.get("tutor_id") == tutor.id]
+    assert own == [("upsert", tutor.session_id), ("delete", deleted_id)]
+    event, data, event_id = events[-1]
+    assert event == "checkpoint"
+    assert event_id == data["updated_since"] >= last_event_id
+
+
+def test_new_subscriber_starts_from_now(database_available, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_STREAM_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(changes, "CHANGE_STREAM_KEEPALIVE_SECONDS", 0)
+    response = asyncio.run(changes.session_change_stream(updated_since=None, last_event_id=None))
+    events = read_events(response, until_checkpoint=2)
+    assert [event for event, _, _ in events] == ["checkpoint", "checkpoint"]
+
+
+def test_invalid_last_event_id(changes_client):
+    headers = {**INTERNAL, "Last-Event-ID": "yesterday"}
+    assert changes_client.get("/changes/sessions/stream", headers=headers).status_code == 400
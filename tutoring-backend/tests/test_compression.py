@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+
+import pytest
+from starlette.responses import Response, StreamingResponse
+
+import response_compression
+
+LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+BODY = b'[{"id": 1, "name": "Alice Johnson"}]' * 100
+
+
+def decompress(coding: str, body: bytes) -> bytes:
+    if coding == "gzip":
+        return gzip.decompress(body)
+    if coding == "br":
+        return response_compression.brotli.decompress(body)
+    return response_compression.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+def call(app, accept_encoding: str | None, codings=("zstd", "br", "gzip"), min_size: int = 1024):
+    # The messages the compression middleware sends for one GET
+    middleware = response_compression.CompressionMiddleware(app, codings=list(codings), min_size=min_size, levels=LEVELS)
+    headers = [] if accept_encoding is None else [(b"accept-encoding", accept_encoding.encode())]
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers}
+    sent = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = sent[0]
+    return {key.decode().lower(): value.decode() for key, value in start["headers"]}, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def coding_available(coding: str):
+    if not response_compression.available(coding):
+        pytest.skip(f"{coding} needs its compression package")
+
+
+@pytest.mark.parametrize("accept_encoding, codings, expected", [
+    ("gzip, br, zstd", ["zstd", "br", "gzip"], "zstd"),
+    ("gzip;q=1, zstd;q=0.5", ["zstd", "br", "gzip"], "gzip"),
+    ("br;q=0, gzip;q=0", ["br", "gzip"], None),
+    ("*", ["br", "gzip"], "br"),
+    ("*;q=0.1, gzip;q=0", ["gzip"], None),
+    ("identity", ["gzip"], None),
+    ("GZIP;q=bogus, br", ["gzip", "br"], "br"),
+    ("", ["gzip"], None),
+])
+def test_negotiate(accept_encoding, codings, expected):
+    assert response_compression.negotiate(accept_encoding, codings) == expected
+
+
+@pytest.mark.parametrize("coding", ["gzip", "br", "zstd"])
+def test_whole_body(coding):
+    coding_available(coding)
+    app = Response(BODY, media_type="application/json", headers={"ETag": '"abc"'})
+    headers, body = call(app, coding, codings=[coding])
+    assert headers["content-encoding"] == coding
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"abc"'
+    assert int(headers["content-length"]) == len(body) < len(BODY)
+    assert decompress(coding, body) == BODY
+
+
+@pytest.mark.parametrize("coding", ["gzip", "br", "zstd"])
+def test_stream_is_compressed_chunk_by_chunk(coding):
+    coding_available(coding)
+    lines = [b'{"id": %d}\n' % n for n in range(50)]
+    app = StreamingResponse(iter(lines), media_type="application/x-ndjson")
+    headers, body = call(app, coding, codings=[coding])
+    assert headers["content-encoding"] == coding
+    assert "content-length" not in headers
+    assert decompress(coding, body) == b"".join(lines)
+
+
+@pytest.mark.parametrize("app, accept_encoding", [
+    (Response(BODY[:100], media_type="application/json"), "gzip"),
+    (Response(BODY, media_type="application/vnd.apache.arrow.stream"), "gzip"),
+    (Response(BODY, media_type="application/json", headers={"Content-Encoding": "gzip"}), "gzip"),
+    (Response(BODY, media_type="application/json"), None),
+    (Response(status_code=304, headers={"ETag": '"abc"'}), "gzip"),
+])
+def test_left_alone(app, accept_encoding):
+    headers, body = call(app, accept_encoding, codings=["gzip"])
+    assert headers.get("content-encoding") in (None, app.headers.get("content-encoding"))
+    assert "vary" not in headers
+    assert body == app.body
+
+
+def test_weak_etag_revalidates(client, tutor):
+    first = client.get("/students/", headers=tutor.headers)
+    weak = "W/" + first.headers["etag"]
+    assert client.get("/students/", headers={**tutor.headers, "If-None-Match": weak}).status_code == 304
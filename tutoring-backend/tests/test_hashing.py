@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import delete, select
+
+import database
+import hashing
+import main
+from models import RefreshToken, Tutor, User
+
+
+# Hashing runs in a process pool and at most HASH_MAX_PENDING calls wait for
+# it; past that they fail at once with HashPoolBusy, which the app turns into
+# a 503 with Retry-After.
+@pytest.fixture
+def pool():
+    yield
+    hashing.shutdown()
+
+
+@pytest.fixture
+def app_client(database_available):
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def old_cost_user(database_available):
+    # A user whose password was hashed with another bcrypt cost
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=hashing.BCRYPT_ROUNDS + 1)
+    with database.SessionLocal() as db:
+        user = User(username=name, email=f"{name}@example.com", hashed_password=old_context.hash("secret"))
+        db.add(user)
+        db.flush()
+        db.add(Tutor(user_id=user.id))
+        db.commit()
+        user_id = user.id
+    yield name, user_id
+    with database.SessionLocal() as db:
+        db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+        db.execute(delete(Tutor).where(Tutor.user_id == user_id))
+        db.execute(delete(User).where(User.id == user_id))
+        db.commit()
+
+
+def test_hash_and_verify(pool):
+    hashed = asyncio.run(hashing.hash_password("secret"))
+    assert hashing.pwd_context.verify("secret", hashed)
+    assert asyncio.run(hashing.verify_and_update("secret", hashed)) == (True, None)
+    assert asyncio.run(hashing.verify_and_update("wrong", hashed)) == (False, None)
+    assert hashing.pending() == 0
+
+
+def test_pool_refuses_past_max_pending(pool, monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_MAX_PENDING", 1)
+
+    async def two_at_once():
+        return await asyncio.gather(hashing.hash_password("a"), hashing.hash_password("b"), return_exceptions=True)
+
+    first, second = asyncio.run(two_at_once())
+    assert hashing.pwd_context.verify("a", first)
+    assert isinstance(second, hashing.HashPoolBusy)
+    assert hashing.pending() == 0
+
+
+def test_busy_pool_is_a_503(app_client, monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_MAX_PENDING", 0)
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    response = app_client.post("/register/", json={"username": name, "email": f"{name}@example.com", "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.HASH_RETRY_AFTER_SECONDS)
+
+
+def test_login_rehashes_an_old_cost(app_client, old_cost_user):
+    name, user_id = old_cost_user
+    assert app_client.post("/token/", data={"username": name, "password": "wrong"}).status_code == 401
+    response = app_client.post("/token/", data={"username": name, "password": "secret"})
+    assert response.status_code == 200
+    with database.SessionLocal() as db:
+        hashed = db.execute(select(User.hashed_password).where(User.id == user_id)).scalar()
+    assert not hashing.pwd_context.needs_update(hashed)
+    assert hashing.pwd_context.verify("secret", hashed)
@@ -0,0 +1,62 @@
+# Bucket keys of requests without a token, and the token buckets of both
+# stores (fakeredis standing in for Redis)
+import pytest
+
+import main
+import ratelimit
+
+
+def scope(client: str, headers: dict | None = None) -> dict:
+    return {
+        "type": "http",
+        "client": (client, 50000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+
+
+def test_connection_address_without_header():
+    assert ratelimit.client_address(scope("10.0.0.1", {"X-Forwarded-For": "1.2.3.4"})) == "10.0.0.1"
+
+
+def test_forwarded_address():
+    request = scope("10.0.0.1", {"X-Forwarded-For": "9.9.9.9, 1.2.3.4, 10.0.0.2"})
+    assert ratelimit.client_address(request, "X-Forwarded-For", 1) == "10.0.0.2"
+    assert ratelimit.client_address(request, "x-forwarded-for", 2) == "1.2.3.4"
+
+
+def test_forwarded_address_missing_falls_back_to_connection():
+    assert ratelimit.client_address(scope("10.0.0.1"), "X-Forwarded-For", 1) == "10.0.0.1"
+    request = scope("10.0.0.1", {"X-Forwarded-For": "1.2.3.4"})
+    assert ratelimit.client_address(request, "X-Forwarded-For", 2) == "10.0.0.1"
+
+
+def test_anonymous_clients_behind_a_proxy_get_separate_buckets(monkeypatch):
+    monkeypatch.setattr(main, "RATE_LIMIT_CLIENT_HEADER", "X-Real-IP")
+    first = main.rate_limit_key(scope("10.0.0.1", {"X-Real-IP": "1.2.3.4"}))
+    second = main.rate_limit_key(scope("10.0.0.1", {"X-Real-IP": "5.6.7.8"}))
+    assert (first, second) == ("ip:1.2.3.4", "ip:5.6.7.8")
+
+
+def redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return ratelimit.RedisStore(fakeredis.FakeRedis(), lease=60)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    return ratelimit.MemoryStore() if request.param == "memory" else redis_store()
+
+
+def test_bucket_refuses_past_burst(store):
+    waits = [store.take("sub:a", 1, 3) for _ in range(4)]
+    assert waits[:3] == [0, 0, 0]
+    assert 0 < waits[3] <= 1
+    assert store.take("sub:b", 1, 3) == 0
+
+
+def test_concurrency_slots(store):
+    slots = [store.acquire("bulk", 2) for _ in range(3)]
+    assert slots[0] is not None and slots[1] is not None and slots[2] is None
+    store.release("bulk", slots[0])
+    assert store.acquire("bulk", 2) is not None
@@ -0,0 +1,118 @@
+# The list cache on both backends: the in-process LRU and a Redis-protocol
+# server, here fakeredis. The endpoint tests swap main.list_cache's backend.
+import pytest
+
+import main
+import response_cache
+
+
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    return response_cache.RedisBackend(fakeredis.FakeRedis(), 300)
+
+
+BACKENDS = {
+    "memory": lambda: response_cache.MemoryBackend(100, 1024 * 1024, 300),
+    "redis": redis_backend,
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def cache(request):
+    return response_cache.ResponseCache(BACKENDS[request.param]())
+
+
+@pytest.fixture
+def list_cache(monkeypatch):
+    monkeypatch.setattr(main.list_cache, "backend", redis_backend())
+    return main.list_cache
+
+
+def test_hit_after_store(cache):
+    generation, cached = cache.lookup("students:1", "all")
+    assert cached is None
+    stored = cache.store("students:1", "all", generation, b"[1]")
+    _, cached = cache.lookup("students:1", "all")
+    assert cached == stored
+    assert cached.body == b"[1]"
+
+
+def test_invalidate_drops_every_variant(cache):
+    for variant in ("all", "fields=name"):
+        generation, _ = cache.lookup("students:1", variant)
+        cache.store("students:1", variant, generation, b"[1]")
+    cache.invalidate("students:1")
+    assert cache.lookup("students:1", "all")[1] is None
+    assert cache.lookup("students:1", "fields=name")[1] is None
+
+
+def test_read_racing_a_write_is_not_served(cache):
+    # The read started before the write, so its body may predate it
+    generation, _ = cache.lookup("students:1", "all")
+    cache.invalidate("students:1")
+    cache.store("students:1", "all", generation, b"[stale]")
+    assert cache.lookup("students:1", "all")[1] is None
+
+
+def test_namespaces_are_separate(cache):
+    generation, _ = cache.lookup("students:1", "all")
+    cache.store("students:1", "all", generation, b"[1]")
+    cache.invalidate("students:2")
+    assert cache.lookup("students:1", "all")[1] is not None
+    assert cache.lookup("students:2", "all")[1] is None
+
+
+def test_memory_backend_byte_budget():
+    backend = response_cache.MemoryBackend(100, 100, 300)
+    backend.set("a", b"x" * 40)
+    backend.set("b", b"x" * 40)
+    backend.get_many(["a"])
+    backend.set("c", b"x" * 40)
+    # b was the least recently used
+    assert backend.get_many(["a", "b", "c"]) == [b"x" * 40, None, b"x" * 40]
+    assert backend.bytes == 82
+    backend.set("d", b"x" * 200)
+    assert backend.get_many(["d"]) == [None]
+    assert len(backend) == 2
+
+
+def test_memory_backend_expiry(monkeypatch):
+    backend = response_cache.MemoryBackend(100, 1024, 5)
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    backend.set("a", b"1")
+    assert not backend.add("a", b"2")
+    now[0] += 5
+    assert backend.get_many(["a"]) == [None]
+    assert backend.add("a", b"2")
+    assert backend.bytes == 2
+
+
+def test_memory_backend_needs_a_single_worker():
+    assert response_cache.make_backend("", 100, 1024, 300, workers=4) is None
+    assert isinstance(response_cache.make_backend("memory://", 100, 1024, 300), response_cache.MemoryBackend)
+    with pytest.raises(ValueError):
+        response_cache.make_backend("memory://", 100, 1024, 300, workers=4)
+
+
+def test_list_served_from_cache(client, tutor, statements, list_cache):
+    first = client.get("/students/", headers=tutor.headers)
+    statements.clear()
+    second = client.get("/students/", headers=tutor.headers)
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert statements == []
+    not_modified = client.get("/students/", headers={**tutor.headers, "If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_write_invalidates_list(client, tutor, list_cache):
+    before = client.get("/students/", headers=tutor.headers)
+    payload = {"name": "Renamed", "email": "renamed@example.com", "age": 31}
+    assert client.put(f"/students/{tutor.student_ids[0]}/", json=payload, headers=tutor.headers).status_code == 200
+    after = client.get("/students/", headers={**tutor.headers, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert "Renamed" in [student["name"] for student in after.json()]
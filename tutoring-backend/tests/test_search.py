@@ -0,0 +1,92 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete
+
+import database
+from models import Student, Tutor, User
+
+
+# Search matches full-text (stemmed for sessions' topics) or by trigram word
+# similarity, which takes typos and word prefixes, within the caller's rows
+# only, best match first.
+@pytest.fixture
+def searchable(client, tutor):
+    for name in ("Alice Johnson", "Bob Smith", "Alicia Johnston"):
+        payload = {"name": name, "email": f"{name.split()[0].lower()}@example.com", "age": 20}
+        assert client.post("/students/", json=payload, headers=tutor.headers).status_code == 200
+    for topic in ("Quadratic equations", "Organic chemistry"):
+        payload = {"student_id": tutor.student_ids[1], "date": next(tutor.next_date).isoformat(), "duration": 60, "topic": topic}
+        assert client.post("/sessions/", json=payload, headers=tutor.headers).status_code == 200
+    return tutor
+
+
+def search(client, tutor, path: str, **params):
+    response = client.get(path, params=params, headers=tutor.headers)
+    assert response.status_code == 200
+    return response
+
+
+def names_of(students: list) -> list:
+    return [student["name"] for student in students]
+
+
+def names(response) -> list:
+    return names_of(response.json())
+
+
+def test_full_text(client, searchable):
+    assert names(search(client, searchable, "/students/search", q="smith")) == ["Bob Smith"]
+    topics = [session["topic"] for session in search(client, searchable, "/sessions/search", q="equation").json()]
+    assert topics == ["Quadratic equations"]
+
+
+def test_typo_and_prefix(client, searchable):
+    assert set(names(search(client, searchable, "/students/search", q="Johnsn"))) == {"Alice Johnson", "Alicia Johnston"}
+    assert set(names(search(client, searchable, "/students/search", q="Johns"))) == {"Alice Johnson", "Alicia Johnston"}
+    topics = [session["topic"] for session in search(client, searchable, "/sessions/search", q="chemistr").json()]
+    assert topics == ["Organic chemistry"]
+
+
+def test_no_match(client, searchable):
+    assert search(client, searchable, "/students/search", q="zebra").json() == []
+
+
+def test_pages(client, searchable):
+    first = search(client, searchable, "/students/search", q="Johns", limit=1)
+    assert first.headers["X-Next-Offset"] == "1"
+    second = search(client, searchable, "/students/search", q="Johns", limit=1, offset=1)
+    # A full page can't tell it was the last one
+    assert second.headers["X-Next-Offset"] == "2"
+    third = search(client, searchable, "/students/search", q="Johns", limit=1, offset=2)
+    assert third.json() == []
+    assert "X-Next-Offset" not in third.headers
+    assert sorted(names(first) + names(second)) == ["Alice Johnson", "Alicia Johnston"]
+
+
+def test_only_own_rows(client, searchable):
+    # Another tutor's Bob Smith
+    with database.SessionLocal() as db:
+        user = User(username=f"test-{uuid.uuid4().hex[:12]}", email=f"{uuid.uuid4().hex[:12]}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        other = Tutor(user_id=user.id)
+        db.add(other)
+        db.flush()
+        foreign = Student(tutor_id=other.id, name="Bob Smith", email="bob.other@example.com", age=20)
+        db.add(foreign)
+        db.commit()
+        try:
+            found = search(client, searchable, "/students/search", q="Bob Smith").json()
+            assert names_of(found) == ["Bob Smith"]
+            assert found[0]["id"] != foreign.student_id
+        finally:
+            db.execute(delete(Student).where(Student.tutor_id == other.id))
+            db.execute(delete(Tutor).where(Tutor.id == other.id))
+            db.execute(delete(User).where(User.id == user.id))
+            db.commit()
+
+
+@pytest.mark.parametrize("params", [{}, {"q": ""}, {"q": "x" * 201}, {"q": "a", "limit": 101}, {"q": "a", "offset": -1}])
+def test_bad_params(client, tutor, params):
+    assert client.get("/students/search", params=params, headers=tutor.headers).status_code == 422
@@ -0,0 +1,32 @@
+# ?from= and ?to= on GET /sessions/ take datetimes or bare dates; a date is
+# the whole day. The tutor fixture's session is on 2030-01-07 at 09:00.
+import pytest
+
+
+def session_ids(client, tutor, params: dict) -> list:
+    response = client.get("/sessions/", params=params, headers=tutor.headers)
+    assert response.status_code == 200
+    return [session["id"] for session in response.json()]
+
+
+@pytest.mark.parametrize("params, included", [
+    ({"from": "2030-01-07"}, True),
+    ({"from": "2030-01-08"}, False),
+    ({"to": "2030-01-07"}, True),
+    ({"to": "2030-01-06"}, False),
+    ({"from": "2030-01-07", "to": "2030-01-07"}, True),
+    ({"from": "2030-01-07T09:00:00", "to": "2030-01-07T09:30:00"}, True),
+    ({"from": "2030-01-07T09:30:00", "to": "2030-01-08"}, False),
+])
+def test_range(client, tutor, params, included):
+    assert session_ids(client, tutor, params) == ([tutor.session_id] if included else [])
+
+
+def test_to_before_from(client, tutor):
+    response = client.get("/sessions/", params={"from": "2030-01-07", "to": "2030-01-06"}, headers=tutor.headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params", [{"from": "2030-13-01"}, {"to": "next week"}, {"from": "2030-01-07T25:00"}])
+def test_invalid_bound(client, tutor, params):
+    assert client.get("/sessions/", params=params, headers=tutor.headers).status_code == 422
@@ -0,0 +1,37 @@
+import pytest
+
+
+# ?fields= narrows the SELECT itself: only the id and the named columns are
+# read and sent, and each request is still one statement.
+@pytest.mark.parametrize("path, fields, keys", [
+    ("/students/", "name", {"id", "name"}),
+    ("/students/", " email , age ", {"id", "email", "age"}),
+    ("/students/", "id", {"id"}),
+    ("/sessions/", "topic,date", {"id", "topic", "date"}),
+])
+def test_selects_only_the_fields(client, tutor, statements, path, fields, keys):
+    statements.clear()
+    response = client.get(path, params={"fields": fields}, headers=tutor.headers)
+    assert response.status_code == 200
+    assert response.json() and all(row.keys() == keys for row in response.json())
+    assert len(statements) == 1
+    selected = statements[0].split("FROM")[0]
+    for left_out in {"name", "email", "age", "topic", "duration"} - keys:
+        assert f".{left_out}" not in selected
+
+
+def test_all_fields_by_default(client, tutor):
+    student = client.get("/students/", headers=tutor.headers).json()[0]
+    assert student.keys() == {"id", "name", "email", "age"}
+
+
+def test_fieldsets_are_separate_etags(client, tutor):
+    full = client.get("/students/", headers=tutor.headers)
+    narrow = client.get("/students/", params={"fields": "name"}, headers=tutor.headers)
+    assert full.headers["etag"] != narrow.headers["etag"]
+
+
+def test_unknown_field(client, tutor):
+    response = client.get("/sessions/", params={"fields": "topic,password"}, headers=tutor.headers)
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
@@ -0,0 +1,103 @@
+# The owned writes check ownership inside the statement that does the write,
+# and the lists select plain rows: each is one SQL statement, on the sync and
+# the async path alike.
+def counted(statements, send):
+    statements.clear()
+    response = send()
+    return response, len(statements)
+
+
+def session_payload(tutor, student_id: int) -> dict:
+    return {"student_id": student_id, "date": next(tutor.next_date).isoformat(), "duration": 60, "topic": "geometry"}
+
+
+def test_list_students(client, tutor, statements):
+    response, count = counted(statements, lambda: client.get("/students/", headers=tutor.headers))
+    assert response.status_code == 200
+    assert [student["id"] for student in response.json()] == tutor.student_ids
+    assert count == 1
+
+
+def test_list_sessions(client, tutor, statements):
+    response, count = counted(statements, lambda: client.get("/sessions/", headers=tutor.headers))
+    assert response.status_code == 200
+    assert [session["id"] for session in response.json()] == [tutor.session_id]
+    assert count == 1
+
+
+def test_list_sessions_in_range(client, tutor, statements):
+    params = {"from": "2030-01-01T00:00:00", "to": "2030-02-01T00:00:00"}
+    response, count = counted(statements, lambda: client.get("/sessions/", params=params, headers=tutor.headers))
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert count == 1
+
+
+def test_create_student(client, tutor, statements):
+    payload = {"name": "New Student", "email": "new.student@example.com", "age": 30}
+    response, count = counted(statements, lambda: client.post("/students/", json=payload, headers=tutor.headers))
+    assert response.status_code == 200
+    assert response.json()["name"] == "New Student"
+    assert count == 1
+
+
+def test_update_student(client, tutor, statements):
+    payload = {"name": "Renamed", "email": "renamed@example.com", "age": 31}
+    student_id = tutor.student_ids[0]
+    response, count = counted(statements, lambda: client.put(f"/students/{student_id}/", json=payload, headers=tutor.headers))
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed"
+    assert count == 1
+
+
+def test_update_foreign_student(client, tutor, statements):
+    payload = {"name": "Renamed", "email": "renamed@example.com"}
+    response, count = counted(statements, lambda: client.put("/students/0/", json=payload, headers=tutor.headers))
+    assert response.status_code == 404
+    assert count == 1
+
+
+def test_delete_student(client, tutor, statements):
+    student_id = tutor.student_ids[1]
+    response, count = counted(statements, lambda: client.delete(f"/students/{student_id}/", headers=tutor.headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+def test_delete_student_with_sessions(client, tutor, statements):
+    student_id = tutor.student_ids[0]
+    response, count = counted(statements, lambda: client.delete(f"/students/{student_id}/", headers=tutor.headers))
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Student has sessions"
+    assert count == 1
+
+
+def test_create_session(client, tutor, statements):
+    payload = session_payload(tutor, tutor.student_ids[1])
+    response, count = counted(statements, lambda: client.post("/sessions/", json=payload, headers=tutor.headers))
+    assert response.status_code == 200
+    assert response.json()["student_id"] == tutor.student_ids[1]
+    assert count == 1
+
+
+def test_create_session_for_foreign_student(client, tutor, statements):
+    payload = session_payload(tutor, 0)
+    response, count = counted(statements, lambda: client.post("/sessions/", json=payload, headers=tutor.headers))
+    assert response.status_code == 404
+    assert count == 1
+
+
+def test_update_session(client, tutor, statements):
+    payload = session_payload(tutor, tutor.student_ids[1])
+    response, count = counted(
+        statements, lambda: client.put(f"/sessions/{tutor.session_id}/", json=payload, headers=tutor.headers)
+    )
+    assert response.status_code == 200
+    assert response.json()["student_id"] == tutor.student_ids[1]
+    assert count == 1
+
+
+def test_delete_session(client, tutor, statements):
+    response, count = counted(statements, lambda: client.delete(f"/sessions/{tutor.session_id}/", headers=tutor.headers))
+    assert response.status_code == 200
+    assert count == 1
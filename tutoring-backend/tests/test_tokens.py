@@ -0,0 +1,105 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, update
+
+import database
+import hashing
+from auth import decode_token, revoked_families
+from models import RefreshToken, Tutor, User
+
+
+# Logins hand out a stateless access token and a single-use refresh token;
+# refreshing rotates within the token's family, a refresh token used twice
+# revokes its whole family, and a revoked family's access tokens are refused
+# before they expire.
+@pytest.fixture
+def account(client):
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    response = client.post("/register/", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+    assert response.status_code == 200
+    user_id = response.json()["user_id"]
+    yield name
+    hashing.shutdown()
+    with database.SessionLocal() as db:
+        db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+        db.execute(delete(Tutor).where(Tutor.user_id == user_id))
+        db.execute(delete(User).where(User.id == user_id))
+        db.commit()
+
+
+def login(client, name: str) -> dict:
+    response = client.post("/token/", data={"username": name, "password": "secret"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client, tokens: dict):
+    return client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+
+def can_read(client, tokens: dict) -> bool:
+    status_code = client.get("/students/", headers={"Authorization": f"Bearer {tokens['access_token']}"}).status_code
+    assert status_code in (200, 401)
+    return status_code == 200
+
+
+def test_refresh_rotates(client, account):
+    tokens = login(client, account)
+    assert tokens["token_type"] == "bearer"
+    assert can_read(client, tokens)
+    response = refresh(client, tokens)
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert can_read(client, rotated)
+    # Still the same family, so the first access token stays good
+    assert can_read(client, tokens)
+    assert refresh(client, rotated).status_code == 200
+
+
+def test_reused_refresh_token_revokes_the_family(client, account):
+    tokens = login(client, account)
+    rotated = refresh(client, tokens).json()
+    assert refresh(client, tokens).status_code == 401
+    assert refresh(client, rotated).status_code == 401
+    assert not can_read(client, rotated)
+    assert not can_read(client, tokens)
+
+
+def test_revoke(client, account):
+    tokens, other_device = login(client, account), login(client, account)
+    response = client.post("/token/revoke", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    assert refresh(client, tokens).status_code == 401
+    assert not can_read(client, tokens)
+    assert can_read(client, other_device)
+
+
+def test_revoke_everywhere(client, account):
+    tokens, other_device = login(client, account), login(client, account)
+    response = client.post("/token/revoke", json={"refresh_token": tokens["refresh_token"], "everywhere": True})
+    assert response.status_code == 200
+    assert refresh(client, other_device).status_code == 401
+    assert not can_read(client, other_device)
+
+
+def test_revocation_by_another_worker(client, account):
+    # Written straight to the database, it reaches this worker's
+    # revoked_families on the next sync
+    tokens = login(client, account)
+    family_id = decode_token(tokens["refresh_token"], "refresh")["fam"]
+    with database.SessionLocal() as db:
+        db.execute(update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked_at=datetime.utcnow()))
+        db.commit()
+    assert can_read(client, tokens)
+    revoked_families.sync(database.SessionLocal)
+    assert not can_read(client, tokens)
+    assert refresh(client, tokens).status_code == 401
+
+
+def test_wrong_token_type(client, account):
+    tokens = login(client, account)
+    assert client.post("/token/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+    assert not can_read(client, {"access_token": tokens["refresh_token"]})
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+# The bulk listings page by keyset (?after_id=, X-Next-After-Id) or stream
+# the rest of the table as NDJSON, one SQL statement per request either way.
+# Every other test's rows are gone by then, so after the fixture tutor's
+# first id there are only the tutor's own.
+@pytest.fixture
+def app_client(database_available):
+    with TestClient(main.app) as client:
+        yield client
+
+
+def counted(statements, send):
+    statements.clear()
+    response = send()
+    return response, len(statements)
+
+
+def test_students_by_page(app_client, tutor, statements):
+    after_id = tutor.student_ids[0] - 1
+    seen = []
+    while True:
+        params = {"after_id": after_id, "limit": 1}
+        response, count = counted(statements, lambda: app_client.get("/students/unprotected/", params=params))
+        assert response.status_code == 200
+        assert count == 1
+        seen += [student["id"] for student in response.json()]
+        if "X-Next-After-Id" not in response.headers:
+            break
+        after_id = int(response.headers["X-Next-After-Id"])
+        assert after_id == seen[-1]
+    assert seen == tutor.student_ids
+
+
+def test_last_page_has_no_next(app_client, tutor):
+    response = app_client.get("/sessions/unprotected", params={"after_id": tutor.session_id - 1, "limit": 2})
+    assert [session["id"] for session in response.json()] == [tutor.session_id]
+    assert "X-Next-After-Id" not in response.headers
+
+
+@pytest.mark.parametrize("path", ["/students/unprotected/", "/sessions/unprotected"])
+def test_stream(app_client, tutor, statements, path):
+    ids = tutor.student_ids if path.startswith("/students") else [tutor.session_id]
+    response, count = counted(statements, lambda: app_client.get(path, params={"after_id": ids[0] - 1, "stream": "true"}))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == ids
+    assert count == 1
+
+
+def test_limit_is_bounded(app_client):
+    assert app_client.get("/sessions/unprotected", params={"limit": main.PAGE_SIZE_MAX + 1}).status_code == 422